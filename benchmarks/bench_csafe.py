@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+"""
+Micro-benchmarks for csafe_cmd.write and csafe_cmd.read on synthetic frames
+Covers every command list PyErg sends, the largest force plot and heart beat
+frames and worst case byte stuffing.
+run with: python -m benchmarks.bench_csafe [--save] [--threshold 0.2]
+Throughput is recorded relative to a fixed pure python reference workload timed in
+the same process, so baselines compare across machines.
+Fails (exit code 1) if any case is slower than the baseline by more than threshold.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import timeit
+import tracemalloc
+
+from pyrow.csafe import csafe_cmd
+from pyrow.pyrow import (PyErg, MONITOR_COMMANDS, FORCEPLOT_COMMANDS, WORKOUT_COMMANDS,
+                         ERG_COMMANDS)
+from benchmarks.responses import (MONITOR_RESULTS, FORCEPLOT_RESULTS, WORKOUT_RESULTS, ERG_RESULTS,
+                                 HEARTBEAT_RESULTS, STUFFED_RESULTS)
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+THRESHOLD = 0.2
+ROUNDS = 7
+#times a regressed case is timed again before it is reported
+RECHECKS = 2
+#passes whose median is saved as the baseline
+SAVE_PASSES = 3
+
+#command lists sent by PyErg, and synthetic responses to them
+MONITOR = MONITOR_COMMANDS
+FORCEPLOT = FORCEPLOT_COMMANDS
+WORKOUT = WORKOUT_COMMANDS
+ERG = ERG_COMMANDS
+STATUS = ('CSAFE_GETSTATUS_CMD',)
+HEARTBEAT = ('CSAFE_PM_GET_HEARTBEATDATA', 32)
+CLOCK = ('CSAFE_SETTIME_CMD', 12, 30, 59, 'CSAFE_SETDATE_CMD', 117, 6, 15)
+SET_WORKOUT = tuple(PyErg._workout_command(distance=2000, split=500, powerpace=240))
+#every argument byte needs stuffing
+STUFFED = ('CSAFE_SETHORIZONTAL_CMD', 0xF0F1, 0xF2, 'CSAFE_PM_SET_SPLITDURATION', 0xF3,
+           0xF0F1F2F3, 'CSAFE_SETPOWER_CMD', 0xF3F3, 0xF1)
+
+
+def _cases():
+    """
+    Returns a list of (name, function) benchmark cases
+    """
+    def write(command):
+        return lambda: csafe_cmd.write(command)
+
+    def write_into(command):
+        buffers = csafe_cmd.report_buffers()
+        return lambda: csafe_cmd.write_into(command, buffers)
+
+    def encode(command):
+        #report cache miss, the compiled template is filled in
+        def _encode():
+            csafe_cmd._report_cache.clear()
+            return csafe_cmd.write(command)
+        return _encode
+
+    def read(command, results):
+        transmission = csafe_cmd.write_response(results, status=5)
+        return lambda: csafe_cmd.read(transmission, command)
+
+    return [
+        ('write get_monitor', write(MONITOR)),
+        ('write get_monitor forceplot', write(MONITOR + FORCEPLOT)),
+        ('write get_forceplot', write(FORCEPLOT)),
+        ('write get_workout', write(WORKOUT)),
+        ('write get_erg', write(ERG)),
+        ('write get_status', write(STATUS)),
+        ('write get_heartbeat', write(HEARTBEAT)),
+        ('write set_clock', write(CLOCK)),
+        ('write set_workout', write(SET_WORKOUT)),
+        ('write stuffed', write(STUFFED)),
+        ('write_into get_monitor', write_into(MONITOR)),
+        ('write_into get_monitor forceplot', write_into(MONITOR + FORCEPLOT)),
+        ('encode get_monitor forceplot', encode(MONITOR + FORCEPLOT)),
+        ('encode set_clock', encode(CLOCK)),
+        ('encode set_workout', encode(SET_WORKOUT)),
+        ('encode stuffed', encode(STUFFED)),
+        ('read get_monitor', read(MONITOR, MONITOR_RESULTS)),
+        ('read get_monitor forceplot', read(MONITOR + FORCEPLOT,
+                                            MONITOR_RESULTS + FORCEPLOT_RESULTS)),
+        ('read get_forceplot', read(FORCEPLOT, FORCEPLOT_RESULTS)),
+        ('read get_workout', read(WORKOUT, WORKOUT_RESULTS)),
+        ('read get_erg', read(ERG, ERG_RESULTS)),
+        ('read get_status', read(STATUS, [])),
+        ('read get_heartbeat', read(HEARTBEAT, HEARTBEAT_RESULTS)),
+        ('read stuffed', read(FORCEPLOT, STUFFED_RESULTS)),
+    ]
+
+def _reference():
+    #fixed pure python workload, measures the speed of the interpreter on this machine
+    table = {k: k * 31 for k in range(64)}
+    total = 0
+    for k in range(64):
+        total ^= table[k]
+    return total
+
+def _timings(function, reference):
+    """
+    Returns the best seconds per call of function and of reference, timed alternately
+    so that both see the same machine load
+    """
+    timers = []
+    for timed in (function, reference):
+        timer = timeit.Timer(timed)
+        number, _ = timer.autorange()
+        timers.append((timer, number))
+    best = [float('inf'), float('inf')]
+    for _ in range(ROUNDS):
+        for k, (timer, number) in enumerate(timers):
+            best[k] = min(best[k], timer.timeit(number) / number)
+    return best
+
+def _peak_per_call(function, number=100):
+    """
+    Returns the most bytes held at once during a call, the tracemalloc peak above the
+    memory held before the call, the largest of number calls
+    """
+    function()
+    tracemalloc.start()
+    try:
+        peak = 0
+        for _ in range(number):
+            tracemalloc.stop()
+            tracemalloc.start()
+            function()
+            current, peaked = tracemalloc.get_traced_memory()
+            peak = max(peak, peaked - current)
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def run(names=None, exact=False):
+    """
+    Runs the benchmark cases, returns {name: {'ops': ops/sec, 'relative': ops/sec relative
+    to the reference workload timed just before the case, 'peak': peak bytes/call}}
+    names: only runs cases containing one of these strings, or named by one if exact
+    """
+    results = {}
+    for name, function in _cases():
+        if names and not (name in names if exact else any(part in name for part in names)):
+            continue
+        seconds, reference = _timings(function, _reference)
+        results[name] = {
+            'ops': 1 / seconds,
+            'relative': reference / seconds,
+            'peak': _peak_per_call(function),
+        }
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Returns the names of cases whose relative throughput regressed past threshold
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name, {}).get('relative')
+        if base and result['relative'] < base * (1 - threshold):
+            regressions.append(name)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('cases', nargs='*', help="only run cases containing these strings")
+    parser.add_argument('--baseline', default=BASELINE, help="baseline file")
+    parser.add_argument('--save', action='store_true', help="save the results as the baseline")
+    parser.add_argument('--threshold', type=float,
+                        default=float(os.environ.get('PYROW_BENCH_THRESHOLD', THRESHOLD)),
+                        help="allowed throughput loss against the baseline (fraction)")
+    args = parser.parse_args(argv)
+
+    results = run(args.cases)
+    if args.save:
+        passes = [results] + [run(args.cases) for _ in range(SAVE_PASSES - 1)]
+        for name, result in results.items():
+            result['relative'] = statistics.median(_pass[name]['relative'] for _pass in passes)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    print("{:<34} {:>12} {:>9} {:>9} {:>9} {:>10}".format(
+        "case", "ops/s", "relative", "baseline", "change", "peak B"))
+    for name, result in results.items():
+        base = baseline.get(name, {}).get('relative')
+        print("{:<34} {:>12.0f} {:>9.4f} {:>9} {:>9} {:>10}".format(
+            name, result['ops'], result['relative'], "{:.4f}".format(base) if base else "-",
+            "{:+.1%}".format(result['relative'] / base - 1) if base else "-", result['peak']))
+
+    if args.save:
+        baseline.update((name, {'relative': result['relative'], 'peak': result['peak']})
+                        for name, result in results.items())
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        print("Saved baseline to {}".format(args.baseline))
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    #sub-microsecond cases are noisy, a regression has to persist when timed again
+    for _ in range(RECHECKS):
+        if not regressions:
+            break
+        regressions = compare(run(regressions, exact=True), baseline, args.threshold)
+    for name in regressions:
+        print("REGRESSION: {} is more than {:.0%} slower than the baseline".format(
+            name, args.threshold))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
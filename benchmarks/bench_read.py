@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+"""
+Compares the original csafe_cmd.read (benchmarks.original_read) with csafe_cmd.read
+with and without a compiled response plan, for every response type in csafe_dic.RESPONSES
+speedup is that of the planned read over the original
+run with: python -m benchmarks.bench_read
+"""
+
+import timeit
+from array import array
+
+from benchmarks import original_read
+from benchmarks.responses import (MONITOR_RESULTS, FORCEPLOT_RESULTS, WORKOUT_RESULTS,
+                                  ERG_RESULTS, sample_response)
+from pyrow.csafe import csafe_cmd, csafe_dic
+from pyrow.pyrow import MONITOR_COMMANDS, FORCEPLOT_COMMANDS, WORKOUT_COMMANDS, ERG_COMMANDS
+
+NUMBER = 2000
+
+#frames sent by PyErg and their responses
+FRAMES = [
+    ('get_monitor', MONITOR_COMMANDS, MONITOR_RESULTS),
+    ('get_monitor forceplot', MONITOR_COMMANDS + FORCEPLOT_COMMANDS,
+     MONITOR_RESULTS + FORCEPLOT_RESULTS),
+    ('get_workout', WORKOUT_COMMANDS, WORKOUT_RESULTS),
+    ('get_erg', ERG_COMMANDS, ERG_RESULTS),
+]
+
+
+def _cases():
+    for msgprop in filter(None, csafe_dic.RESPONSES):
+        arguments, results = sample_response(msgprop.name)
+        yield msgprop.name, arguments, results
+    for name, arguments, results in FRAMES:
+        yield name, arguments, results
+
+
+def main():
+    print("{:<36} {:>12} {:>12} {:>12} {:>8}".format(
+        "response", "original/s", "read/s", "plan/s", "speedup"))
+    for name, arguments, results in _cases():
+        transmission = csafe_cmd.write_response(results, status=1)
+        #the original reads the array of bytes returned by pyusb
+        report = array('B', transmission)
+        original = timeit.timeit(lambda: original_read.read(report), number=NUMBER)
+        generic = timeit.timeit(lambda: csafe_cmd.read(transmission), number=NUMBER)
+        planned = timeit.timeit(lambda: csafe_cmd.read(transmission, arguments), number=NUMBER)
+        print("{:<36} {:>12.0f} {:>12.0f} {:>12.0f} {:>7.2f}x".format(
+            name, NUMBER / original, NUMBER / generic, NUMBER / planned, original / planned))
+
+
+if __name__ == '__main__':
+    main()
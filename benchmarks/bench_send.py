@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+"""
+Times PyErg.send end to end, encoding, framing, pacing and decoding, against an
+emulated erg reached in memory and over a loopback socket, without a frame gap
+run with: python -m benchmarks.bench_send [--profile]
+"""
+
+import cProfile
+import pstats
+import socket
+import sys
+import threading
+import timeit
+
+from pyrow.emulator import ErgEmulator
+from pyrow.pyrow import PyErg
+from pyrow.transport import MemoryTransport, SocketTransport
+
+NUMBER = 2000
+
+
+def _memory():
+    return PyErg(MemoryTransport(ErgEmulator(mininterframe=0).respond)), None
+
+def _socket():
+    client, server = socket.socketpair()
+    thread = threading.Thread(target=ErgEmulator(mininterframe=0).serve, args=(server,))
+    thread.start()
+    def close():
+        client.close()
+        thread.join()
+        server.close()
+    return PyErg(SocketTransport(client)), close
+
+TRANSPORTS = [('memory', _memory), ('socket', _socket)]
+CALLS = [
+    ('get_status', lambda erg: erg.get_status()),
+    ('get_monitor', lambda erg: erg.get_monitor()),
+    ('get_monitor forceplot', lambda erg: erg.get_monitor(forceplot=True)),
+    ('get_workout', lambda erg: erg.get_workout()),
+]
+
+
+def main(profile=False):
+    print("{:<10} {:<24} {:>12}".format("transport", "call", "calls/s"))
+    for transport, connect in TRANSPORTS:
+        erg, close = connect()
+        erg.pacer.gap = 0.
+        try:
+            for name, call in CALLS:
+                if profile:
+                    profiler = cProfile.Profile()
+                    profiler.runcall(lambda: [call(erg) for _ in range(NUMBER)])
+                    print("{} {}".format(transport, name))
+                    pstats.Stats(profiler).sort_stats('cumulative').print_stats(10)
+                    continue
+                seconds = timeit.timeit(lambda: call(erg), number=NUMBER)
+                print("{:<10} {:<24} {:>12.0f}".format(transport, name, NUMBER / seconds))
+        finally:
+            if close is not None:
+                close()
+
+
+if __name__ == '__main__':
+    main('--profile' in sys.argv[1:])
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+#Copyright (c) 2011 Sam Gambrell, 2016-2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+"""
+Frozen copy of csafe_cmd.read as it was before response plans, the reference
+bench_read compares against
+Reads a private copy of csafe_dic.resp, which the original modifies for GETCAPS and GETID.
+"""
+
+import copy
+from warnings import warn
+
+from pyrow.csafe import csafe_dic
+
+_resp = copy.deepcopy(csafe_dic.resp)
+
+
+def __bytes2int(raw_bytes):
+    num_bytes = len(raw_bytes)
+    integer = 0
+
+    for k in range(num_bytes):
+        integer = (raw_bytes[k] << (8 * k)) | integer
+
+    return integer
+
+def __bytes2ascii(raw_bytes):
+    word = ""
+    for letter in raw_bytes:
+        word += chr(letter)
+
+    return word
+
+def __check_message(message):
+    #prime variables
+    i = 0
+    checksum = 0
+
+    #checksum and unstuff
+    while i < len(message):
+        #byte unstuffing
+        if message[i] == csafe_dic.Byte_Stuffing_Flag:
+            stuffvalue = message.pop(i + 1)
+            message[i] = 0xF0 | stuffvalue
+
+        #calculate checksum
+        checksum = checksum ^ message[i]
+
+        i = i + 1
+
+    #checks checksum
+    if checksum != 0:
+        warn("Checksum error")
+        return []
+
+    #remove checksum from  end of message
+    del message[-1]
+
+    return message
+
+#for recieving!!
+def read(transmission):
+    #prime variables
+    message = []
+    stopfound = False
+
+    #reportid = transmission[0]
+    startflag = transmission[1]
+
+    if startflag == csafe_dic.Extended_Frame_Start_Flag:
+        #destination = transmission[2]
+        #source = transmission[3]
+        j = 4
+    elif startflag == csafe_dic.Standard_Frame_Start_Flag:
+        j = 2
+    else:
+        warn("No Start Flag found.")
+        return []
+
+    while j < len(transmission):
+        if transmission[j] == csafe_dic.Stop_Frame_Flag:
+            stopfound = True
+            break
+        message.append(transmission[j])
+        j += 1
+
+    if not stopfound:
+        warn("No Stop Flag found.")
+        return []
+
+    message = __check_message(message)
+    status = message.pop(0)
+
+    #prime variables
+    response = {'CSAFE_GETSTATUS_CMD' : [status,]}
+    k = 0
+    wrapend = -1
+    wrapper = 0x0
+
+    #loop through complete frames
+    while k < len(message):
+        result = []
+
+        #get command name
+        msgcmd = message[k]
+        if k <= wrapend:
+            msgcmd = wrapper | msgcmd #check if still in wrapper
+        msgprop = _resp[msgcmd]
+        k = k + 1
+
+        #get data byte count
+        bytecount = message[k]
+        k = k + 1
+
+        #if wrapper command then gets command in wrapper
+        if msgprop[0] == 'CSAFE_SETUSERCFG1_CMD':
+            wrapper = message[k - 2] << 8
+            wrapend = k  + bytecount - 1
+            if bytecount: #If wrapper length != 0
+                msgcmd = wrapper | message[k]
+                msgprop = _resp[msgcmd]
+                k = k + 1
+                bytecount = message[k]
+                k = k + 1
+
+        #special case for capability code, response lengths differ based off capability code
+        if msgprop[0] == 'CSAFE_GETCAPS_CMD':
+            msgprop[1] = [1,] * bytecount
+
+        #special case for get id, response length is variable
+        if msgprop[0] == 'CSAFE_GETID_CMD':
+            msgprop[1] = [(-bytecount),]
+
+        #checking that the recieved data byte is the expected length, sanity check
+        if abs(sum(msgprop[1])) != 0 and bytecount != abs(sum(msgprop[1])):
+            warn("Warning: bytecount is an unexpected length")
+
+        #extract values
+        for numbytes in msgprop[1]:
+            raw_bytes = message[k:k + abs(numbytes)]
+            value = (__bytes2int(raw_bytes) if numbytes >= 0 else __bytes2ascii(raw_bytes))
+            result.append(value)
+            k = k + abs(numbytes)
+
+        response[msgprop[0]] = result
+
+    return response
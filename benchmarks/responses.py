@@ -0,0 +1,56 @@
+"""
+Synthetic erg responses timed by the benchmarks, lists of (command name, response values)
+for csafe_cmd.write_response
+Kept apart from the test fixtures so that the inputs of a stored baseline do not change
+with the tests.
+"""
+
+from pyrow.csafe import csafe_dic
+
+MONITOR_RESULTS = [
+    ('CSAFE_PM_GET_WORKTIME', [123456, 78]),
+    ('CSAFE_PM_GET_WORKDISTANCE', [54321, 3]),
+    ('CSAFE_GETCADENCE_CMD', [28, 0]),
+    ('CSAFE_GETPOWER_CMD', [215, 88]),
+    ('CSAFE_GETCALORIES_CMD', [102]),
+    ('CSAFE_GETHRCUR_CMD', [151]),
+]
+FORCEPLOT_RESULTS = [
+    ('CSAFE_PM_GET_FORCEPLOTDATA', [32] + [100 + 13 * k for k in range(16)]),
+    ('CSAFE_PM_GET_STROKESTATE', [2]),
+]
+WORKOUT_RESULTS = [
+    ('CSAFE_GETID_CMD', ['123']),
+    ('CSAFE_PM_GET_WORKOUTTYPE', [3]),
+    ('CSAFE_PM_GET_WORKOUTSTATE', [1]),
+    ('CSAFE_PM_GET_INTERVALTYPE', [255]),
+    ('CSAFE_PM_GET_WORKOUTINTERVALCOUNT', [0]),
+]
+ERG_RESULTS = [
+    ('CSAFE_GETVERSION_CMD', [22, 0, 5, 500, 164]),
+    ('CSAFE_GETSERIAL_CMD', ['430123456']),
+    ('CSAFE_GETCAPS_CMD', [96, 96, 50]),
+]
+HEARTBEAT_RESULTS = [('CSAFE_PM_GET_HEARTBEATDATA', [32] + [800 + k for k in range(16)])]
+#every response byte needs stuffing
+STUFFED_RESULTS = [
+    ('CSAFE_PM_GET_FORCEPLOTDATA', [0xF2] + [0xF1F0] * 16),
+    ('CSAFE_PM_GET_STROKESTATE', [0xF3]),
+]
+
+
+def sample_response(name):
+    """
+    Returns (arguments, results) for a single command with made up response values
+    """
+    command = csafe_dic.COMMANDS[name]
+    layout = csafe_dic.RESPONSES[command.respid].layout
+    arguments = [name] + [32 if varbytes else 0 for varbytes in command.argbytes]
+    if name == 'CSAFE_GETCAPS_CMD':
+        values = [96, 96, 50]
+    elif name == 'CSAFE_GETID_CMD':
+        values = ['12345']
+    else:
+        values = [('A' * -numbytes if numbytes < 0 else (0x5A5A5A5A >> (32 - 8 * numbytes)))
+                  for numbytes in layout]
+    return arguments, [(name, values)]
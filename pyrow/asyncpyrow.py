@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+# pylint: disable=C0103
+
+"""
+asyncpyrow.py
+asyncio interface to concept2 indoor rowers
+Frame gaps are awaited with asyncio.sleep and the blocking usb transfers of
+PyErg.transfer run in an executor, so one event loop can serve many ergs
+"""
+
+import asyncio
+import logging
+from collections import namedtuple
+
+from pyrow.csafe import csafe_cmd
+from pyrow.pyrow import (FORCEPLOT_COMMANDS, WORKOUT_COMMANDS, ERG_COMMANDS, SERIAL_COMMANDS,
+                         get_pretty, monitor_commands)
+from pyrow.samples import MonitorSample, ForcePlotSample, WorkoutSample
+
+logger = logging.getLogger(__name__)
+
+#kind is 'add', 'update' or 'remove'
+ErgEvent = namedtuple('ErgEvent', 'kind erg')
+
+
+class AsyncPyErg(object):
+    """
+    Awaitable counterpart of PyErg, wraps a PyErg
+    executor: runs the usb transfers, None for the default executor of the loop
+    fields: get_monitor fields polled when get_monitor is not given any, None for all
+    """
+    def __init__(self, pyerg, executor=None, fields=None):
+        self._pyerg = pyerg
+        self.pacer = pyerg.pacer
+        self._executor = executor
+        self.fields = fields
+        #one frame at a time per erg, created on the loop of the first send
+        self._lock = None
+
+    async def get_monitor(self, forceplot=False, pretty=False, fields=None):
+        """
+        Returns values from the monitor that relate to the current workout, see PyErg.get_monitor
+        """
+        monitor = (await self.get_monitor_sample(forceplot, fields)).as_dict()
+        return get_pretty(monitor, pretty)
+
+    async def get_monitor_sample(self, forceplot=False, fields=None):
+        """
+        Returns get_monitor values as a MonitorSample
+        """
+        if fields is None:
+            fields = self.fields
+        results = await self.send(monitor_commands(fields, forceplot))
+        return MonitorSample.from_results(results)
+
+    async def get_forceplot(self, pretty=False):
+        """
+        Returns force plot data and stroke state
+        """
+        forceplot = (await self.get_forceplot_sample()).as_dict()
+        return get_pretty(forceplot, pretty)
+
+    async def get_forceplot_sample(self):
+        """
+        Returns get_forceplot values as a ForcePlotSample
+        """
+        results = await self.send(FORCEPLOT_COMMANDS)
+        return ForcePlotSample.from_results(results)
+
+    async def get_workout(self, pretty=False):
+        """
+        Returns overall workout data
+        """
+        workoutdata = (await self.get_workout_sample()).as_dict()
+        return get_pretty(workoutdata, pretty)
+
+    async def get_workout_sample(self):
+        """
+        Returns get_workout values as a WorkoutSample
+        """
+        results = await self.send(WORKOUT_COMMANDS)
+        return WorkoutSample.from_results(results)
+
+    async def get_erg(self, pretty=False):
+        """
+        Returns all erg data that is not related to the workout, and learns the frame gap
+        """
+        results = await self.send(ERG_COMMANDS)
+        return get_pretty(self._pyerg._ergdata(results), pretty)
+
+    async def attach(self):
+        """
+        Identifies the erg and applies its cached metadata, see PyErg.attach
+        """
+        results = await self.send(SERIAL_COMMANDS)
+        metadata = self._pyerg._attached(results['CSAFE_GETSERIAL_CMD'][0])
+        if metadata is None:
+            await self.get_erg()
+            metadata = self._pyerg.metadata
+        return metadata
+
+    async def detach(self):
+        """
+        Records the frame gap in the metadata and releases the connection, see PyErg.detach
+        """
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self._executor, self._pyerg.detach)
+
+    async def set_workout(self, **kwargs):
+        """
+        Sets the workout, takes the keyword arguments of PyErg.set_workout
+        """
+        await self.send(['CSAFE_RESET_CMD'])
+        await self.send(self._pyerg._workout_command(**kwargs))
+
+    async def send(self, message):
+        """
+        Converts and sends message to erg; receives, converts, and returns ergs response
+        Frames are planned as in PyErg.send
+        """
+        loop = asyncio.get_event_loop()
+        frames = csafe_cmd.plan_frames(message, self._pyerg.maxframe)
+        response = {}
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            for frame in frames:
+                delay = self.pacer.delay()
+                if delay:
+                    await asyncio.sleep(delay)
+                    self.pacer.waited(delay)
+                results = await loop.run_in_executor(self._executor, self._pyerg.transfer, frame)
+                if len(frames) == 1:
+                    return results
+                response.update(results)
+        return response
+
+
+class _EventStream(object):
+    """
+    Async iterator of the ErgEvents of an AsyncErgManager, ends when the manager stops
+    """
+    def __init__(self, manager):
+        self._manager = manager
+        self._queue = asyncio.Queue()
+
+    def put(self, event):
+        self._queue.put_nowait(event)
+
+    def close(self):
+        """
+        Stops receiving events, the iterator ends after the queued events
+        """
+        if self in self._manager._streams:
+            self._manager._streams.remove(self)
+        self._queue.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        event = await self._queue.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+
+class AsyncErg(object):
+    """
+    An erg polled by an AsyncErgManager
+    """
+    def __init__(self, device, pyerg, rate=1, fields=None, metadata=None):
+        self._device = device
+        self.pyerg = pyerg
+        #metadata.ErgMetadata, the name is kept in it when the erg is removed
+        self.metadata = metadata
+        self.id = device.__repr__()
+        self.name = device.__repr__()
+        if metadata is not None and metadata.name is not None:
+            self.name = metadata.name
+        self.data = {}
+        #latest samples, see pyrow.samples
+        self.monitor = None
+        self.workout = None
+        self.rate = rate
+        self.fields = fields
+        #exception that ended the polling of a removed erg
+        self.error = None
+        self._task = None
+
+    def __repr__(self):
+        return self.name
+
+    async def set_workout(self, **kwargs):
+        await self.pyerg.set_workout(**kwargs)
+
+
+class AsyncErgManager(object):
+    """
+    Finds and polls ergs from one event loop
+    Events are delivered by iterating over events(), or the manager itself:
+        async for event in manager:
+            if event.kind == 'update': ...
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, pyrow, *, check_rate=2, update_rate=0.5, executor=None, fields=None):
+        """
+        pyrow: module providing find and PyErg, such as pyrow.pyrow
+        executor: runs discovery and usb transfers, None for the default executor
+        fields: the get_monitor fields polled, all including the force plot if None
+        """
+        self._pyrow = pyrow
+        self.check_rate = check_rate
+        self.update_rate = update_rate
+        self._executor = executor
+        self.fields = fields
+
+        self._devices = []
+        self.ergs = []
+        self._streams = []
+        self._checker = None
+        self.exit_requested = False
+
+    def start(self):
+        """
+        Starts finding and polling ergs on the current event loop
+        """
+        self.exit_requested = False
+        self._checker = asyncio.ensure_future(self._erg_checker())
+
+    async def stop(self):
+        """
+        Stops all polling and ends the event iterators
+        """
+        self.exit_requested = True
+        tasks = [self._checker] + [_erg._task for _erg in self.ergs]
+        for task in tasks:
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*[task for task in tasks if task is not None],
+                             return_exceptions=True)
+        for stream in list(self._streams):
+            stream.close()
+
+    def events(self):
+        """
+        Returns a new async iterator of ErgEvents
+        """
+        stream = _EventStream(self)
+        self._streams.append(stream)
+        return stream
+
+    def __aiter__(self):
+        return self.events()
+
+    async def set_workout(self, **kwargs):
+        await asyncio.gather(*[_erg.set_workout(**kwargs) for _erg in self.ergs])
+
+    def get_names(self):
+        return [_erg.name for _erg in self.ergs]
+
+    def _emit(self, kind, erg):
+        event = ErgEvent(kind, erg)
+        for stream in self._streams:
+            stream.put(event)
+
+    async def _erg_checker(self):
+        loop = asyncio.get_event_loop()
+        while not self.exit_requested:
+            try:
+                devices = await loop.run_in_executor(self._executor,
+                                                     lambda: list(self._pyrow.find()))
+            except asyncio.CancelledError:
+                raise
+            except Exception: # pylint: disable=broad-except
+                #tried again after check_rate
+                logger.exception("Finding ergs failed")
+                devices = []
+            for device in devices:
+                if device.__repr__() in self._devices:
+                    continue
+                try:
+                    pyerg = await loop.run_in_executor(self._executor, self._pyrow.PyErg, device)
+                    pyerg = AsyncPyErg(pyerg, self._executor)
+                    #a known erg keeps its frame gap and name
+                    metadata = await pyerg.attach()
+                except asyncio.CancelledError:
+                    raise
+                except Exception: # pylint: disable=broad-except
+                    #not recorded in _devices, so it is tried again when found
+                    logger.exception("Opening erg %r failed", device)
+                    continue
+                self._devices.append(device.__repr__())
+                new_erg = AsyncErg(device, pyerg, self.update_rate, self.fields, metadata)
+                self.ergs.append(new_erg)
+                new_erg._task = asyncio.ensure_future(self._erg_monitor(new_erg))
+                self._emit('add', new_erg)
+            await asyncio.sleep(self.check_rate)
+
+    async def _erg_monitor(self, erg):
+        loop = asyncio.get_event_loop()
+        try:
+            while not self.exit_requested:
+                deadline = loop.time() + erg.rate
+                erg.monitor = await erg.pyerg.get_monitor_sample(forceplot=erg.fields is None,
+                                                                 fields=erg.fields)
+                erg.workout = await erg.pyerg.get_workout_sample()
+                erg.monitor.as_dict(into=erg.data)
+                erg.workout.as_dict(into=erg.data)
+                get_pretty(erg.data, True)
+                self._emit('update', erg)
+                await asyncio.sleep(max(deadline - loop.time(), 0))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e: # pylint: disable=broad-except
+            if not isinstance(e, ConnectionError):
+                logger.exception("Polling erg %r failed", erg)
+            #forget the erg so that it is added again when found
+            erg.error = e
+            if erg.metadata is not None:
+                erg.metadata.name = erg.name
+            try:
+                await erg.pyerg.detach()
+            except Exception: # pylint: disable=broad-except
+                logger.debug("Closing erg %r failed", erg, exc_info=True)
+            self.ergs.remove(erg)
+            self._devices.remove(erg.id)
+            self._emit('remove', erg)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+"""
+capture.py
+Assembles complete force curves of each stroke from back to back force plot reads
+"""
+
+import time
+
+import numpy as np
+
+from pyrow.pyrow import FORCEPLOT_COMMANDS, ERG_MAPPING
+
+DRIVE = ERG_MAPPING['strokestate'].index('Drive')
+
+
+class Stroke(object):
+    """
+    Force curve of one stroke
+    curve: int16 numpy array of the force plot points of the drive
+    start, end: host time.time() of the first and last force plot read of the stroke
+    monitor: MonitorSample polled when the drive ended, None if not polled
+    """
+    __slots__ = ('curve', 'start', 'end', 'monitor')
+
+    def __init__(self, curve, start, end, monitor=None):
+        self.curve = curve
+        self.start = start
+        self.end = end
+        self.monitor = monitor
+
+    def __repr__(self):
+        return "Stroke(points={}, start={!r}, end={!r})".format(
+            len(self.curve), self.start, self.end)
+
+
+class ForceCurveCapture(object):
+    """
+    Reads force plot blocks of a PyErg back to back, only waiting for the frame gap,
+    and assembles the points read during each drive in a preallocated ring buffer
+    A Stroke is emitted when the stroke state leaves the drive, the block read then holds
+    the end of the curve.
+    pyerg: PyErg, or anything with its send and get_monitor_sample
+    capacity: points in the ring buffer, the longest curve kept; points of longer drives
+    are counted in dropped
+    callback: called with every Stroke
+    monitor: poll a MonitorSample when a drive ends, monitor_fields are its fields
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, pyerg, capacity=2048, callback=None, monitor=True, monitor_fields=None):
+        self._pyerg = pyerg
+        self._ring = np.zeros(capacity, dtype=np.int16)
+        #the decoder returns unsigned words, written through a view their bits are int16
+        self._words = self._ring.view(np.uint16)
+        self.capacity = capacity
+        self.callback = callback
+        self.monitor = monitor
+        self.monitor_fields = monitor_fields
+        self._head = 0
+        #ring position, length and host time of the start of the drive being captured
+        self._start = None
+        self._length = 0
+        self._started = None
+        self.strokes = 0
+        self.reads = 0
+        self.dropped = 0
+        self.exit_requested = False
+
+    @property
+    def in_drive(self):
+        return self._start is not None
+
+    def read(self):
+        """
+        Reads one force plot block, returns a Stroke if a drive ended, else None
+        """
+        results = self._pyerg.send(FORCEPLOT_COMMANDS)
+        return self.feed(results, time.time())
+
+    def feed(self, results, timestamp):
+        """
+        Adds the response to FORCEPLOT_COMMANDS received at host time timestamp,
+        returns a Stroke if a drive ended, else None
+        """
+        self.reads += 1
+        data = results['CSAFE_PM_GET_FORCEPLOTDATA']
+        points = data[0] // 2
+        drive = results['CSAFE_PM_GET_STROKESTATE'][0] == DRIVE
+
+        if drive and self._start is None:
+            self._start = self._head
+            self._length = 0
+            self._started = timestamp
+        if self._start is None:
+            #points between drives
+            return None
+
+        self._write(data, points)
+        if drive:
+            return None
+        return self._end(timestamp)
+
+    def _write(self, data, points):
+        room = self.capacity - self._length
+        if points > room:
+            self.dropped += points - room
+            points = room
+        head = self._head
+        first = min(points, self.capacity - head)
+        self._words[head:head + first] = data[1:1 + first]
+        if first < points:
+            self._words[:points - first] = data[1 + first:1 + points]
+        self._head = (head + points) % self.capacity
+        self._length += points
+
+    def _end(self, timestamp):
+        start, length = self._start, self._length
+        self._start = None
+        curve = np.empty(length, dtype=np.int16)
+        first = min(length, self.capacity - start)
+        curve[:first] = self._ring[start:start + first]
+        curve[first:] = self._ring[:length - first]
+        monitor = None
+        if self.monitor:
+            monitor = self._pyerg.get_monitor_sample(fields=self.monitor_fields)
+        stroke = Stroke(curve, self._started, timestamp, monitor)
+        self.strokes += 1
+        if self.callback is not None:
+            self.callback(stroke)
+        return stroke
+
+    def capture_stroke(self):
+        """
+        Reads until a drive ends and returns its Stroke, None if stopped first
+        """
+        while not self.exit_requested:
+            stroke = self.read()
+            if stroke is not None:
+                return stroke
+        return None
+
+    def run(self, strokes=None):
+        """
+        Captures strokes, passing each to callback, until stop() or the number of strokes
+        """
+        self.exit_requested = False
+        captured = 0
+        while not self.exit_requested and (strokes is None or captured < strokes):
+            if self.capture_stroke() is not None:
+                captured += 1
+
+    def stop(self):
+        """
+        Stops run and capture_stroke after the current read
+        """
+        self.exit_requested = True
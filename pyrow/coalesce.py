@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+"""
+coalesce.py
+Merges the command lists sent to one erg by several threads into shared frames
+"""
+
+import threading
+import time
+
+from pyrow.csafe import csafe_cmd
+
+
+class _Batch(object):
+    """
+    Commands gathered during one frame gap, and their response once sent
+    """
+    __slots__ = ('commands', 'args', 'done', 'response', 'error')
+
+    def __init__(self):
+        self.commands = []
+        #command name to its command list, commands are only merged if their arguments match
+        self.args = {}
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+    def accepts(self, commands):
+        return all(self.args.get(command[0], command) == command for command in commands)
+
+    def add(self, commands):
+        for command in commands:
+            if command[0] not in self.args:
+                self.args[command[0]] = command
+                self.commands.extend(command)
+
+    def result(self, commands):
+        """
+        Waits for the response and returns the slice requested by commands
+        """
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        response = self.response
+        if not response:
+            return response
+        result = {}
+        if 'CSAFE_GETSTATUS_CMD' in response:
+            result['CSAFE_GETSTATUS_CMD'] = response['CSAFE_GETSTATUS_CMD']
+        for command in commands:
+            if command[0] in response:
+                result[command[0]] = response[command[0]]
+        return result
+
+
+class Coalescer(object):
+    """
+    Coalesces command lists sent to one erg from several threads
+    The first caller of a frame gap waits for the gap, and the commands of every
+    caller arriving meanwhile are merged, duplicates removed, and sent together.
+    Each caller receives the status and the responses to its own commands.
+    Commands repeated with different arguments wait for the next frame gap.
+    send: sends a command list and returns the merged response, e.g. PyErg._send
+    pacer: pacing.FramePacer of the erg
+    window: minimum seconds the first caller waits for others, even if the gap has passed
+    """
+    def __init__(self, send, pacer, window=0.):
+        self._send = send
+        self._pacer = pacer
+        self.window = window
+        self._lock = threading.Lock()
+        #only one batch is sent at a time
+        self._sending = threading.Lock()
+        self._batch = None
+        self.requests = 0
+        self.batches = 0
+
+    def send(self, message):
+        """
+        Sends message with the messages of other callers, returns the response to message
+        """
+        commands = [tuple(command) for command in csafe_cmd.command_lists(message)]
+        with self._lock:
+            self.requests += 1
+            batch = self._batch
+            leader = batch is None or not batch.accepts(commands)
+            if leader:
+                batch = _Batch()
+                self._batch = batch
+            batch.add(commands)
+
+        if leader:
+            self._lead(batch)
+        return batch.result(commands)
+
+    def _lead(self, batch):
+        with self._sending:
+            #other callers join the batch until the frame gap has passed
+            delay = max(self._pacer.delay(), self.window)
+            if delay:
+                time.sleep(delay)
+                self._pacer.waited(delay)
+            with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+                self.batches += 1
+            try:
+                batch.response = self._send(batch.commands)
+            except Exception as e: # pylint: disable=broad-except
+                batch.error = e
+            batch.done.set()
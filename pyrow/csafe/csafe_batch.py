@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+"""
+csafe_batch.py
+Decodes many recorded usb reports of the same layout at once with numpy
+"""
+
+import numpy as np
+
+from pyrow.csafe import csafe_cmd, csafe_dic
+
+#little endian integer columns of each width
+_DTYPES = {1: np.dtype('u1'), 2: np.dtype('<u2'), 4: np.dtype('<u4')}
+
+
+def unframe_batch(reports):
+    """
+    Unstuffs and checks a 2-D uint8 array of usb reports, one report per row
+    Returns (messages, lengths, valid):
+    messages: rows of unstuffed messages (status first, checksum last), zero padded
+    lengths: message length of each row, without the checksum
+    valid: rows with a standard start flag, a stop flag and a correct checksum
+    """
+    reports = np.asarray(reports, dtype=np.uint8)
+    if reports.ndim != 2:
+        raise ValueError("reports must be a 2-D array")
+    rows, columns = reports.shape
+    cols = np.arange(columns)
+
+    valid = reports[:, 1] == csafe_dic.Standard_Frame_Start_Flag
+
+    #frame is between the start flag and the first stop flag
+    stops = (reports == csafe_dic.Stop_Frame_Flag) & (cols >= 2)
+    valid &= stops.any(axis=1)
+    stop = np.where(valid, stops.argmax(axis=1), 2)
+    inframe = (cols >= 2) & (cols < stop[:, None])
+
+    #frames without stuffing are copied as they are
+    messages = np.zeros((rows, columns), dtype=np.uint8)
+    messages[:, :-2] = np.where(inframe, reports, 0)[:, 2:]
+    lengths = stop - 3
+
+    #byte unstuffing, drop the stuffing flags and restore the flag following each
+    stuffing = inframe & (reports == csafe_dic.Byte_Stuffing_Flag)
+    stuffedrows = np.nonzero(stuffing.any(axis=1))[0]
+    if len(stuffedrows):
+        stuffing = stuffing[stuffedrows]
+        frames = reports[stuffedrows]
+        stuffed = np.zeros_like(stuffing)
+        stuffed[:, 1:] = stuffing[:, :-1]
+        values = np.where(stuffed, frames | 0xF0, frames)
+        keep = inframe[stuffedrows] & ~stuffing
+        position = np.cumsum(keep, axis=1) - 1
+
+        unstuffed = np.zeros((len(stuffedrows), columns), dtype=np.uint8)
+        rowindex, colindex = np.nonzero(keep)
+        unstuffed[rowindex, position[rowindex, colindex]] = values[rowindex, colindex]
+        messages[stuffedrows] = unstuffed
+        lengths[stuffedrows] = keep.sum(axis=1) - 1
+
+    #checksum of the message including the checksum is 0
+    valid &= lengths >= 1
+    valid &= np.bitwise_xor.reduce(messages, axis=1) == 0
+
+    return messages, lengths, valid
+
+def decode_batch(reports, arguments):
+    """
+    Decodes a 2-D uint8 array of usb reports, all responses to the command list arguments
+    Uses the same compiled response plan as csafe_cmd.read
+    Returns (columns, valid):
+    columns: dictionary of command name to a 2-D array with a column per returned value,
+    integers are unsigned of their own width (uint64 for odd widths) and ASCII values are bytes
+    valid: rows which decoded, rows with a different layout (such as a variable
+    length response of another length) are invalid and zero
+    """
+    messages, lengths, valid = unframe_batch(reports)
+    columns = {}
+    if not valid.any():
+        return columns, valid
+
+    #layout of the most common message length
+    length = int(np.bincount(lengths[valid]).argmax())
+    plan = csafe_cmd.response_plan(arguments, length)
+    if plan is None:
+        raise ValueError("No response layout of length {} for {}".format(length, arguments))
+    valid &= lengths == length
+
+    offsets = plan.offsets
+    for index, expected in plan.checks:
+        valid &= messages[:, offsets[index][0]] == expected
+    messages[~valid] = 0
+
+    def _integers(offset, numbytes):
+        if numbytes in _DTYPES:
+            raw = np.ascontiguousarray(messages[:, offset:offset + numbytes])
+            return raw.view(_DTYPES[numbytes])[:, 0]
+        #little endian, other widths
+        shifts = np.arange(numbytes, dtype=np.uint64) * np.uint64(8)
+        raw = messages[:, offset:offset + numbytes].astype(np.uint64)
+        return np.left_shift(raw, shifts).sum(axis=1, dtype=np.uint64)
+
+    def _ascii(offset, numbytes):
+        if not numbytes:
+            return np.zeros(len(messages), dtype='S1')
+        raw = np.ascontiguousarray(messages[:, offset:offset + numbytes])
+        return raw.view('S{}'.format(numbytes))[:, 0]
+
+    columns['CSAFE_GETSTATUS_CMD'] = _integers(*offsets[0])[:, None]
+    for name, start, stop, converters in plan.fields:
+        values = []
+        for position, index in enumerate(range(start, stop)):
+            if converters is not None and converters[position] is csafe_cmd._bytes2latin:
+                values.append(_ascii(*offsets[index]))
+            else:
+                values.append(_integers(*offsets[index]))
+        columns[name] = np.stack(values, axis=1)
+
+    return columns, valid
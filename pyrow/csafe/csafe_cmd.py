@@ -5,21 +5,46 @@
 # NOTE: This code has not been thoroughly tested and may not function as advertised.
 # Please report and findings to the author so that they may be addressed in a stable release.
 
+import re
+import struct
+from array import array
 from warnings import warn
+
 from pyrow.csafe import csafe_dic
 
-def __int2bytes(numbytes, integer):
+REPORT_SIZES = ((0x01, 21), (0x04, 63), (0x02, 121))
+MAX_FRAME_LENGTH = 96 #longest frame the PM accepts, start & stop flag included
+
+#byte stuffing, flags 0xF0 - 0xF3 are sent as the stuffing flag followed by 0x00 - 0x03
+_ESCAPES = {bytes((flag,)): bytes((csafe_dic.Byte_Stuffing_Flag, flag & 0x3))
+            for flag in range(0xF0, 0xF4)}
+_UNESCAPES = {escape: flag for flag, escape in _ESCAPES.items()}
+_STUFF_RE = re.compile(b'[\xf0-\xf3]')
+_UNSTUFF_RE = re.compile(b'\xf3[\x00-\x03]')
+_STOP_RE = re.compile(bytes((csafe_dic.Stop_Frame_Flag,)))
+_START_RE = re.compile(b'[\xf0\xf1]')
+_FLAG_RE = re.compile(b'[\xf0-\xf2]')
+
+#immutable command tables, shared by all threads
+_COMMANDS = csafe_dic.COMMANDS
+_RESPONSES = csafe_dic.RESPONSES
+
+#finished reports for recently sent command lists, keyed by tuple(arguments)
+_report_cache = {}
+_REPORT_CACHE_SIZE = 256
+#the same reports as arrays, copied into report buffers by write_into
+_report_arrays = {}
+#compiled frame templates, keyed by the tuple of command names
+_template_cache = {}
+_frame_plan_cache = {}
+
+def _int2bytes(numbytes, integer):
     if not 0 <= integer <= 2 ** (8 * numbytes):
         raise ValueError("Integer is outside the allowable range")
 
-    byte = []
-    for k in range(numbytes):
-        calcbyte = (integer >> (8 * k)) & 0xFF
-        byte.append(calcbyte)
-
-    return byte
+    return (integer & ((1 << (8 * numbytes)) - 1)).to_bytes(numbytes, 'little')
 
-def __bytes2int(raw_bytes):
+def _bytes2int(raw_bytes):
     num_bytes = len(raw_bytes)
     integer = 0
 
@@ -28,161 +53,324 @@ def __bytes2int(raw_bytes):
 
     return integer
 
-def __bytes2ascii(raw_bytes):
+def _bytes2ascii(raw_bytes):
     word = ""
     for letter in raw_bytes:
         word += chr(letter)
 
     return word
 
-#for sending
-def write(arguments):
+def _stuff(raw_bytes):
+    """
+    Returns raw_bytes with frame flags (0xF0 - 0xF3) escaped, in a single pass
+    """
+    return _STUFF_RE.sub(_stuff_escape, raw_bytes)
+
+def _stuff_escape(match):
+    return _ESCAPES[match.group()]
+
+def _unstuff(raw_bytes):
+    """
+    Returns raw_bytes with escaped frame flags restored, in a single pass
+    """
+    return _UNSTUFF_RE.sub(_unstuff_escape, raw_bytes)
+
+def _unstuff_escape(match):
+    return _UNESCAPES[match.group()]
+
+def _xor(raw_bytes):
+    """
+    Returns the xor of all bytes in raw_bytes (the CSAFE checksum)
+    The bytes are read as one integer, which is folded in half until one byte is left
+    """
+    value = int.from_bytes(raw_bytes, 'little')
+    width = 1
+    while width < len(raw_bytes):
+        width <<= 1
+    while width > 1:
+        width >>= 1
+        value = (value >> (8 * width)) ^ (value & ((1 << (8 * width)) - 1))
+    return value
+
+def _split_arguments(arguments):
+    """
+    Splits a command list into the tuple of command names and the list of argument values
+    """
+    names = []
+    values = []
+    i = 0
+    while i < len(arguments):
+        name = arguments[i]
+        numargs = len(_COMMANDS[name].argbytes)
+        names.append(name)
+        values.extend(arguments[i + 1:i + 1 + numargs])
+        i += 1 + numargs
+    if len(values) != sum(len(_COMMANDS[name].argbytes) for name in names):
+        raise IndexError("Missing command arguments")
+    return tuple(names), values
+
+def _frame(body, checksum, maxresponse):
+    """
+    Wraps a stuffed message body in start/stop flags and pads it into a usb report
+    """
+    message = bytearray((csafe_dic.Standard_Frame_Start_Flag,))
+    message += body
+    message += _stuff(bytes((checksum,)))
+    message.append(csafe_dic.Stop_Frame_Flag)
+
+    #check for frame size (96 bytes)
+    if len(message) > MAX_FRAME_LENGTH:
+        warn("Message is too long: " + str(len(message)))
+
+    #report IDs
+    maxmessage = max(len(message) + 1, maxresponse)
+
+    for report_id, size in REPORT_SIZES:
+        if maxmessage <= size or (report_id == 0x02 and len(message) + 1 <= size):
+            if maxresponse > size:
+                warn("Response may be too long to recieve.  Max possible length " +
+                     str(maxresponse))
+            return bytes((report_id,)) + message + bytes(size - len(message) - 1)
+
+    warn("Message too long.  Message length " + str(len(message)))
+    return b''
+
+
+class _Template(object):
+    """
+    A command list compiled into stuffed static chunks with argument slots between them
+    """
+    __slots__ = ('chunks', 'slots', 'checksum', 'maxresponse')
+
+    def __init__(self, chunks, slots, checksum, maxresponse):
+        self.chunks = chunks
+        self.slots = slots
+        self.checksum = checksum
+        self.maxresponse = maxresponse
+
+    def body(self, values):
+        """
+        Returns the stuffed message body and checksum with the argument values patched in
+        """
+        if not self.slots:
+            return self.chunks[0], self.checksum
+
+        checksum = self.checksum
+        parts = [self.chunks[0]]
+        for k, numbytes in enumerate(self.slots):
+            raw_bytes = _int2bytes(numbytes, values[k])
+            checksum ^= _xor(raw_bytes)
+            parts.append(_stuff(raw_bytes))
+            parts.append(self.chunks[k + 1])
+        return b''.join(parts), checksum
+
+    def fill(self, values):
+        """
+        Returns the finished report with the argument values patched into the slots
+        """
+        return _frame(*self.body(values), maxresponse=self.maxresponse)
+
+    def fits(self, values, maxframe=MAX_FRAME_LENGTH):
+        """
+        Returns True if the frame is at most maxframe bytes long, fits in a usb report
+        and the largest possible response fits in the largest report
+        """
+        body, checksum = self.body(values)
+        #start flag, stuffed checksum and stop flag
+        length = len(body) + (3 if checksum < 0xF0 or checksum > 0xF3 else 4)
+        return (length <= maxframe and length + 1 <= REPORT_SIZES[-1][1]
+                and self.maxresponse <= REPORT_SIZES[-1][1])
+
+
+def _compile(names):
+    """
+    Compiles a tuple of command names into a _Template
+    Argument slots are marked in the message as (numbytes,) tuples
+    """
+    def _length(tokens):
+        return sum(1 if isinstance(token, int) else token[0] for token in tokens)
 
     #priming variables
-    i = 0
     message = []
     wrapper = 0
     wrapped = []
     maxresponse = 3 #start & stop flag & status
 
-    #loop through all arguments
-    while i < len(arguments):
+    for name in names:
+        cmdprop = _COMMANDS[name]
 
-        arg = arguments[i]
-        cmdprop = csafe_dic.cmds[arg]
-        command = []
+        #add command id
+        command = [cmdprop.id]
 
         #load variables if command is a Long Command
-        if len(cmdprop[1]) != 0:
-            for varbytes in cmdprop[1]:
-                i += 1
-                intvalue = arguments[i]
-                value = __int2bytes(varbytes, intvalue)
-                command.extend(value)
-
+        if cmdprop.argbytes:
             #data byte count
-            cmdbytes = len(command)
-            command.insert(0, cmdbytes)
-
-        #add command id
-        command.insert(0, cmdprop[0])
+            command.append(cmdprop.nbytes)
+            command.extend((varbytes,) for varbytes in cmdprop.argbytes)
 
         #closes wrapper if required
-        if len(wrapped) > 0 and (len(cmdprop) < 3 or cmdprop[2] != wrapper):
-            wrapped.insert(0, len(wrapped)) #data byte count for wrapper
-            wrapped.insert(0, wrapper) #wrapper command id
-            message.extend(wrapped) #adds wrapper to message
+        if len(wrapped) > 0 and cmdprop.wrapper != wrapper:
+            message.extend([wrapper, _length(wrapped)] + wrapped)
             wrapped = []
             wrapper = 0
 
         #create or extend wrapper
-        if len(cmdprop) == 3: #checks if command needs a wrapper
-            if wrapper == cmdprop[2]: #checks if currently in the same wrapper
+        if cmdprop.wrapper: #checks if command needs a wrapper
+            if wrapper == cmdprop.wrapper: #checks if currently in the same wrapper
                 wrapped.extend(command)
             else: #creating a new wrapper
                 wrapped = command
-                wrapper = cmdprop[2]
+                wrapper = cmdprop.wrapper
                 maxresponse += 2
 
             command = [] #clear command to prevent it from getting into message
 
         #max message length
-        cmdid = cmdprop[0] | (wrapper << 8)
-        #double return to account for stuffing
-        maxresponse += abs(sum(csafe_dic.resp[cmdid][1])) * 2 + 1
+        maxresponse += cmdprop.maxresponse
 
         #add completed command to final message
         message.extend(command)
 
-        i += 1
-
     #closes wrapper if message ended on it
     if len(wrapped) > 0:
-        wrapped.insert(0, len(wrapped)) #data byte count for wrapper
-        wrapped.insert(0, wrapper) #wrapper command id
-        message.extend(wrapped) #adds wrapper to message
-
-    #prime variables
-    checksum = 0x0
-    j = 0
-
-    #checksum and byte stuffing
-    while j < len(message):
-        #calculate checksum
-        checksum = checksum ^ message[j]
-
-        #byte stuffing
-        if 0xF0 <= message[j] <= 0xF3:
-            message.insert(j, csafe_dic.Byte_Stuffing_Flag)
-            j += 1
-            message[j] = message[j] & 0x3
-
-        j += 1
-
-    #add checksum to end of message
-    message.append(checksum)
+        message.extend([wrapper, _length(wrapped)] + wrapped)
+
+    #split into pre-stuffed static chunks and argument slots
+    chunks = []
+    slots = []
+    chunk = bytearray()
+    for token in message:
+        if isinstance(token, int):
+            chunk.append(token)
+        else:
+            chunks.append(chunk)
+            slots.append(token[0])
+            chunk = bytearray()
+    chunks.append(chunk)
+    checksum = _xor(b''.join(chunks))
+
+    return _Template(tuple(_stuff(chunk) for chunk in chunks), tuple(slots),
+                     checksum, maxresponse)
 
-    #start & stop frames
-    message.insert(0, csafe_dic.Standard_Frame_Start_Flag)
-    message.append(csafe_dic.Stop_Frame_Flag)
-
-    #check for frame size (96 bytes)
-    if len(message) > 96:
-        warn("Message is too long: " + len(message))
-
-    #report IDs
-    maxmessage = max(len(message) + 1, maxresponse)
-
-    if maxmessage <= 21:
-        message.insert(0, 0x01)
-        message += [0] * (21 - len(message))
-    elif maxmessage <= 63:
-        message.insert(0, 0x04)
-        message += [0] * (63 - len(message))
-    elif (len(message) + 1) <= 121:
-        message.insert(0, 0x02)
-        message += [0] * (121 - len(message))
-        if maxresponse > 121:
-            warn("Response may be too long to recieve.  Max possible length " + str(maxresponse))
-    else:
-        warn("Message too long.  Message length " + str(len(message)))
-        message = []
-
-    return message
-
-
-def __check_message(message):
-    #prime variables
+#for sending
+def _template(names):
+    template = _template_cache.get(names)
+    if template is None:
+        template = _compile(names)
+        _template_cache[names] = template
+    return template
+
+
+def command_lists(arguments):
+    """
+    Splits a command list into a command list per command
+    """
+    commands = []
     i = 0
-    checksum = 0
-
-    #checksum and unstuff
-    while i < len(message):
-        #byte unstuffing
-        if message[i] == csafe_dic.Byte_Stuffing_Flag:
-            stuffvalue = message.pop(i + 1)
-            message[i] = 0xF0 | stuffvalue
-
-        #calculate checksum
-        checksum = checksum ^ message[i]
-
-        i = i + 1
-
-    #checks checksum
-    if checksum != 0:
-        warn("Checksum error")
-        return []
-
-    #remove checksum from  end of message
-    del message[-1]
+    while i < len(arguments):
+        numargs = len(_COMMANDS[arguments[i]].argbytes)
+        commands.append(list(arguments[i:i + 1 + numargs]))
+        i += 1 + numargs
+    return commands
+
+
+def _fits(arguments, maxframe=MAX_FRAME_LENGTH):
+    names, values = _split_arguments(arguments)
+    return _template(names).fits(values, maxframe)
+
+
+def plan_frames(arguments, maxframe=MAX_FRAME_LENGTH):
+    """
+    Packs a command list into the fewest frames, keeping the command order
+    Each frame is at most maxframe bytes long, such as the maxrx a monitor reports,
+    fits in a usb report and its largest possible response fits in the largest report,
+    commands sharing a PM3 wrapper are grouped within each frame
+    A command which does not fit on its own is given its own frame
+    Returns a tuple of command lists (tuples), plans are cached by command list
+    """
+    key = tuple(arguments)
+    frames = _frame_plan_cache.get((key, maxframe))
+    if frames is not None:
+        return frames
+
+    if _fits(arguments, maxframe):
+        frames = (key,)
+    else:
+        frames = []
+        current = []
+        for command in command_lists(arguments):
+            if current and not _fits(current + command, maxframe):
+                frames.append(tuple(current))
+                current = []
+            current += command
+        if current:
+            frames.append(tuple(current))
+        frames = tuple(frames)
+
+    if len(_frame_plan_cache) >= _REPORT_CACHE_SIZE:
+        _frame_plan_cache.clear()
+    _frame_plan_cache[key, maxframe] = frames
+    return frames
 
-    return message
 
-#for recieving!!
-def read(transmission):
-    #prime variables
-    message = []
-    stopfound = False
+def write(arguments):
+    """
+    Converts a command list into a usb report
+    Reports are cached by command list, and each distinct list of command names
+    is compiled once into a template which only has its argument bytes patched
+    """
+    key = tuple(arguments)
+    report = _report_cache.get(key)
+    if report is not None:
+        return report
+
+    names, values = _split_arguments(arguments)
+    report = _template(names).fill(values)
+    if report:
+        if len(_report_cache) >= _REPORT_CACHE_SIZE:
+            _report_cache.clear()
+        _report_cache[key] = report
+    return report
+
+
+def report_buffers():
+    """
+    Returns preallocated usb report buffers, a dictionary of report size to array('B')
+    pyusb writes and reads arrays in place, without copying them
+    """
+    return {size: array('B', bytes(size)) for _, size in REPORT_SIZES}
+
+
+def write_into(arguments, buffers):
+    """
+    Converts a command list into a usb report written into the buffer of its size
+    buffers is a dictionary of report size to array('B'), see report_buffers
+    Returns the filled buffer, or None if the message is too long
+    """
+    key = tuple(arguments)
+    report = _report_arrays.get(key)
+    if report is None:
+        report = write(arguments)
+        if not report:
+            return None
+        report = array('B', report)
+        if len(_report_arrays) >= _REPORT_CACHE_SIZE:
+            _report_arrays.clear()
+        _report_arrays[key] = report
+    buffer = buffers[len(report)]
+    #array to array slice assignment copies in place
+    buffer[:] = report
+    return buffer
+
+
+def _unframe(transmission):
+    """
+    Returns the unstuffed message (status first, checksum removed) of a usb report
+    transmission can be any bytes-like object, such as the array returned by pyusb,
+    if nothing was stuffed the message is a memoryview into it rather than a copy
+    """
+    if isinstance(transmission, list):
+        transmission = bytes(transmission)
 
     #reportid = transmission[0]
     startflag = transmission[1]
@@ -190,25 +378,198 @@ def read(transmission):
     if startflag == csafe_dic.Extended_Frame_Start_Flag:
         #destination = transmission[2]
         #source = transmission[3]
-        j = 4
+        start = 4
     elif startflag == csafe_dic.Standard_Frame_Start_Flag:
-        j = 2
+        start = 2
     else:
         warn("No Start Flag found.")
         return []
 
-    while j < len(transmission):
-        if transmission[j] == csafe_dic.Stop_Frame_Flag:
-            stopfound = True
-            break
-        message.append(transmission[j])
-        j += 1
-
-    if not stopfound:
+    stop = _STOP_RE.search(transmission, start)
+    if stop is None:
         warn("No Stop Flag found.")
         return []
 
-    message = __check_message(message)
+    message = memoryview(transmission)[start:stop.start()]
+    if _UNSTUFF_RE.search(message) is not None:
+        message = _unstuff(message)
+
+    #checks checksum
+    if not message or _xor(message) != 0:
+        warn("Checksum error")
+        return []
+
+    #remove checksum from  end of message
+    return message[:-1]
+
+
+def _bytes2le(raw_bytes):
+    return int.from_bytes(raw_bytes, 'little')
+
+def _bytes2latin(raw_bytes):
+    return raw_bytes.decode('latin-1')
+
+#struct codes for response fields, other lengths are unpacked as strings
+_STRUCT_CODES = {1: 'B', 2: 'H', 4: 'I'}
+
+#compiled response plans, keyed by (tuple(arguments), message length)
+_plan_cache = {}
+_PLAN_CACHE_SIZE = 256
+#variable length responses, the layout is computed from the byte count
+_VARIABLE_RESPONSES = {
+    #response lengths differ based off capability code
+    'CSAFE_GETCAPS_CMD': lambda bytecount: (1,) * bytecount,
+    'CSAFE_GETID_CMD': lambda bytecount: ((-bytecount),),
+}
+
+
+class _Plan(object):
+    """
+    The expected response to a command list, compiled into a single struct over the message
+    checks: (index, value) pairs of command ids and byte counts which must match
+    fields: (name, start, stop, converters) slices of the unpacked values,
+    converters is None if the values are already integers
+    offsets: (offset, numbytes) of each value in the message
+    """
+    __slots__ = ('struct', 'checks', 'fields', 'offsets')
+
+    def __init__(self, codes, checks, fields):
+        self.struct = struct.Struct('<' + ''.join(codes))
+        self.checks = checks
+        self.fields = fields
+        offsets = []
+        offset = 0
+        for code in codes:
+            numbytes = struct.calcsize('<' + code)
+            offsets.append((offset, numbytes))
+            offset += numbytes
+        self.offsets = tuple(offsets)
+
+    def decode(self, message):
+        """
+        Returns the response dictionary, or None if message does not match the plan
+        """
+        values = self.struct.unpack_from(message)
+        for index, expected in self.checks:
+            if values[index] != expected:
+                return None
+
+        response = {'CSAFE_GETSTATUS_CMD' : [values[0],]}
+        for name, start, stop, converters in self.fields:
+            if converters is None:
+                response[name] = list(values[start:stop])
+            else:
+                response[name] = [convert(value) for convert, value
+                                  in zip(converters, values[start:stop])]
+        return response
+
+
+def _response_groups(names):
+    """
+    Groups the expected responses to the command names the same way write wraps them
+    Returns a list of (wrapper, [(command id, name, layout), ...]),
+    layout is None for variable length responses
+    """
+    groups = []
+    for name in names:
+        cmdprop = _COMMANDS[name]
+        wrapper = cmdprop.wrapper
+        msgprop = _RESPONSES[cmdprop.respid]
+        layout = None if msgprop.variable else msgprop.layout
+        entry = [cmdprop.id, msgprop.name, layout]
+        if wrapper and groups and groups[-1][0] == wrapper:
+            groups[-1][1].append(entry)
+        else:
+            groups.append((wrapper, [entry]))
+    return groups
+
+def _compile_plan(arguments, length):
+    """
+    Compiles the expected response to arguments for a message of the given length
+    Returns None if the layout cannot be determined
+    """
+    names, _ = _split_arguments(arguments)
+    groups = _response_groups(names)
+
+    #resolve the variable length response from the message length
+    entries = [entry for _, group in groups for entry in group]
+    variable = [entry for entry in entries if entry[2] is None]
+    if len(variable) > 1:
+        return None
+    fixed = 1 + sum(2 for wrapper, _ in groups if wrapper) + \
+        sum(2 + abs(sum(entry[2] or [])) for entry in entries)
+    if variable:
+        if length < fixed:
+            return None
+        variable[0][2] = _VARIABLE_RESPONSES[variable[0][1]](length - fixed)
+    elif length != fixed:
+        return None
+
+    #one struct code per value, so the indices in checks and fields are positions in fmt
+    fmt = ['B']
+    checks = []
+    fields = []
+    for wrapper, group in groups:
+        if wrapper:
+            checks.append((len(fmt), wrapper))
+            checks.append((len(fmt) + 1, sum(2 + abs(sum(entry[2])) for entry in group)))
+            fmt.extend('BB')
+        for cmdid, name, layout in group:
+            checks.append((len(fmt), cmdid))
+            checks.append((len(fmt) + 1, abs(sum(layout))))
+            fmt.extend('BB')
+            start = len(fmt)
+            converters = []
+            for numbytes in layout:
+                if numbytes in _STRUCT_CODES:
+                    fmt.append(_STRUCT_CODES[numbytes])
+                    converters.append(None)
+                else:
+                    fmt.append(str(abs(numbytes)) + 's')
+                    converters.append(_bytes2le if numbytes >= 0 else _bytes2latin)
+            if not any(converters):
+                converters = None
+            else:
+                converters = tuple(convert or int for convert in converters)
+            fields.append((name, start, len(fmt), converters))
+
+    return _Plan(fmt, tuple(checks), tuple(fields))
+
+def response_plan(arguments, length):
+    """
+    Returns the compiled plan for the response to arguments with a message of length bytes,
+    or None if the layout cannot be determined
+    """
+    key = (tuple(arguments), length)
+    try:
+        return _plan_cache[key]
+    except KeyError:
+        plan = _compile_plan(arguments, length)
+        if len(_plan_cache) >= _PLAN_CACHE_SIZE:
+            _plan_cache.clear()
+        _plan_cache[key] = plan
+        return plan
+
+def _decode_plan(arguments, message):
+    """
+    Decodes message with the compiled plan for arguments
+    Returns None if there is no plan or the message does not match it
+    """
+    plan = response_plan(arguments, len(message))
+    if plan is None:
+        return None
+    return plan.decode(message)
+
+def _response(respid):
+    msgprop = _RESPONSES[respid] if respid < len(_RESPONSES) else None
+    if msgprop is None:
+        raise KeyError("Unknown response id 0x{:X}".format(respid))
+    return msgprop
+
+def _decode(message):
+    """
+    Decodes an unstuffed message by walking it with the response dictionary
+    """
     status = message.pop(0)
 
     #prime variables
@@ -225,7 +586,7 @@ def read(transmission):
         msgcmd = message[k]
         if k <= wrapend:
             msgcmd = wrapper | msgcmd #check if still in wrapper
-        msgprop = csafe_dic.resp[msgcmd]
+        msgprop = _response(msgcmd)
         k = k + 1
 
         #get data byte count
@@ -233,35 +594,176 @@ def read(transmission):
         k = k + 1
 
         #if wrapper command then gets command in wrapper
-        if msgprop[0] == 'CSAFE_SETUSERCFG1_CMD':
+        if msgprop.name == 'CSAFE_SETUSERCFG1_CMD':
             wrapper = message[k - 2] << 8
             wrapend = k  + bytecount - 1
             if bytecount: #If wrapper length != 0
                 msgcmd = wrapper | message[k]
-                msgprop = csafe_dic.resp[msgcmd]
+                msgprop = _response(msgcmd)
                 k = k + 1
                 bytecount = message[k]
                 k = k + 1
 
-        #special case for capability code, response lengths differ based off capability code
-        if msgprop[0] == 'CSAFE_GETCAPS_CMD':
-            msgprop[1] = [1,] * bytecount
-
-        #special case for get id, response length is variable
-        if msgprop[0] == 'CSAFE_GETID_CMD':
-            msgprop[1] = [(-bytecount),]
+        #special case for variable length responses (getcaps & getid),
+        #the shared table is never modified
+        layout = msgprop.layout
+        if msgprop.variable:
+            layout = _VARIABLE_RESPONSES[msgprop.name](bytecount)
 
         #checking that the recieved data byte is the expected length, sanity check
-        if abs(sum(msgprop[1])) != 0 and bytecount != abs(sum(msgprop[1])):
+        if abs(sum(layout)) != 0 and bytecount != abs(sum(layout)):
             warn("Warning: bytecount is an unexpected length")
 
         #extract values
-        for numbytes in msgprop[1]:
+        for numbytes in layout:
             raw_bytes = message[k:k + abs(numbytes)]
-            value = (__bytes2int(raw_bytes) if numbytes >= 0 else __bytes2ascii(raw_bytes))
+            value = (_bytes2int(raw_bytes) if numbytes >= 0 else _bytes2ascii(raw_bytes))
             result.append(value)
             k = k + abs(numbytes)
 
-        response[msgprop[0]] = result
+        response[msgprop.name] = result
 
     return response
+
+
+#for recieving!!
+def read(transmission, arguments=None):
+    """
+    Converts a usb report into a response dictionary
+    If arguments, the command list that was sent, is given the response is
+    decoded with a plan compiled for that command list
+    """
+    message = _unframe(transmission)
+    if not message:
+        return []
+
+    return decode(message, arguments)
+
+def decode(message, arguments=None):
+    """
+    Converts an unstuffed message, as returned by FrameParser, into a response dictionary
+    """
+    if arguments is not None:
+        response = _decode_plan(arguments, message)
+        if response is not None:
+            return response
+
+    return _decode(list(message))
+
+
+class FrameParser(object):
+    """
+    Resumable parser for a stream of CSAFE frames, for transports without usb reports
+    Chunks of any size are fed in and complete, checksum verified messages come out,
+    bytes outside of frames (report IDs, padding) are skipped
+    """
+    MAX_LENGTH = 2 * MAX_FRAME_LENGTH
+
+    def __init__(self):
+        self._frame = None #bytearray inside a frame, None while looking for a start flag
+        self._skip = 0 #address bytes still to skip after an extended start flag
+        self.errors = 0
+
+    def reset(self):
+        """
+        Discards any partially received frame
+        """
+        self._frame = None
+        self._skip = 0
+
+    def feed(self, chunk):
+        """
+        Parses chunk and returns a list of the messages (status first, checksum removed)
+        of every frame completed by it
+        """
+        if isinstance(chunk, list):
+            chunk = bytes(chunk)
+        view = memoryview(chunk)
+        messages = []
+        pos = 0
+
+        while pos < len(view):
+            #looking for a start flag
+            if self._frame is None:
+                match = _START_RE.search(view, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                self._frame = bytearray()
+                if view[match.start()] == csafe_dic.Extended_Frame_Start_Flag:
+                    #destination & source
+                    self._skip = 2
+                continue
+
+            if self._skip:
+                skipped = min(self._skip, len(view) - pos)
+                self._skip -= skipped
+                pos += skipped
+                continue
+
+            #inside a frame, looking for the stop flag
+            match = _FLAG_RE.search(view, pos)
+            if match is None:
+                self._frame += view[pos:]
+                if len(self._frame) > self.MAX_LENGTH:
+                    warn("No Stop Flag found.")
+                    self.errors += 1
+                    self.reset()
+                break
+
+            self._frame += view[pos:match.start()]
+            if view[match.start()] == csafe_dic.Stop_Frame_Flag:
+                message = self._finish()
+                if message is not None:
+                    messages.append(message)
+                pos = match.end()
+            else:
+                #start flag before the stop flag, resynchronise on the new frame
+                warn("No Stop Flag found.")
+                self.errors += 1
+                pos = match.start()
+            self.reset()
+
+        return messages
+
+    def _finish(self):
+        message = self._frame
+        if _UNSTUFF_RE.search(message) is not None:
+            message = _unstuff(message)
+
+        #checks checksum
+        if len(message) < 2 or _xor(message) != 0:
+            warn("Checksum error")
+            self.errors += 1
+            return None
+
+        #remove checksum from end of message
+        return bytes(message[:-1])
+
+def write_response(results, status=0):
+    """
+    Converts a list of (command name, values) pairs into a usb report, as sent by the erg
+    """
+    message = bytearray((status,))
+    groups = _response_groups([name for name, _ in results])
+    pending = iter([values for _, values in results])
+    for wrapper, group in groups:
+        data = bytearray()
+        for cmdid, name, layout in group:
+            result = next(pending)
+            if layout is None:
+                layout = _VARIABLE_RESPONSES[name](
+                    len(result) if name == 'CSAFE_GETCAPS_CMD' else len(result[0]))
+            data.append(cmdid)
+            data.append(abs(sum(layout)))
+            for numbytes, value in zip(layout, result):
+                if numbytes >= 0:
+                    data += value.to_bytes(numbytes, 'little')
+                else:
+                    data += value.encode('latin-1')
+        if wrapper:
+            message.append(wrapper)
+            message.append(len(data))
+        message += data
+
+    return _frame(_stuff(message), _xor(message), 0)
@@ -5,6 +5,9 @@
 # NOTE: This code has not been thoroughly tested and may not function as advertised.
 # Please report and findings to the author so that they may be addressed in a stable release.
 
+from collections import namedtuple
+from types import MappingProxyType
+
 #Unique Frame Flags
 Extended_Frame_Start_Flag = 0xF0
 Standard_Frame_Start_Flag = 0xF1
@@ -134,7 +137,7 @@ resp[0x1A8D] = ['CSAFE_PM_GET_WORKOUTSTATE', [1,]] #Workout State
 resp[0x1A9F] = ['CSAFE_PM_GET_WORKOUTINTERVALCOUNT', [1,]] #Workout Interval Count
 resp[0x1A8E] = ['CSAFE_PM_GET_INTERVALTYPE', [1,]] #Interval Type
 resp[0x1ACF] = ['CSAFE_PM_GET_RESTTIME', [2,]] #Rest Time
-cmds[0x1A8B] = ['CSAFE_PM_GET_DISPLAYUNITS', [1]] # Display Units Type
+resp[0x1A8B] = ['CSAFE_PM_GET_DISPLAYUNITS', [1,]] #Display Units Type
 
 #Response Data to PM3 Specific Long Commands
 resp[0x1A05] = ['CSAFE_PM_SET_SPLITDURATION', [0,]] #No variables returned !! double check
@@ -143,4 +146,46 @@ resp[0x1A6B] = ['CSAFE_PM_GET_FORCEPLOTDATA', [
 resp[0x1A27] = ['CSAFE_PM_SET_SCREENERRORMODE', [0,]]  #No variables returned !! double check
 resp[0x1A6C] = ['CSAFE_PM_GET_HEARTBEATDATA', [
     1, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2]] #Bytes read, data ...
-resp[0x1A6E] = ['CSAFE_PM_GET_STROKESTATS', [2,1,2,1,2,2,2,2,2]] # Stroke Distance (2 bytes), drive time (1 byte), recovery time (2 bytes), stroke length (one byte), stroke count (2 bytes), Stroke peak force (2bytes), Stroke Impulse Force (2 bytes), Stroke Average Force (2 bytes), Work per stroke (2 bytes)
\ No newline at end of file
+resp[0x1A6E] = ['CSAFE_PM_GET_STROKESTATS', [2,1,2,1,2,2,2,2,2]] # Stroke Distance (2 bytes), drive time (1 byte), recovery time (2 bytes), stroke length (one byte), stroke count (2 bytes), Stroke peak force (2bytes), Stroke Impulse Force (2 bytes), Stroke Average Force (2 bytes), Work per stroke (2 bytes)
+
+
+
+#cmds and resp are the source tables, they are compiled below into immutable tables
+#which are shared by all threads and must be used at runtime
+
+#Command(name, id, argbytes, wrapper, respid, nbytes, maxresponse)
+#argbytes: bytes of each argument, nbytes: total argument bytes,
+#respid: id of the response (including the wrapper),
+#maxresponse: max bytes of the response (stuffed) including id and byte count
+Command = namedtuple('Command', 'name id argbytes wrapper respid nbytes maxresponse')
+
+#Response(name, layout, nbytes, variable)
+#layout: bytes of each value (negative for ASCII), nbytes: total bytes,
+#variable: the layout depends on the byte count (getid & getcaps)
+Response = namedtuple('Response', 'name layout nbytes variable')
+
+VARIABLE_RESPONSES = frozenset(['CSAFE_GETCAPS_CMD', 'CSAFE_GETID_CMD'])
+
+def _compile_responses():
+    responses = [None] * (max(resp) + 1)
+    for respid, (name, layout) in resp.items():
+        responses[respid] = Response(name, tuple(layout), abs(sum(layout)),
+                                     name in VARIABLE_RESPONSES)
+    return tuple(responses)
+
+#RESPONSES[respid], respid is the response command id | wrapper id << 8
+RESPONSES = _compile_responses()
+
+def _compile_commands():
+    commands = {}
+    for name, cmdprop in cmds.items():
+        wrapper = cmdprop[2] if len(cmdprop) == 3 else 0
+        respid = cmdprop[0] | (wrapper << 8)
+        #double return to account for stuffing
+        maxresponse = RESPONSES[respid].nbytes * 2 + 1
+        commands[name] = Command(name, cmdprop[0], tuple(cmdprop[1]), wrapper, respid,
+                                 sum(cmdprop[1]), maxresponse)
+    return MappingProxyType(commands)
+
+#COMMANDS['COMMAND_NAME']
+COMMANDS = _compile_commands()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+"""
+discovery.py
+Keeps an index of the connected ergs and reports the ergs added and removed
+Sources tell discovery when to enumerate the ergs again:
+    PeriodicSource: every interval seconds
+    UeventSource: as soon as the kernel reports a usb device of the vendor added or removed
+    (linux), and every interval seconds
+    FakeSource: whenever a test plugs or unplugs a device
+"""
+
+import logging
+import select
+import socket
+import threading
+import time
+
+from usb import USBError
+
+from pyrow.pyrow import C2_VENDOR_ID
+
+logger = logging.getLogger(__name__)
+
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_GROUP = 1 #kernel uevents
+#seconds between a uevent and enumerating, for the device to be ready
+SETTLE = .05
+
+
+def device_key(device, serial=True):
+    """
+    Returns the (bus, address, serial) key of a device
+    pyusb devices are known by bus and address, with the usb serial number if serial,
+    other devices, such as transports, by their repr
+    """
+    bus = getattr(device, 'bus', None)
+    address = getattr(device, 'address', None)
+    if bus is None or address is None:
+        return (None, None, device.__repr__())
+    if not serial:
+        return (bus, address, None)
+    try:
+        return (bus, address, device.serial_number)
+    except (USBError, ValueError, NotImplementedError):
+        #not readable without claiming the device
+        return (bus, address, None)
+
+
+class DeviceIndex(object):
+    """
+    Connected devices by key, see device_key
+    The serial number is only read for a bus and address not yet in the index,
+    so enumerating the same devices again costs no usb requests.
+    update and forget may be called from different threads, such as discovery and a poller.
+    devices: device of each key
+    """
+    def __init__(self, key=device_key):
+        self._key = key
+        self.devices = {}
+        #key of each (bus, address) or repr
+        self._locations = {}
+        self._lock = threading.Lock()
+
+    def update(self, devices):
+        """
+        Replaces the devices of the index, returns the lists of the (key, device) pairs
+        added and removed
+        """
+        with self._lock:
+            locations = {}
+            added = []
+            for device in devices:
+                location = self._key(device, serial=False)
+                key = self._locations.get(location)
+                if key is None or key not in self.devices:
+                    key = self._key(device)
+                    added.append((key, device))
+                locations[location] = key
+            keys = set(locations.values())
+            removed = [(key, device) for key, device in self.devices.items() if key not in keys]
+            for key, _ in removed:
+                del self.devices[key]
+            for key, device in added:
+                self.devices[key] = device
+            self._locations = locations
+        return added, removed
+
+    def forget(self, key):
+        """
+        Removes a device, it is added again by the next update which finds it
+        """
+        with self._lock:
+            self.devices.pop(key, None)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self.devices
+
+    def __len__(self):
+        with self._lock:
+            return len(self.devices)
+
+
+class PeriodicSource(object):
+    """
+    Enumerates the devices with find every interval seconds
+    """
+    def __init__(self, find, interval=2):
+        self._find = find
+        self.interval = interval
+        self._closed = threading.Event()
+
+    def find(self):
+        return list(self._find())
+
+    def wait(self):
+        """
+        Blocks until the devices should be enumerated again, returns False once closed
+        """
+        return not self._closed.wait(self.interval)
+
+    def close(self):
+        self._closed.set()
+
+
+class UeventSource(PeriodicSource):
+    """
+    Enumerates the devices as soon as the kernel reports a usb device of the vendor added or
+    removed, and every interval seconds
+    Raises OSError where kernel uevents are not available, see default_source
+    The socket is closed by the wait after close
+    """
+    def __init__(self, find, interval=2, vendor=C2_VENDOR_ID):
+        PeriodicSource.__init__(self, find, interval)
+        #usb uevents carry PRODUCT=vendor/product/version, in lowercase hex
+        self._product = 'PRODUCT={:x}/'.format(vendor).encode()
+        if not hasattr(socket, 'AF_NETLINK'):
+            raise OSError("Kernel uevents not available")
+        self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        self._sock.bind((0, UEVENT_GROUP))
+        self._sock.setblocking(False)
+
+    def wait(self):
+        deadline = time.monotonic() + self.interval
+        while not self._closed.is_set():
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return True
+            readable, _, _ = select.select([self._sock], [], [], min(timeout, 0.1))
+            if readable and self._relevant():
+                time.sleep(SETTLE)
+                break
+        if self._closed.is_set():
+            #closed here, not by close, which may be called while waiting
+            self._sock.close()
+            return False
+        return True
+
+    def _relevant(self):
+        relevant = False
+        while True:
+            try:
+                message = self._sock.recv(8192)
+            except (BlockingIOError, InterruptedError):
+                return relevant
+            fields = message.split(b'\0')
+            if (b'SUBSYSTEM=usb' in fields and
+                    any(field.startswith(self._product) for field in fields) and
+                    (b'ACTION=add' in fields or b'ACTION=remove' in fields)):
+                relevant = True
+
+
+def default_source(find, interval=2):
+    """
+    Returns a UeventSource where kernel uevents are available, a PeriodicSource otherwise
+    """
+    try:
+        return UeventSource(find, interval)
+    except OSError:
+        return PeriodicSource(find, interval)
+
+
+class FakeSource(object):
+    """
+    Devices plugged and unplugged by a test, wait returns as soon as they change
+    """
+    def __init__(self, devices=()):
+        self.devices = list(devices)
+        self._changed = threading.Condition()
+        self._pending = bool(self.devices)
+        self._closed = False
+
+    def plug(self, device):
+        with self._changed:
+            self.devices.append(device)
+            self._pending = True
+            self._changed.notify_all()
+
+    def unplug(self, device):
+        with self._changed:
+            self.devices.remove(device)
+            self._pending = True
+            self._changed.notify_all()
+
+    def find(self):
+        with self._changed:
+            return list(self.devices)
+
+    def wait(self):
+        with self._changed:
+            self._changed.wait_for(lambda: self._pending or self._closed)
+            self._pending = False
+            return not self._closed
+
+    def close(self):
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+
+class Discovery(object):
+    """
+    Enumerates the devices of a source and reports the changes to its index
+    on_add, on_remove: called with the key and device of every device added and removed
+    """
+    def __init__(self, source, on_add, on_remove=None):
+        self.source = source
+        self.index = DeviceIndex()
+        self.on_add = on_add
+        self.on_remove = on_remove
+
+    def scan(self):
+        """
+        Enumerates the devices once, returns the (key, device) pairs added and removed
+        """
+        added, removed = self.index.update(self.source.find())
+        if self.on_remove is not None:
+            for key, device in removed:
+                self.on_remove(key, device)
+        for key, device in added:
+            self.on_add(key, device)
+        return added, removed
+
+    def run(self):
+        """
+        Scans whenever the source says so, until it is closed, scans which fail are logged
+        """
+        while True:
+            try:
+                self.scan()
+            except Exception: # pylint: disable=broad-except
+                #tried again when the source says so
+                logger.exception("Finding ergs failed")
+            if not self.source.wait():
+                break
+
+    def close(self):
+        self.source.close()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+"""
+emulator.py
+Answers csafe usb reports like a PM3 monitor, built from the tables of csafe_dic
+With transport.MemoryTransport or transport.SocketTransport the whole PyErg.send path,
+encoding, framing, pacing and decoding, runs without an erg:
+    erg = pyrow.PyErg(transport.MemoryTransport(ErgEmulator().respond))
+The module can also be used in place of pyrow, e.g. ErgManager(emulator, ...)
+"""
+
+import threading
+import time
+
+from pyrow.csafe import csafe_cmd, csafe_dic
+from pyrow.pyrow import ERG_MAPPING, PyErg, get_pretty # pylint: disable=unused-import
+from pyrow.transport import MemoryTransport, recv_report
+
+_COMMANDS = {(command.wrapper, command.id): command
+             for command in csafe_dic.COMMANDS.values()}
+_REPORT_SIZES = dict(csafe_cmd.REPORT_SIZES)
+WRAPPER = csafe_dic.COMMANDS['CSAFE_SETUSERCFG1_CMD'].id
+
+#previous frame status bits of the status byte
+PREVIOUS_FRAME_NOT_READY = 0x30
+FRAME_TOGGLE = 0x80
+
+READY = ERG_MAPPING['status'].index('Ready')
+IN_USE = ERG_MAPPING['status'].index('In Use')
+
+#responses which are not all zero
+DEFAULT_VALUES = {
+    'CSAFE_GETVERSION_CMD': [22, 0, 5, 500, 164],
+    'CSAFE_GETSERIAL_CMD': ['300000000'],
+    'CSAFE_GETCAPS_CMD': [96, 96, 50],
+    'CSAFE_GETID_CMD': ['000'],
+    'CSAFE_PM_GET_FORCEPLOTDATA': [0] + [0] * 16,
+    'CSAFE_PM_GET_HEARTBEATDATA': [0] + [0] * 16,
+}
+
+
+def parse_request(message):
+    """
+    Returns the [(command name, argument values)] of an unstuffed request message
+    """
+    commands = []
+    _parse(message, 0, commands)
+    return commands
+
+def _parse(message, wrapper, commands):
+    k = 0
+    while k < len(message):
+        cmdid = message[k]
+        k += 1
+        if not wrapper and cmdid == WRAPPER:
+            length = message[k]
+            _parse(message[k + 1:k + 1 + length], cmdid, commands)
+            k += 1 + length
+            continue
+        command = _COMMANDS.get((wrapper, cmdid))
+        if command is None:
+            raise ValueError("Unknown command id 0x{:X}".format(wrapper << 8 | cmdid))
+        values = []
+        if command.argbytes:
+            #data byte count
+            k += 1
+            for numbytes in command.argbytes:
+                values.append(int.from_bytes(bytes(message[k:k + numbytes]), 'little'))
+                k += numbytes
+        commands.append((command.name, values))
+
+
+def _default(name):
+    msgprop = csafe_dic.RESPONSES[csafe_dic.COMMANDS[name].respid]
+    return ['0' * -numbytes if numbytes < 0 else 0 for numbytes in msgprop.layout]
+
+
+class ErgEmulator(object):
+    """
+    Monitor answering csafe reports in the report size they were sent in
+    values: command name to its response values, or a function of the emulator returning
+    them, for the commands which do not answer zeros, see DEFAULT_VALUES; missing trailing
+    values are zero
+    state: machine status, see ERG_MAPPING['status'], set by CSAFE_RESET_CMD and
+    CSAFE_GOINUSE_CMD
+    A frame arriving less than mininterframe after the previous one is counted in early,
+    and the response to the next frame reports the previous frame as not ready.
+    settings: last argument values of every command with arguments received
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, values=None, state=READY, serial=None, mininterframe=50):
+        self.values = dict(DEFAULT_VALUES)
+        self.values['CSAFE_GETCAPS_CMD'] = [96, 96, mininterframe]
+        if serial is not None:
+            self.values['CSAFE_GETSERIAL_CMD'] = [serial]
+        if values:
+            self.values.update(values)
+        self.state = state
+        self.mininterframe = mininterframe
+        self.settings = {}
+        self.frames = 0
+        self.early = 0
+        self._toggle = 0
+        self._previous = 0
+        self._last = None
+        self._lock = threading.Lock()
+
+    def respond(self, report):
+        """
+        Returns the response report to a request report
+        """
+        with self._lock:
+            now = time.perf_counter()
+            status = self._status(now)
+            message = csafe_cmd._unframe(report)
+            #the status byte is the whole response to CSAFE_GETSTATUS_CMD
+            results = [(name, self._answer(name, values)) for name, values in
+                       parse_request(bytes(message)) if name != 'CSAFE_GETSTATUS_CMD']
+            response = csafe_cmd.write_response(results, status)
+        size = _REPORT_SIZES[report[0]]
+        if len(response) > size:
+            return response
+        #in the report size of the request
+        stop = response.index(csafe_dic.Stop_Frame_Flag, 1)
+        return bytes((report[0],)) + response[1:stop + 1] + bytes(size - stop - 1)
+
+    def _status(self, now):
+        self.frames += 1
+        previous = self._previous
+        self._previous = 0
+        if self._last is not None and now - self._last < self.mininterframe / 1000.:
+            self.early += 1
+            self._previous = PREVIOUS_FRAME_NOT_READY
+        self._last = now
+        self._toggle ^= FRAME_TOGGLE
+        return self._toggle | previous | self.state
+
+    def _answer(self, name, values):
+        if values:
+            self.settings[name] = values
+        if name == 'CSAFE_RESET_CMD':
+            self.state = READY
+        elif name == 'CSAFE_GOINUSE_CMD':
+            self.state = IN_USE
+        value = self.values.get(name)
+        if value is None:
+            return _default(name)
+        if callable(value):
+            value = value(self)
+        if name in csafe_dic.VARIABLE_RESPONSES:
+            return value
+        #values left out, such as units, are zero
+        return list(value) + _default(name)[len(value):]
+
+    def serve(self, sock):
+        """
+        Answers the reports received on a stream socket until it is closed,
+        see transport.SocketTransport
+        """
+        while True:
+            report = recv_report(sock)
+            if report is None:
+                break
+            sock.sendall(self.respond(bytes(report)))
+
+
+_fleet = []
+
+def find(n=2):
+    """
+    Returns transports to n emulated ergs, the same ergs on every call
+    """
+    while len(_fleet) < n:
+        serial = '3{:08d}'.format(len(_fleet))
+        _fleet.append(MemoryTransport(ErgEmulator(serial=serial).respond,
+                                      name='ErgEmulator({})'.format(serial)))
+    return _fleet[:n]
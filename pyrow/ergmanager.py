@@ -7,19 +7,43 @@
 
 # pylint: disable=C0111,C0103
 
+import logging
 import threading
-import queue
 import time
 
+from pyrow.discovery import Discovery, default_source
+from pyrow.fleet import FleetPoller
+from pyrow.pyrow import ERG_MAPPING
+from pyrow.scheduler import TelemetryScheduler
+from pyrow.snapshot import Snapshots
+from pyrow.updates import DROP_OLDEST, UpdateQueue
+
+logger = logging.getLogger(__name__)
+
+WORKOUT_END = ERG_MAPPING['workoutstate'].index('Workout end')
+
 
 class ErgManager(object):
     # pylint: disable=too-many-instance-attributes
 
-    def __init__(self, pyrow, *, add_callback, update_callback, check_rate=2, update_rate=0.5):
+    def __init__(self, pyrow, *, add_callback, update_callback, check_rate=2, update_rate=0.5,
+                 fields=None, rates=None, adaptive=False, pollers=None, remove_callback=None,
+                 source=None, update_queue=64, update_policy=DROP_OLDEST):
         """
         Sets up erg manager
         Creates threads for detecting ergs and getting their status'
-        The callbaks are for the addition and update events of the ergs
+        The callbaks are for the addition, update and removal events of the ergs
+        fields: the get_monitor fields polled, all including the force plot if None
+        rates: polls per second of each group, see scheduler.TelemetryScheduler,
+        None polls everything every update_rate seconds
+        adaptive: adapt the rates to the stroke phase, see scheduler.TelemetryScheduler
+        pollers: threads polling all ergs, see fleet.FleetPoller, None for a thread per erg;
+        an erg whose polling fails is removed and added again when found
+        source: tells when to look for ergs, see discovery, by default kernel hotplug events
+        where available and pyrow.find every check_rate seconds
+        update_queue, update_policy: ergs waiting for the update callback at most, and what
+        happens when more are waiting, see updates.UpdateQueue; an erg polled again while
+        waiting is only called back once, with its latest data
         """
         self._pyrow = pyrow
 
@@ -28,15 +52,26 @@ class ErgManager(object):
 
         self.check_rate = check_rate
         self.update_rate = update_rate
+        self.fields = fields
+        self.rates = rates
+        self.adaptive = adaptive
 
 
-        self._devices = []
         self.ergs = []
+        #guards ergs against removal by discovery and a failed poll at once
+        self._ergs_lock = threading.Lock()
+        if source is None:
+            source = default_source(pyrow.find, check_rate)
+        self.remove_callback = remove_callback
+        self._discovery = Discovery(source, self._erg_added, self._erg_removed)
 
         self.exit_requested = False
-        self._status_q = queue.Queue()
+        self.updates = UpdateQueue(update_queue, update_policy)
+        self._fleet = None
+        if pollers is not None:
+            self._fleet = FleetPoller(pollers, on_error=self._poll_failed)
         self._threads = {
-            'erg_check': threading.Thread(target=self._erg_checker),
+            'erg_check': threading.Thread(target=self._discovery.run),
             'status_get': threading.Thread(target=self._status_getter),
         }
         for name, t in self._threads.items():
@@ -45,8 +80,11 @@ class ErgManager(object):
             t.start()
 
     def stop(self):
-        self._status_q.put(None)
         self.exit_requested = True
+        self.updates.close()
+        self._discovery.close()
+        if self._fleet is not None:
+            self._fleet.stop()
         for _erg in self.ergs:
             _erg.exit_requested = True
             for name, t in self._threads.items():
@@ -64,70 +102,150 @@ class ErgManager(object):
     def get_names(self):
         return [_erg.name for _erg in self.ergs]
 
-    def _erg_checker(self):
-        while not self.exit_requested:
-            # print("Checking for ergs:")
-            try:
-                devices = list(self._pyrow.find())
-                if not devices:
-                    pass
-                    # print("No ergs found.")
-                # print("{} ergs found.".format(len(self.ergs)))
-                for device in devices:
-                    # TODO use self.ergs instead of seperate devices list
-                    if device.__repr__() not in self._devices:
-                        self._devices.append(device.__repr__())
-                        new_erg = Erg(
-                            pyrow=self._pyrow,
-                            device=device,
-                            status_q=self._status_q,
-                            rate=self.update_rate
-                        )
-                        self.ergs.append(new_erg)
-                        new_name = self.add_callback(new_erg)
-                        if new_name is not None:
-                            if new_name not in self.get_names():
-                                new_erg.name = new_name
-                            else:
-                                raise ValueError(
-                                    "Name {} already exists".format(new_name))
-            except ConnectionError:
-                # print("Connection Error")
-                raise
-            time.sleep(self.check_rate)
+    def stats(self):
+        """
+        Returns the achieved polls per second of each group of every erg, by name
+        """
+        return {_erg.name: _erg.stats() for _erg in self.ergs}
+
+    def _erg_added(self, key, device):
+        try:
+            new_erg = Erg(
+                pyrow=self._pyrow,
+                device=device,
+                status_q=self.updates,
+                rate=self.update_rate,
+                fields=self.fields,
+                rates=self.rates,
+                adaptive=self.adaptive,
+                start=self._fleet is None,
+                on_error=self._poll_failed
+            )
+        except Exception: # pylint: disable=broad-except
+            #tried again by the next scan
+            logger.exception("Opening erg %r failed", device)
+            self._discovery.index.forget(key)
+            return
+        new_erg.key = key
+        with self._ergs_lock:
+            self.ergs.append(new_erg)
+        new_name = self.add_callback(new_erg)
+        if new_name is not None:
+            if new_name == new_erg.name or new_name not in self.get_names():
+                new_erg.name = new_name
+                #kept for when the erg reconnects
+                new_erg.metadata.name = new_name
+            else:
+                raise ValueError(
+                    "Name {} already exists".format(new_name))
+        if self._fleet is not None:
+            self._fleet.add(new_erg)
+
+    def _erg_removed(self, key, device):
+        for _erg in list(self.ergs):
+            if _erg.key == key:
+                self._remove(_erg)
+                return
+
+    def _poll_failed(self, erg, error):
+        if not isinstance(error, ConnectionError):
+            logger.error("Polling erg %r failed", erg, exc_info=error)
+        erg.error = error
+        self._remove(erg)
+        #forget the erg so that it is added again when found
+        self._discovery.index.forget(erg.key)
+
+    def _remove(self, erg):
+        """
+        Stops polling erg, closes it and calls the remove callback, once for every erg
+        """
+        with self._ergs_lock:
+            if erg not in self.ergs:
+                #already removed by discovery or a failed poll
+                return
+            self.ergs.remove(erg)
+        erg.exit_requested = True
+        if self._fleet is not None:
+            self._fleet.remove(erg)
+        elif erg._thread is not threading.current_thread():
+            erg._thread.join()
+        try:
+            erg._pyerg.detach()
+        except Exception: # pylint: disable=broad-except
+            #unplugged, the frame gap is recorded anyway
+            logger.debug("Closing erg %r failed", erg, exc_info=True)
+        if self.remove_callback is not None:
+            self.remove_callback(erg)
 
     def _status_getter(self):
         while not self.exit_requested:
-            item = self._status_q.get()
+            item = self.updates.get()
             if item is None:
                 break
             self.update_callback(item)
-            self._status_q.task_done()
 
 
 class Erg(object):
     # pylint: disable=too-many-instance-attributes
 
-    def __init__(self, pyrow, device, status_q, rate=1):
+    def __init__(self, pyrow, device, status_q, rate=1, fields=None, rates=None,
+                 adaptive=False, start=True, on_error=None):
         """
         Sets up erg
+        fields: the get_monitor fields polled, all including the force plot if None
+        rates: polls per second of each group, see scheduler.TelemetryScheduler,
+        None polls everything every rate seconds
+        adaptive: adapt the rates to the stroke phase, see scheduler.TelemetryScheduler
+        start: poll from a thread of the erg, otherwise the erg is polled with a
+        scheduler by calling poll_due, such as by a fleet.FleetPoller
+        on_error: called with the erg and the exception when the thread of the erg stops
+        on an error, as with fleet.FleetPoller, the exception is raised if None
         """
         self._pyrow = pyrow
 
         self._device = device
         self._pyerg = self._pyrow.PyErg(device)
+        #learns the frame gap of the erg, a known erg keeps its frame gap and name
+        self.metadata = self._pyerg.attach()
 
         self.id = self._device.__repr__()
+        #discovery key of the device, see discovery.device_key
+        self.key = None
+        self.serial = self.metadata.serial
         self.name = self._device.__repr__()
-        self.data = {}
+        if self.metadata.name is not None:
+            self.name = self.metadata.name
+        #snapshot of the data of every poll, see data
+        self.snapshots = Snapshots()
+        #latest samples, see pyrow.samples
+        self.monitor = None
+        self.workout = None
+        self.forceplot = None
         self._status_q = status_q
 
         self.rate = rate
+        self.fields = fields
+        self.scheduler = None
+        #heartbeat.HeartbeatStream of the beat intervals, if the heartbeat group is scheduled
+        self.heartbeat = None
+        #exception which stopped the polling of the erg
+        self.error = None
+        self.on_error = on_error
+        if rates is None and not start:
+            #everything every rate seconds
+            rates = {'monitor': 1. / rate, 'workout': 1. / rate}
+            if fields is None:
+                rates['forceplot'] = 1. / rate
+        if rates is not None or adaptive:
+            self.scheduler = TelemetryScheduler(self._pyerg, rates, fields, adaptive)
+            self.heartbeat = self.scheduler.heartbeat
 
         self.exit_requested = False
-        self._thread = threading.Thread(target=self.erg_monitor)
-        self._thread.name = "erg_monitor - {}".format(self.id)
-        self._thread.start()
+        self._thread = None
+        if start:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.name = "erg_monitor - {}".format(self.id)
+            self._thread.start()
 
         # print("Setting up erg: {}".format(self.__repr__()))
 
@@ -135,6 +253,27 @@ class Erg(object):
         return self.name
         #return self._device.__repr__()
 
+    @property
+    def data(self):
+        """
+        Latest data of the erg, a snapshot.Snapshot which is never changed, numbered by seq
+        """
+        return self.snapshots.latest
+
+    def wait_newer(self, seq, timeout=None):
+        """
+        Returns the data once newer than the snapshot numbered seq, None on timeout
+        """
+        return self.snapshots.wait_newer(seq, timeout)
+
+    def _run(self):
+        try:
+            self.erg_monitor()
+        except Exception as e: # pylint: disable=broad-except
+            if self.on_error is None:
+                raise
+            self.on_error(self, e)
+
     def erg_monitor(self):
 
         #prime status number
@@ -142,26 +281,78 @@ class Erg(object):
         cstroke = -1
         cworkout = -1
 
+        if self.scheduler is not None:
+            self._scheduled_monitor()
+            return
+
         while not self.exit_requested:
             try:
-                monitor = self._pyerg.get_monitor(pretty=True, forceplot=True)
-                workout = self._pyerg.get_workout(pretty=True)
+                self.monitor = self._pyerg.get_monitor_sample(forceplot=self.fields is None,
+                                                              fields=self.fields)
+                self.workout = self._pyerg.get_workout_sample()
                 # erg = self._pyerg.get_erg(pretty=True)
-                # print("monitor: ", monitor)
-                # print("workout: ", workout)
-                # print("erg: ", erg)
-                self.data.update(monitor)
-                self.data.update(workout)
-                if workout['state'] == 'Workout end':
+                self.snapshots.update((self.monitor, self.workout), self._pyrow.get_pretty)
+                if self.workout.state == WORKOUT_END:
                     print("Workout erg {} finished".format(self))
                 self._status_q.put(self)
 
             except ConnectionError as e:
+                #kept for when the erg reconnects
+                self.metadata.gap = self._pyerg.pacer.gap
                 # TODO: determine
                 # print(e)
                 raise ConnectionError("Ergmanager line 139")
 
             time.sleep(self.rate)
 
+    def _scheduled_monitor(self):
+        while not self.exit_requested:
+            samples = self.scheduler.poll()
+            if not samples:
+                #only groups polled once per connection
+                time.sleep(self.rate)
+                continue
+            self._publish(samples)
+
+    def next_poll(self):
+        """
+        Returns the perf_counter time at which a group is due and the frame gap has passed,
+        None if no group is left to poll
+        """
+        deadline = self.scheduler.next_deadline()
+        if deadline is None:
+            return None
+        return max(deadline, self._pyerg.pacer.deadline)
+
+    def poll_due(self, now=None):
+        """
+        Polls the groups due now and publishes the samples, returns {group: sample}
+        """
+        samples = self.scheduler.poll_due(now)
+        if samples:
+            self._publish(samples)
+        return samples
+
+    def _publish(self, samples):
+        polled = []
+        for group, sample in samples.items():
+            if group in ('erg', 'heartbeat'):
+                continue
+            setattr(self, group, sample)
+            polled.append(sample)
+        self.snapshots.update(polled, self._pyrow.get_pretty)
+        if 'workout' in samples and self.workout.state == WORKOUT_END:
+            print("Workout erg {} finished".format(self))
+        self._status_q.put(self)
+
+    def stats(self):
+        """
+        Returns the achieved polls per second of each group, empty if polled without
+        a scheduler
+        """
+        if self.scheduler is None:
+            return {}
+        return self.scheduler.stats()
+
     def set_workout(self, **kwargs):
         self._pyerg.set_workout(**kwargs)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+"""
+fleet.py
+Polls many ergs from a few threads, each erg when it is next due
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+
+class FleetPoller(object):
+    """
+    Polls ergs from a fixed pool of threads, in the order they become ready
+    An erg is ready when its next group is due and its frame gap has passed, it is polled
+    by one thread at a time and every thread polls whichever erg is ready first.
+    ergs: anything with next_poll() and poll_due(now), such as ergmanager.Erg
+    workers: threads polling the ergs
+    on_error: called with the erg and the exception when polling it fails,
+    the erg is no longer polled
+    polls: polls of all ergs
+    lag: seconds between the ergs becoming ready and being polled, summed over the polls
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, workers=1, on_error=None):
+        self.on_error = on_error
+        self.exit_requested = False
+        self.polls = 0
+        self.lag = 0.
+        self.started = time.perf_counter()
+        #(ready time, order added, erg), the next erg to poll first
+        self._heap = []
+        self._order = itertools.count()
+        self._ergs = set()
+        self._cond = threading.Condition()
+        self._threads = [threading.Thread(target=self._worker, name="fleet_poller-{}".format(k))
+                         for k in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def add(self, erg):
+        """
+        Starts polling erg
+        """
+        with self._cond:
+            self._ergs.add(erg)
+        self._schedule(erg)
+
+    def remove(self, erg):
+        """
+        Stops polling erg, a poll in progress is finished
+        """
+        with self._cond:
+            self._ergs.discard(erg)
+            self._heap = [entry for entry in self._heap if entry[2] is not erg]
+            heapq.heapify(self._heap)
+
+    def stop(self):
+        """
+        Stops the threads once their polls in progress are finished
+        """
+        with self._cond:
+            self.exit_requested = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join()
+
+    def _schedule(self, erg):
+        ready = erg.next_poll()
+        with self._cond:
+            if ready is None or erg not in self._ergs:
+                #nothing left to poll, or removed
+                return
+            heapq.heappush(self._heap, (ready, next(self._order), erg))
+            self._cond.notify()
+
+    def _next(self):
+        """
+        Waits for the next ready erg, returns its ready time and the erg, None to exit
+        """
+        with self._cond:
+            while not self.exit_requested:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - time.perf_counter()
+                if delay <= 0:
+                    ready, _, erg = heapq.heappop(self._heap)
+                    return ready, erg
+                #woken early if an erg is added
+                self._cond.wait(delay)
+        return None
+
+    def _worker(self):
+        while True:
+            entry = self._next()
+            if entry is None:
+                return
+            ready, erg = entry
+            now = time.perf_counter()
+            try:
+                erg.poll_due(now)
+            except Exception as e: # pylint: disable=broad-except
+                with self._cond:
+                    self._ergs.discard(erg)
+                if self.on_error is not None:
+                    self.on_error(erg, e)
+                continue
+            with self._cond:
+                self.polls += 1
+                self.lag += now - ready
+            self._schedule(erg)
+
+    def stats(self, now=None):
+        """
+        Returns the ergs polled, polls per second of all ergs and mean lag in seconds
+        """
+        if now is None:
+            now = time.perf_counter()
+        with self._cond:
+            ergs, polls, lag = len(self._ergs), self.polls, self.lag
+        return {
+            'ergs': ergs,
+            'rate': polls / (now - self.started) if now > self.started else 0.,
+            'lag': lag / polls if polls else 0.,
+        }
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+"""
+heartbeat.py
+Accumulates the beat intervals of heart beat data reads into one stream per erg
+"""
+
+import threading
+from array import array
+
+#beat intervals returned by one read when the buffer of the monitor is full
+BLOCK_INTERVALS = 16
+#intervals kept by default, about an hour of rowing at 140 beats per minute, 16 kB
+MAX_INTERVALS = 8192
+
+
+class HeartbeatStream(object):
+    """
+    Beat intervals of consecutive HeartbeatSamples, in the order the monitor returned them
+    The monitor returns each interval once, so appending every read has no duplicates;
+    a full block may mean that intervals were lost before the read, these are counted
+    in full_reads.
+    intervals: unsigned array of every interval, the oldest dropped beyond maxlen
+    callback: called with the array of new intervals of each read that returned any
+    maxlen: intervals kept, None to keep all
+    """
+    def __init__(self, callback=None, maxlen=MAX_INTERVALS):
+        self.intervals = array('H')
+        self.callback = callback
+        self.maxlen = maxlen
+        #position in intervals of the next interval returned by read_new
+        self._unread = 0
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.full_reads = 0
+        self.total = 0
+
+    def feed(self, sample):
+        """
+        Adds the intervals of a HeartbeatSample, returns them
+        """
+        new = sample.intervals
+        with self._lock:
+            self.reads += 1
+            if len(new) >= BLOCK_INTERVALS:
+                self.full_reads += 1
+            self.intervals.extend(new)
+            self.total += len(new)
+            if self.maxlen is not None and len(self.intervals) > self.maxlen:
+                excess = len(self.intervals) - self.maxlen
+                del self.intervals[:excess]
+                self._unread = max(self._unread - excess, 0)
+        if new and self.callback is not None:
+            self.callback(new)
+        return new
+
+    def read_new(self):
+        """
+        Returns an array of the intervals added since the last call
+        """
+        with self._lock:
+            new = self.intervals[self._unread:]
+            self._unread = len(self.intervals)
+        return new
+
+    def __iter__(self):
+        """
+        Iterates over the intervals not yet read by read_new or an earlier iteration
+        """
+        return iter(self.read_new())
+
+    def __len__(self):
+        return len(self.intervals)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+"""
+metadata.py
+Static data of every monitor seen, kept by serial number so that a reconnected erg
+is recognised without querying it again
+"""
+
+import threading
+
+#get_erg keys which do not change while a monitor is connected, status is left out
+ERG_FIELDS = ('mfgid', 'cid', 'model', 'hwversion', 'swversion', 'serial',
+              'maxrx', 'maxtx', 'mininterframe')
+MAX_ENTRIES = 256
+
+
+class ErgMetadata(object):
+    """
+    Static get_erg data of one monitor and what was learned about it while connected
+    gap: frame gap of the pacer when the erg was last detached, reused on reconnect
+    name: name given to the erg, such as by the ErgManager add callback
+    """
+    __slots__ = ERG_FIELDS + ('gap', 'name')
+
+    def __init__(self, gap=None, name=None, **values):
+        for field in ERG_FIELDS:
+            setattr(self, field, values.pop(field, None))
+        if values:
+            raise TypeError("Unknown fields: {}".format(", ".join(values)))
+        self.gap = gap
+        self.name = name
+
+    @classmethod
+    def from_ergdata(cls, ergdata):
+        """
+        Returns the metadata in a get_erg dictionary
+        """
+        return cls(**{field: ergdata[field] for field in ERG_FIELDS})
+
+    def same_erg(self, other):
+        """
+        Returns True if other holds the same static data
+        """
+        return all(getattr(self, field) == getattr(other, field) for field in ERG_FIELDS)
+
+    def as_dict(self, into=None):
+        """
+        Returns the static data as get_erg keys, written into the into dictionary if given
+        """
+        data = {} if into is None else into
+        for field in ERG_FIELDS:
+            data[field] = getattr(self, field)
+        return data
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={!r}".format(field, getattr(self, field)) for field in self.__slots__))
+
+
+class MetadataCache(object):
+    """
+    ErgMetadata by serial number, shared by the ergs of a process and safe to use
+    from their threads; cleared when it holds maxlen entries
+    hits, misses: lookups which found metadata and which did not
+    """
+    def __init__(self, maxlen=MAX_ENTRIES):
+        self.maxlen = maxlen
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, serial):
+        """
+        Returns the metadata of serial, or None if the monitor has not been seen
+        """
+        with self._lock:
+            metadata = self._entries.get(serial)
+            if metadata is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return metadata
+
+    def store(self, metadata):
+        """
+        Stores fresh metadata and returns the entry to use
+        The known entry is kept, with its gap and name, if its static data is the same
+        """
+        with self._lock:
+            known = self._entries.get(metadata.serial)
+            if known is not None and known.same_erg(metadata):
+                return known
+            if len(self._entries) >= self.maxlen:
+                self._entries.clear()
+            self._entries[metadata.serial] = metadata
+            return metadata
+
+    def discard(self, serial):
+        """
+        Forgets the metadata of serial
+        """
+        with self._lock:
+            self._entries.pop(serial, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, serial):
+        return serial in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+#cache used by every PyErg not given its own
+CACHE = MetadataCache()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+"""
+pacing.py
+Keeps the minimum gap between the frames sent to an erg, on the monotonic perf_counter clock
+"""
+
+import time
+
+MIN_FRAME_GAP = .050 #in seconds, used until the monitor reports its mininterframe
+MIN_ADAPTIVE_GAP = .010 #in seconds, the gap is never tightened below this
+ADAPT_FRAMES = 20 #clean responses between adaptive tightening steps
+ADAPT_FACTOR = 0.9
+
+#previous frame status, bits 4-5 of the status byte returned with every response
+PREVIOUS_FRAME_MASK = 0x30
+PREVIOUS_FRAME_OK = 0x00 #0x10 rejected, 0x20 bad, 0x30 not ready
+
+
+class FramePacer(object):
+    """
+    Frame pacing and timing statistics of one erg
+    gap: seconds between the end of one frame and the start of the next
+    basegap: gap from the mininterframe the monitor reports, MIN_FRAME_GAP until it is known
+    adaptive: tighten the gap by ADAPT_FACTOR every ADAPT_FRAMES clean responses, down to
+    mingap, and back off towards basegap whenever a response has to be read again, a read
+    times out or the status byte reports the previous frame was not accepted
+    frames, retries: frames sent and responses read again
+    timeouts, rejects: reads timed out and previous frames not accepted by the monitor
+    gap_time, usb_time: seconds spent waiting for the gap and in usb transfers
+    """
+    __slots__ = ('gap', 'basegap', 'mingap', 'adaptive', 'deadline', '_clean',
+                 'frames', 'retries', 'timeouts', 'rejects', 'gap_time', 'usb_time')
+
+    def __init__(self, gap=MIN_FRAME_GAP, adaptive=False, mingap=MIN_ADAPTIVE_GAP):
+        self.gap = gap
+        self.basegap = gap
+        self.mingap = mingap
+        self.adaptive = adaptive
+        self.deadline = 0.
+        self._clean = 0
+        self.frames = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.rejects = 0
+        self.gap_time = 0.
+        self.usb_time = 0.
+
+    def set_mininterframe(self, mininterframe):
+        """
+        Sets the gap from CSAFE_GETCAPS_CMD mininterframe, in milliseconds
+        The adapted gap is kept if the mininterframe has not changed
+        """
+        basegap = max(mininterframe / 1000., self.mingap)
+        if basegap == self.basegap:
+            return
+        self.basegap = basegap
+        self.gap = basegap
+        self._clean = 0
+
+    def delay(self, now=None):
+        """
+        Returns the seconds until the next frame may be sent
+        """
+        if now is None:
+            now = time.perf_counter()
+        return max(self.deadline - now, 0.)
+
+    def wait(self):
+        """
+        Sleeps until the next frame may be sent
+        """
+        delay = self.delay()
+        if delay:
+            time.sleep(delay)
+            self.waited(delay)
+
+    def waited(self, seconds):
+        """
+        Records time spent waiting for the gap
+        """
+        self.gap_time += seconds
+
+    def sent(self, now=None):
+        """
+        Records that a frame was written, the next may be sent one gap later
+        """
+        if now is None:
+            now = time.perf_counter()
+        self.deadline = now + self.gap
+        self.frames += 1
+
+    def answered(self, usb_time, retries=0, status=None):
+        """
+        Records the usb time of a frame, the number of times its response was read again
+        and the status byte of the response
+        """
+        self.usb_time += usb_time
+        self.retries += retries
+        rejected = (status is not None and
+                    status & PREVIOUS_FRAME_MASK != PREVIOUS_FRAME_OK)
+        if rejected:
+            self.rejects += 1
+        if not self.adaptive:
+            return
+        if retries or rejected:
+            self._back_off()
+            return
+        self._clean += 1
+        if self._clean >= ADAPT_FRAMES:
+            self.gap = max(self.gap * ADAPT_FACTOR, self.mingap)
+            self._clean = 0
+
+    def timed_out(self, usb_time):
+        """
+        Records a frame whose response was not received in time
+        """
+        self.usb_time += usb_time
+        self.timeouts += 1
+        if self.adaptive:
+            self._back_off()
+
+    def _back_off(self):
+        self.gap = min(self.gap * 2, self.basegap)
+        self._clean = 0
+
+    def stats(self):
+        """
+        Returns the pacing statistics as a dictionary
+        """
+        return {
+            'gap': self.gap,
+            'frames': self.frames,
+            'retries': self.retries,
+            'timeouts': self.timeouts,
+            'rejects': self.rejects,
+            'gap_time': self.gap_time,
+            'usb_time': self.usb_time,
+        }
@@ -13,18 +13,53 @@ Interface to concept2 indoor rower
 """
 
 import datetime
+import errno
+import threading
 import time
 import sys
 
 import usb.core
-import usb.util
 from usb import USBError
 
+from pyrow.coalesce import Coalescer
 from pyrow.csafe import csafe_cmd
+from pyrow.metadata import CACHE, ErgMetadata
+from pyrow.pacing import FramePacer, MIN_FRAME_GAP
+from pyrow.samples import MonitorSample, ForcePlotSample, HeartbeatSample, WorkoutSample
+from pyrow.transport import INTERFACE, Transport, UsbTransport # pylint: disable=unused-import
 
 C2_VENDOR_ID = 0x17a4
-MIN_FRAME_GAP = .050 #in seconds
-INTERFACE = 0
+
+#command lists sent by PyErg.get_monitor, get_forceplot, get_heartbeat, get_workout and get_erg
+MONITOR_COMMANDS = ('CSAFE_PM_GET_WORKTIME', 'CSAFE_PM_GET_WORKDISTANCE', 'CSAFE_GETCADENCE_CMD',
+                    'CSAFE_GETPOWER_CMD', 'CSAFE_GETCALORIES_CMD', 'CSAFE_GETHRCUR_CMD')
+FORCEPLOT_COMMANDS = ('CSAFE_PM_GET_FORCEPLOTDATA', 32, 'CSAFE_PM_GET_STROKESTATE')
+HEARTBEAT_COMMANDS = ('CSAFE_PM_GET_HEARTBEATDATA', 32)
+WORKOUT_COMMANDS = ('CSAFE_GETID_CMD', 'CSAFE_PM_GET_WORKOUTTYPE', 'CSAFE_PM_GET_WORKOUTSTATE',
+                    'CSAFE_PM_GET_INTERVALTYPE', 'CSAFE_PM_GET_WORKOUTINTERVALCOUNT')
+ERG_COMMANDS = ('CSAFE_GETVERSION_CMD', 'CSAFE_GETSERIAL_CMD', 'CSAFE_GETCAPS_CMD', 0x00)
+#sent by PyErg.attach to look the erg up in the metadata cache
+SERIAL_COMMANDS = ('CSAFE_GETSERIAL_CMD',)
+
+#commands returning each get_monitor field, pace and calhr are derived from power,
+#status is returned with every response
+MONITOR_FIELDS = {
+    'time': ('CSAFE_PM_GET_WORKTIME',),
+    'distance': ('CSAFE_PM_GET_WORKDISTANCE',),
+    'spm': ('CSAFE_GETCADENCE_CMD',),
+    'power': ('CSAFE_GETPOWER_CMD',),
+    'pace': ('CSAFE_GETPOWER_CMD',),
+    'calhr': ('CSAFE_GETPOWER_CMD',),
+    'calories': ('CSAFE_GETCALORIES_CMD',),
+    'heartrate': ('CSAFE_GETHRCUR_CMD',),
+    'forceplot': ('CSAFE_PM_GET_FORCEPLOTDATA', 32),
+    'strokestate': ('CSAFE_PM_GET_STROKESTATE',),
+    'status': (),
+}
+#standard commands first, PM3 commands last so that they share one wrapper
+_MONITOR_ORDER = ('spm', 'power', 'pace', 'calhr', 'calories', 'heartrate', 'time', 'distance',
+                  'forceplot', 'strokestate')
+_monitor_commands = {}
 
 ERG_MAPPING = {
     # List of stroke states
@@ -126,6 +161,79 @@ def get_pretty(data_dict, pretty):
                     # print("IndexError")
     return data_dict
 
+def monitor_commands(fields=None, forceplot=False):
+    """
+    Returns the command list (a tuple) polling the get_monitor fields, see MONITOR_FIELDS
+    fields: iterable of field names, None for all fields but the force plot ones
+    forceplot: also poll forceplot and strokestate
+    """
+    if fields is None:
+        return MONITOR_COMMANDS + FORCEPLOT_COMMANDS if forceplot else MONITOR_COMMANDS
+
+    fields = frozenset(fields)
+    key = (fields, forceplot)
+    command = _monitor_commands.get(key)
+    if command is None:
+        unknown = fields.difference(MONITOR_FIELDS)
+        if unknown:
+            raise ValueError("Unknown monitor fields: {}".format(", ".join(sorted(unknown))))
+        if forceplot:
+            fields = fields.union(('forceplot', 'strokestate'))
+        command = []
+        for field in _MONITOR_ORDER:
+            if field in fields and MONITOR_FIELDS[field][0] not in command:
+                command.extend(MONITOR_FIELDS[field])
+        if not command:
+            #status only
+            command = ['CSAFE_GETSTATUS_CMD']
+        command = tuple(command)
+        _monitor_commands[key] = command
+    return command
+
+def decode_monitor_batch(reports, forceplot=False):
+    """
+    Decodes recorded get_monitor responses, a 2-D uint8 array with one usb report per row
+    Returns a dictionary of columns, and valid, the rows which decoded:
+    worktime: time in seconds
+    workdistance: distance in meters
+    cadence: strokes per minute
+    power: power in watts
+    calories: calories burned
+    heartrate: heartrate
+    status
+    if forceplot:
+        forceplot: int16 force plot data, a row of 16 points of which forcepoints are valid
+        forcepoints
+        strokestate
+    """
+    import numpy as np
+    from pyrow.csafe import csafe_batch
+
+    command = MONITOR_COMMANDS
+    if forceplot:
+        command = MONITOR_COMMANDS + FORCEPLOT_COMMANDS
+    results, valid = csafe_batch.decode_batch(reports, command)
+    if not valid.any():
+        raise ValueError("No valid reports")
+
+    monitor = {'valid': valid}
+    monitor['worktime'] = (results['CSAFE_PM_GET_WORKTIME'][:, 0] + \
+        results['CSAFE_PM_GET_WORKTIME'][:, 1])/100.
+    monitor['workdistance'] = (results['CSAFE_PM_GET_WORKDISTANCE'][:, 0] + \
+        results['CSAFE_PM_GET_WORKDISTANCE'][:, 1])/10.
+    monitor['cadence'] = results['CSAFE_GETCADENCE_CMD'][:, 0]
+    monitor['power'] = results['CSAFE_GETPOWER_CMD'][:, 0]
+    monitor['calories'] = results['CSAFE_GETCALORIES_CMD'][:, 0]
+    monitor['heartrate'] = results['CSAFE_GETHRCUR_CMD'][:, 0]
+    if forceplot:
+        monitor['forcepoints'] = results['CSAFE_PM_GET_FORCEPLOTDATA'][:, 0] // 2
+        #same int16 reinterpretation of the words as MonitorSample
+        monitor['forceplot'] = results['CSAFE_PM_GET_FORCEPLOTDATA'][:, 1:].astype(
+            np.uint16, copy=False).view(np.int16)
+        monitor['strokestate'] = results['CSAFE_PM_GET_STROKESTATE'][:, 0]
+    monitor['status'] = results['CSAFE_GETSTATUS_CMD'][:, 0] & 0xF
+    return monitor
+
 def find():
     """
     Returns list of pyusb Devices which are ergs.
@@ -154,52 +262,45 @@ class PyErg(object):
     """
     Manages low-level erg communication
     """
-    def __init__(self, erg):
+    def __init__(self, erg, adaptive=False, coalesce=False, cache=None):
         """
         Configures usb connection and sets erg value
+        erg: pyusb device of the erg, or a transport.Transport such as a
+        transport.MemoryTransport to an emulator.ErgEmulator
+        adaptive: tighten the frame gap while the erg answers cleanly, see pacing.FramePacer
+        coalesce: merge the commands sent by several threads within a frame gap,
+        see coalesce.Coalescer
+        cache: metadata.MetadataCache of the static erg data, metadata.CACHE if None
         """
-        from warnings import warn
-
-        if sys.platform != 'win32':
-            try:
-                #Check to see if driver is attached to kernel (linux)
-                if erg.is_kernel_driver_active(INTERFACE):
-                    erg.detach_kernel_driver(INTERFACE)
-                else:
-                    warn("DEBUG: usb kernel driver not on {}".format(sys.platform))
-            except:
-                raise
-
-        #Claim interface (Needs Testing To See If Necessary)
-        usb.util.claim_interface(erg, INTERFACE)
-
-        #Linux throws error, reason unknown
-        try:
-            erg.set_configuration() #required to configure USB connection
-            #Ubuntu Linux returns 'usb.core.USBError: Resource busy' but rest of code still works
-        except USBError as e:
-            warn("DEBUG: usb error whilst setting configuration, {}".format(e))
-        # except Exception as e:
-        #     if not isinstance(e, USBError):
-        #         raise e
-
-        self.erg = erg
-
-        configuration = erg[0]
-        iface = configuration[(0, 0)]
-        self.inEndpoint = iface[0].bEndpointAddress
-        self.outEndpoint = iface[1].bEndpointAddress
-
-        self.__lastsend = datetime.datetime.now()
+        if not isinstance(erg, Transport):
+            erg = UsbTransport(erg)
+        self.transport = erg
+
+        #reusable report buffers, filled in place on every send
+        self._outreports = csafe_cmd.report_buffers()
+        self._inreports = csafe_cmd.report_buffers()
+        #one frame at a time in the buffers, such as set_workout while another thread polls
+        self._lock = threading.RLock()
+
+        #frame gap, learned from the mininterframe returned by get_erg
+        self.pacer = FramePacer(MIN_FRAME_GAP, adaptive=adaptive)
+        self._coalescer = Coalescer(self._send, self.pacer) if coalesce else None
+
+        self.cache = CACHE if cache is None else cache
+        #metadata.ErgMetadata of the erg, known after attach or get_erg
+        self.metadata = None
+        #longest frame sent, the maxrx of the erg once known
+        self.maxframe = csafe_cmd.MAX_FRAME_LENGTH
 
     @staticmethod
     def _checkvalue(*args, **kwargs):
         return checkvalue(*args, **kwargs)
 
-    def get_monitor(self, forceplot=False, pretty=False):
+    def get_monitor(self, forceplot=False, pretty=False, fields=None):
         """
         Returns values from the monitor that relate to the current workout,
         optionally returns force plot data and stroke state. (* required)
+        fields: only poll the commands needed for these fields, see monitor_commands
         time: time in seconds
         distance: distance in meters
         spm: strokes per minute
@@ -213,91 +314,128 @@ class PyErg(object):
             forceplot: force plot data
             strokestate
         """
-
-        command = ['CSAFE_PM_GET_WORKTIME', 'CSAFE_PM_GET_WORKDISTANCE', 'CSAFE_GETCADENCE_CMD',
-                   'CSAFE_GETPOWER_CMD', 'CSAFE_GETCALORIES_CMD', 'CSAFE_GETHRCUR_CMD']
-
-        if forceplot:
-            command.extend(['CSAFE_PM_GET_FORCEPLOTDATA', 32, 'CSAFE_PM_GET_STROKESTATE'])
-        results = self.send(command)
-
-        monitor = {}
-        monitor['time'] = (results['CSAFE_PM_GET_WORKTIME'][0] + \
-            results['CSAFE_PM_GET_WORKTIME'][1])/100.
-
-        monitor['distance'] = (results['CSAFE_PM_GET_WORKDISTANCE'][0] + \
-            results['CSAFE_PM_GET_WORKDISTANCE'][1])/10.
-
-        monitor['spm'] = results['CSAFE_GETCADENCE_CMD'][0]
-        #Rowing machine always returns power as Watts
-        monitor['power'] = results['CSAFE_GETPOWER_CMD'][0]
-        if monitor['power']:
-            monitor['pace'] = ((2.8 / results['CSAFE_GETPOWER_CMD'][0]) ** (1./3)) * 500
-            monitor['calhr'] = results['CSAFE_GETPOWER_CMD'][0]  * (4.0 * 0.8604) + 300.
-        else:
-            monitor['pace'], monitor['calhr'] = 0, 0
-        monitor['calories'] = results['CSAFE_GETCALORIES_CMD'][0]
-        monitor['heartrate'] = results['CSAFE_GETHRCUR_CMD'][0]
-
-        if forceplot:
-            #get amount of returned data in bytes
-            datapoints = results['CSAFE_PM_GET_FORCEPLOTDATA'][0] // 2
-            monitor['forceplot'] = results['CSAFE_PM_GET_FORCEPLOTDATA'][1:(datapoints+1)]
-            monitor['strokestate'] = results['CSAFE_PM_GET_STROKESTATE'][0]
-
-        monitor['status'] = results['CSAFE_GETSTATUS_CMD'][0] & 0xF
-
+        monitor = self.get_monitor_sample(forceplot, fields).as_dict()
         monitor = get_pretty(monitor, pretty)
         return monitor
 
+    def get_monitor_sample(self, forceplot=False, fields=None):
+        """
+        Returns get_monitor values as a MonitorSample
+        """
+        results = self.send(monitor_commands(fields, forceplot))
+        return MonitorSample.from_results(results)
+
     def get_forceplot(self, pretty=False):
         """
         Returns force plot data and stroke state
         """
-
-        command = ['CSAFE_PM_GET_FORCEPLOTDATA', 32, 'CSAFE_PM_GET_STROKESTATE']
-        results = self.send(command)
-
-        forceplot = {}
-        datapoints = results['CSAFE_PM_GET_FORCEPLOTDATA'][0] // 2
-        forceplot['forceplot'] = results['CSAFE_PM_GET_FORCEPLOTDATA'][1:(datapoints+1)]
-        forceplot['strokestate'] = results['CSAFE_PM_GET_STROKESTATE'][0]
-
-        forceplot['status'] = results['CSAFE_GETSTATUS_CMD'][0] & 0xF
-
+        forceplot = self.get_forceplot_sample().as_dict()
         forceplot = get_pretty(forceplot, pretty)
         return forceplot
 
+    def get_forceplot_sample(self):
+        """
+        Returns get_forceplot values as a ForcePlotSample
+        """
+        results = self.send(FORCEPLOT_COMMANDS)
+        return ForcePlotSample.from_results(results)
 
-    def get_workout(self, pretty=False):
+    def get_heartbeat(self):
         """
-        Returns overall workout data
+        Returns the heart beat data the monitor gathered since the last read
+        intervals: beat intervals
+        status
         """
+        return self.get_heartbeat_sample().as_dict()
 
-        command = ['CSAFE_GETID_CMD', 'CSAFE_PM_GET_WORKOUTTYPE', 'CSAFE_PM_GET_WORKOUTSTATE',
-                   'CSAFE_PM_GET_INTERVALTYPE', 'CSAFE_PM_GET_WORKOUTINTERVALCOUNT']
-        results = self.send(command)
+    def get_heartbeat_sample(self):
+        """
+        Returns get_heartbeat values as a HeartbeatSample
+        """
+        results = self.send(HEARTBEAT_COMMANDS)
+        return HeartbeatSample.from_results(results)
 
-        workoutdata = {}
-        workoutdata['userid'] = results['CSAFE_GETID_CMD'][0]
-        workoutdata['type'] = results['CSAFE_PM_GET_WORKOUTTYPE'][0]
-        workoutdata['state'] = results['CSAFE_PM_GET_WORKOUTSTATE'][0]
-        workoutdata['inttype'] = results['CSAFE_PM_GET_INTERVALTYPE'][0]
-        workoutdata['intcount'] = results['CSAFE_PM_GET_WORKOUTINTERVALCOUNT'][0]
+    def capture_forcecurves(self, callback=None, **kwargs):
+        """
+        Returns a capture.ForceCurveCapture of this erg, which assembles the force curve
+        of every stroke; callback is called with each capture.Stroke
+        """
+        from pyrow.capture import ForceCurveCapture
 
-        workoutdata['status'] = results['CSAFE_GETSTATUS_CMD'][0] & 0xF
+        return ForceCurveCapture(self, callback=callback, **kwargs)
 
+    def get_workout(self, pretty=False):
+        """
+        Returns overall workout data
+        """
+        workoutdata = self.get_workout_sample().as_dict()
         workoutdata = get_pretty(workoutdata, pretty)
         return workoutdata
 
+    def get_workout_sample(self):
+        """
+        Returns get_workout values as a WorkoutSample
+        """
+        results = self.send(WORKOUT_COMMANDS)
+        return WorkoutSample.from_results(results)
+
     def get_erg(self, pretty=False):
         """
         Returns all erg data that is not related to the workout
         """
 
-        command = ['CSAFE_GETVERSION_CMD', 'CSAFE_GETSERIAL_CMD', 'CSAFE_GETCAPS_CMD', 0x00]
-        results = self.send(command)
+        results = self.send(ERG_COMMANDS)
+        ergdata = self._ergdata(results)
+        ergdata = get_pretty(ergdata, pretty)
+        return ergdata
 
+    def attach(self):
+        """
+        Identifies the erg by its serial number and applies its cached metadata,
+        the frame gap, frame length and name, only querying get_erg for an unknown erg
+        Returns the metadata.ErgMetadata of the erg
+        """
+        results = self.send(SERIAL_COMMANDS)
+        metadata = self._attached(results['CSAFE_GETSERIAL_CMD'][0])
+        if metadata is None:
+            self.get_erg()
+            metadata = self.metadata
+        return metadata
+
+    def _attached(self, serial):
+        """
+        Applies the cached metadata of serial, returns it or None if it is not cached
+        """
+        if self.metadata is not None and self.metadata.serial == serial:
+            return self.metadata
+        metadata = self.cache.get(serial)
+        if metadata is not None:
+            self._apply(metadata)
+        return metadata
+
+    def _apply(self, metadata):
+        self.metadata = metadata
+        self.pacer.set_mininterframe(metadata.mininterframe)
+        if metadata.gap is not None and self.pacer.adaptive:
+            #the gap adapted during the previous connection
+            self.pacer.gap = min(max(metadata.gap, self.pacer.mingap), self.pacer.basegap)
+        self.maxframe = csafe_cmd.MAX_FRAME_LENGTH
+        if metadata.maxrx:
+            self.maxframe = min(metadata.maxrx, csafe_cmd.MAX_FRAME_LENGTH)
+
+    def detach(self):
+        """
+        Records the frame gap in the metadata of the erg and releases the connection
+        """
+        if self.metadata is not None:
+            self.metadata.gap = self.pacer.gap
+        self.transport.close()
+
+    def _ergdata(self, results):
+        """
+        Converts the response to ERG_COMMANDS, learns the frame gap of the erg and
+        stores its metadata, replacing the cached metadata if the erg has changed
+        """
         ergdata = {}
         #Get data from csafe get version command
         ergdata['mfgid'] = results['CSAFE_GETVERSION_CMD'][0]
@@ -311,10 +449,11 @@ class PyErg(object):
         ergdata['maxrx'] = results['CSAFE_GETCAPS_CMD'][0]
         ergdata['maxtx'] = results['CSAFE_GETCAPS_CMD'][1]
         ergdata['mininterframe'] = results['CSAFE_GETCAPS_CMD'][2]
+        metadata = ErgMetadata.from_ergdata(ergdata)
+        if self.metadata is None or not self.metadata.same_erg(metadata):
+            self._apply(self.cache.store(metadata))
 
         ergdata['status'] = results['CSAFE_GETSTATUS_CMD'][0] & 0xF
-
-        ergdata = get_pretty(ergdata, pretty)
         return ergdata
 
     def get_status(self, pretty=False):
@@ -358,11 +497,21 @@ class PyErg(object):
         powerpace: watts
         """
         self.send(['CSAFE_RESET_CMD'])
+        self.send(self._workout_command(program, workout_time, distance, split,
+                                        pace, calpace, powerpace))
+
+    @classmethod
+    def _workout_command(cls, program=None, workout_time=None, distance=None,
+                         split=None,
+                         pace=None, calpace=None, powerpace=None):
+        """
+        Returns the command list which sets a workout, see set_workout
+        """
         command = []
 
         #Set Workout Goal
         if program != None:
-            self._checkvalue(program, "Program", 0, 15)
+            cls._checkvalue(program, "Program", 0, 15)
         elif workout_time != None:
             if len(workout_time) == 1:
                 #if only seconds in workout_time then pad minutes
@@ -370,9 +519,9 @@ class PyErg(object):
             if len(workout_time) == 2:
                 #if no hours in workout_time then pad hours
                 workout_time.insert(0, 0) #if no hours in workout_time then pad hours
-            self._checkvalue(workout_time[0], "Time Hours", 0, 9)
-            self._checkvalue(workout_time[1], "Time Minutes", 0, 59)
-            self._checkvalue(workout_time[2], "Time Seconds", 0, 59)
+            cls._checkvalue(workout_time[0], "Time Hours", 0, 9)
+            cls._checkvalue(workout_time[1], "Time Minutes", 0, 59)
+            cls._checkvalue(workout_time[2], "Time Seconds", 0, 59)
 
             if workout_time[0] == 0 and workout_time[1] == 0 and workout_time[2] < 20:
                 #checks if workout is < 20 seconds
@@ -382,7 +531,7 @@ class PyErg(object):
                             workout_time[1], workout_time[2]])
 
         elif distance != None:
-            self._checkvalue(distance, "Distance", 100, 50000)
+            cls._checkvalue(distance, "Distance", 100, 50000)
             command.extend(['CSAFE_SETHORIZONTAL_CMD', distance, 36]) #36 = meters
 
         #Set Split
@@ -393,11 +542,11 @@ class PyErg(object):
                 time_raw = workout_time[0]*3600+workout_time[1]*60+workout_time[2]
                 #split workout_time that will occur 30 workout_times (.01 sec)
                 minsplit = int(time_raw/30*100+0.5)
-                self._checkvalue(split, "Split Time", max(2000, minsplit), time_raw*100)
+                cls._checkvalue(split, "Split Time", max(2000, minsplit), time_raw*100)
                 command.extend(['CSAFE_PM_SET_SPLITDURATION', 0, split])
             elif distance is not None and program is None:
                 minsplit = int(distance/30+0.5) #split distance that will occur 30 workout_times (m)
-                self._checkvalue(split, "Split distance", max(100, minsplit), distance)
+                cls._checkvalue(split, "Split distance", max(100, minsplit), distance)
                 command.extend(['CSAFE_PM_SET_SPLITDURATION', 128, split])
             else:
                 raise ValueError("Cannot set split for current goal")
@@ -415,45 +564,79 @@ class PyErg(object):
             program = 0
 
         command.extend(['CSAFE_SETPROGRAM_CMD', program, 0, 'CSAFE_GOINUSE_CMD'])
-
-        self.send(command)
+        return command
 
     def send(self, message):
         """
         Converts and sends message to erg; receives, converts, and returns ergs response
+        Messages which do not fit in one frame are split by csafe_cmd.plan_frames,
+        the frames are sent back to back and their responses merged
+        Safe to call from several threads, messages are sent one after the other
+        """
+        if self._coalescer is not None:
+            return self._coalescer.send(message)
+        return self._send(message)
+
+    def _send(self, message):
+        frames = csafe_cmd.plan_frames(message, self.maxframe)
+        with self._lock:
+            if len(frames) == 1:
+                return self._send_frame(frames[0])
+
+            response = {}
+            for frame in frames:
+                response.update(self._send_frame(frame))
+            return response
+
+    def _send_frame(self, message):
+        """
+        Sends a single frame to erg and returns the converted response
         """
 
         #Checks that enough time has passed since the last message was sent,
         #if not program sleeps till time has passed
-        now = datetime.datetime.now()
-        delta = now - self.__lastsend
-        deltaraw = delta.seconds + delta.microseconds/1000000.
-        if deltaraw < MIN_FRAME_GAP:
-            time.sleep(MIN_FRAME_GAP - deltaraw)
-
-        #convert message to byte array
-        csafe = csafe_cmd.write(message)
-        #sends message to erg and records length of message
-        try:
-            length = self.erg.write(self.outEndpoint, csafe, timeout=2000)
-        # Checks for USBError 16: Resource busy
-        except USBError as e:
-            if e.errno != 19:
-                raise ConnectionError("USB device disconected")
+        self.pacer.wait()
+        return self.transfer(message)
+
+    def transfer(self, message):
+        """
+        Sends a single frame to erg without waiting for the frame gap,
+        blocks until the response is received and returns it converted
+        """
+        with self._lock:
+            return self._transfer(message)
+
+    def _transfer(self, message):
+        #convert message to a usb report in the output buffer of its size
+        csafe = csafe_cmd.write_into(message, self._outreports)
+        if csafe is None:
+            return []
+        #sends message to erg
+        start = time.perf_counter()
+        self.transport.write(csafe)
         #records time when message was sent
-        self.__lastsend = datetime.datetime.now()
+        self.pacer.sent()
 
+        #response is read into the input buffer of the same size
+        transmission = self._inreports[len(csafe)]
         response = []
+        retries = -1
         while not response:
+            retries += 1
             try:
                 #recieves byte array from erg
-                transmission = self.erg.read(self.inEndpoint, length, timeout=2000)
-                response = csafe_cmd.read(transmission)
-            except Exception as e:
+                received = self.transport.read(transmission)
+                if received < len(transmission):
+                    response = csafe_cmd.read(memoryview(transmission)[:received], message)
+                else:
+                    response = csafe_cmd.read(transmission, message)
+            except (USBError, TimeoutError) as e:
+                #No message was recieved back from erg, the next frame waits longer
+                if isinstance(e, TimeoutError) or e.errno == errno.ETIMEDOUT:
+                    self.pacer.timed_out(time.perf_counter() - start)
                 raise e
-                #Replace with error or let error trigger?
-                #No message was recieved back from erg
-                # return []
 
+        self.pacer.answered(time.perf_counter() - start, retries,
+                            response['CSAFE_GETSTATUS_CMD'][0])
         #convers byte array to response dictionary
         return response
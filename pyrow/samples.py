@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+"""
+samples.py
+Compact records of the data returned by a single poll of an erg
+"""
+
+import struct
+import time
+from array import array
+
+
+class Sample(object):
+    """
+    Base class of the sample records
+    FIELDS are the keys of as_dict, fields which were not polled are None
+    timestamp is the host time.time() when the response was received
+    """
+    __slots__ = ('timestamp',)
+    FIELDS = ()
+
+    def __init__(self, timestamp=None, **values):
+        self.timestamp = time.time() if timestamp is None else timestamp
+        for field in self.FIELDS:
+            setattr(self, field, values.pop(field, None))
+        if values:
+            raise TypeError("Unknown fields: {}".format(", ".join(values)))
+
+    def as_dict(self, into=None):
+        """
+        Returns the polled fields as a dictionary, written into the into dictionary if given
+        """
+        data = {} if into is None else into
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        return data
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={!r}".format(field, getattr(self, field)) for field in ('timestamp',) + self.FIELDS))
+
+
+def _forceplot(results):
+    #get amount of returned data in bytes
+    datapoints = results['CSAFE_PM_GET_FORCEPLOTDATA'][0] // 2
+    words = results['CSAFE_PM_GET_FORCEPLOTDATA'][1:(datapoints+1)]
+    #the decoder returns unsigned words, their bits are reinterpreted as int16
+    return array('h', struct.pack('{}H'.format(len(words)), *words))
+
+
+class MonitorSample(Sample):
+    """
+    Values from the monitor that relate to the current workout, see PyErg.get_monitor
+    forceplot is an int16 array, fields whose commands were not polled are None
+    """
+    __slots__ = ('time', 'distance', 'spm', 'power', 'pace', 'calhr', 'calories', 'heartrate',
+                 'forceplot', 'strokestate', 'status')
+    FIELDS = __slots__
+
+    @classmethod
+    def from_results(cls, results, timestamp=None):
+        """
+        Creates a sample from the response to PyErg.get_monitor
+        """
+        sample = cls(timestamp)
+        if 'CSAFE_PM_GET_WORKTIME' in results:
+            sample.time = (results['CSAFE_PM_GET_WORKTIME'][0] + \
+                results['CSAFE_PM_GET_WORKTIME'][1])/100.
+
+        if 'CSAFE_PM_GET_WORKDISTANCE' in results:
+            sample.distance = (results['CSAFE_PM_GET_WORKDISTANCE'][0] + \
+                results['CSAFE_PM_GET_WORKDISTANCE'][1])/10.
+
+        if 'CSAFE_GETCADENCE_CMD' in results:
+            sample.spm = results['CSAFE_GETCADENCE_CMD'][0]
+        if 'CSAFE_GETPOWER_CMD' in results:
+            #Rowing machine always returns power as Watts
+            sample.set_power(results['CSAFE_GETPOWER_CMD'][0])
+        if 'CSAFE_GETCALORIES_CMD' in results:
+            sample.calories = results['CSAFE_GETCALORIES_CMD'][0]
+        if 'CSAFE_GETHRCUR_CMD' in results:
+            sample.heartrate = results['CSAFE_GETHRCUR_CMD'][0]
+
+        if 'CSAFE_PM_GET_FORCEPLOTDATA' in results:
+            sample.forceplot = _forceplot(results)
+        if 'CSAFE_PM_GET_STROKESTATE' in results:
+            sample.strokestate = results['CSAFE_PM_GET_STROKESTATE'][0]
+
+        sample.status = results['CSAFE_GETSTATUS_CMD'][0] & 0xF
+        return sample
+
+    def set_power(self, power):
+        """
+        Sets power and the values derived from it, pace and calhr
+        """
+        self.power = power
+        if power:
+            self.pace = ((2.8 / power) ** (1./3)) * 500
+            self.calhr = power * (4.0 * 0.8604) + 300.
+        else:
+            self.pace, self.calhr = 0, 0
+
+    def as_dict(self, into=None):
+        data = Sample.as_dict(self, into)
+        if self.forceplot is not None:
+            data['forceplot'] = self.forceplot.tolist()
+        return data
+
+
+class ForcePlotSample(Sample):
+    """
+    Force plot data and stroke state, see PyErg.get_forceplot
+    forceplot is an int16 array
+    """
+    __slots__ = ('forceplot', 'strokestate', 'status')
+    FIELDS = __slots__
+
+    @classmethod
+    def from_results(cls, results, timestamp=None):
+        """
+        Creates a sample from the response to PyErg.get_forceplot
+        """
+        sample = cls(timestamp)
+        sample.forceplot = _forceplot(results)
+        sample.strokestate = results['CSAFE_PM_GET_STROKESTATE'][0]
+        sample.status = results['CSAFE_GETSTATUS_CMD'][0] & 0xF
+        return sample
+
+    def as_dict(self, into=None):
+        data = Sample.as_dict(self, into)
+        data['forceplot'] = self.forceplot.tolist()
+        return data
+
+
+class HeartbeatSample(Sample):
+    """
+    Heart beat data gathered by the monitor since the last read, see PyErg.get_heartbeat
+    intervals is an unsigned array of the beat intervals
+    """
+    __slots__ = ('intervals', 'status')
+    FIELDS = __slots__
+
+    @classmethod
+    def from_results(cls, results, timestamp=None):
+        """
+        Creates a sample from the response to PyErg.get_heartbeat
+        """
+        sample = cls(timestamp)
+        #get amount of returned data in bytes
+        datapoints = results['CSAFE_PM_GET_HEARTBEATDATA'][0] // 2
+        sample.intervals = array('H', results['CSAFE_PM_GET_HEARTBEATDATA'][1:(datapoints+1)])
+        sample.status = results['CSAFE_GETSTATUS_CMD'][0] & 0xF
+        return sample
+
+    def as_dict(self, into=None):
+        data = Sample.as_dict(self, into)
+        data['intervals'] = self.intervals.tolist()
+        return data
+
+
+class WorkoutSample(Sample):
+    """
+    Overall workout data, see PyErg.get_workout
+    """
+    __slots__ = ('userid', 'type', 'state', 'inttype', 'intcount', 'status')
+    FIELDS = __slots__
+
+    @classmethod
+    def from_results(cls, results, timestamp=None):
+        """
+        Creates a sample from the response to PyErg.get_workout
+        """
+        sample = cls(timestamp)
+        sample.userid = results['CSAFE_GETID_CMD'][0]
+        sample.type = results['CSAFE_PM_GET_WORKOUTTYPE'][0]
+        sample.state = results['CSAFE_PM_GET_WORKOUTSTATE'][0]
+        sample.inttype = results['CSAFE_PM_GET_INTERVALTYPE'][0]
+        sample.intcount = results['CSAFE_PM_GET_WORKOUTINTERVALCOUNT'][0]
+        sample.status = results['CSAFE_GETSTATUS_CMD'][0] & 0xF
+        return sample
+
+
+#type code of each sample class in packed records
+_SAMPLE_TYPES = (MonitorSample, ForcePlotSample, HeartbeatSample, WorkoutSample)
+_HEADER = struct.Struct('<Bd')
+_INT = struct.Struct('<i')
+_FLOAT = struct.Struct('<d')
+_LENGTH = struct.Struct('<H')
+
+
+def pack(sample):
+    """
+    Returns a sample as a compact binary record, see unpack
+    Every field is a type tag followed by its value: None, int32, float64, ascii string,
+    or int16 or uint16 array
+    """
+    parts = [_HEADER.pack(_SAMPLE_TYPES.index(type(sample)), sample.timestamp)]
+    for field in sample.FIELDS:
+        value = getattr(sample, field)
+        if value is None:
+            parts.append(b'n')
+        elif isinstance(value, array):
+            parts.append(value.typecode.encode() + _LENGTH.pack(len(value)) + value.tobytes())
+        elif isinstance(value, str):
+            raw = value.encode('ascii')
+            parts.append(b's' + _LENGTH.pack(len(raw)) + raw)
+        elif isinstance(value, float):
+            parts.append(b'd' + _FLOAT.pack(value))
+        else:
+            parts.append(b'i' + _INT.pack(value))
+    return b''.join(parts)
+
+
+def unpack(record):
+    """
+    Returns the sample of a record made by pack
+    """
+    code, timestamp = _HEADER.unpack_from(record)
+    sample = _SAMPLE_TYPES[code](timestamp)
+    k = _HEADER.size
+    for field in sample.FIELDS:
+        tag = record[k:k + 1]
+        k += 1
+        if tag == b'n':
+            continue
+        if tag == b'd':
+            value = _FLOAT.unpack_from(record, k)[0]
+            k += _FLOAT.size
+        elif tag == b'i':
+            value = _INT.unpack_from(record, k)[0]
+            k += _INT.size
+        else:
+            length = _LENGTH.unpack_from(record, k)[0]
+            k += _LENGTH.size
+            if tag == b's':
+                value = bytes(record[k:k + length]).decode('ascii')
+                k += length
+            else:
+                value = array(tag.decode())
+                value.frombytes(bytes(record[k:k + length * value.itemsize]))
+                k += length * value.itemsize
+        setattr(sample, field, value)
+    return sample
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+"""
+scheduler.py
+Polls groups of erg values at their own rates, sending whatever is due in one command list
+"""
+
+import time
+
+from pyrow.csafe import csafe_cmd, csafe_dic
+from pyrow.heartbeat import HeartbeatStream
+from pyrow.pyrow import (FORCEPLOT_COMMANDS, HEARTBEAT_COMMANDS, WORKOUT_COMMANDS, ERG_COMMANDS,
+                         ERG_MAPPING, monitor_commands)
+from pyrow.samples import MonitorSample, ForcePlotSample, HeartbeatSample, WorkoutSample
+
+GROUPS = ('forceplot', 'heartbeat', 'monitor', 'workout', 'erg')
+
+#polls per second of each group, 0 polls the group once per connection,
+#heartbeat is only polled if given a rate
+DEFAULT_RATES = {
+    'forceplot': 20,
+    'monitor': 5,
+    'workout': 1,
+    'erg': 0,
+}
+
+#polled as often as the frame gap allows
+MAX_RATE = float('inf')
+
+#rates of the adaptive mode in each stroke phase, see stroke_phase
+PHASE_RATES = {
+    'drive': {'forceplot': MAX_RATE, 'monitor': 5, 'workout': 1},
+    'recovery': {'forceplot': 10, 'monitor': 5, 'workout': 1},
+    'idle': {'forceplot': 1, 'monitor': 1, 'workout': 1},
+}
+
+DRIVE = ERG_MAPPING['strokestate'].index('Drive')
+WAIT_MIN_SPEED = ERG_MAPPING['strokestate'].index('Wait for min speed')
+#workout states in which nobody is rowing
+IDLE_WORKOUT_STATES = frozenset(ERG_MAPPING['workoutstate'].index(state) for state in (
+    'Waiting begin', 'Workout end', 'Workout terminate', 'Workout logged'))
+
+_combined_cache = {}
+_COMBINED_CACHE_SIZE = 256
+
+
+def combine(command_lists):
+    """
+    Returns one command list (a tuple) sending every command of command_lists once,
+    standard commands first so that the PM3 commands share one wrapper
+    """
+    key = tuple(tuple(commands) for commands in command_lists)
+    combined = _combined_cache.get(key)
+    if combined is None:
+        seen = set()
+        commands = []
+        for command_list in key:
+            for command in csafe_cmd.command_lists(command_list):
+                if command[0] not in seen:
+                    seen.add(command[0])
+                    commands.append(command)
+        commands.sort(key=lambda command: csafe_dic.COMMANDS[command[0]].wrapper)
+        combined = tuple(token for command in commands for token in command)
+        if len(_combined_cache) >= _COMBINED_CACHE_SIZE:
+            _combined_cache.clear()
+        _combined_cache[key] = combined
+    return combined
+
+
+def stroke_phase(strokestate, workoutstate=None):
+    """
+    Returns 'drive', 'recovery' or 'idle' for the last stroke and workout states,
+    either may be None if it has not been polled
+    """
+    if workoutstate in IDLE_WORKOUT_STATES or strokestate == WAIT_MIN_SPEED:
+        return 'idle'
+    if strokestate == DRIVE:
+        return 'drive'
+    return 'recovery'
+
+
+class TelemetryScheduler(object):
+    """
+    Polls the groups of a PyErg at their own rates
+    Each poll sends the commands of every group that is due as one command list, which
+    PyErg.send fits into as few frames as possible, so the frame gap is shared between groups.
+    Groups:
+        forceplot: ForcePlotSample
+        heartbeat: HeartbeatSample, its intervals are also added to the heartbeat stream
+        monitor: MonitorSample of the fields
+        workout: WorkoutSample
+        erg: get_erg dictionary, which also sets the frame gap of the erg
+    pyerg: PyErg, or anything with its send, pacer and _ergdata
+    rates: polls per second of each group, see DEFAULT_RATES, groups left out are not polled
+    fields: get_monitor fields of the monitor group, None for all
+    adaptive: switch the rates of the scheduled groups to PHASE_RATES of the stroke phase,
+    so the force plot is polled as fast as the frame gap allows during the drive only
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, pyerg, rates=None, fields=None, adaptive=False):
+        self._pyerg = pyerg
+        self.rates = dict(DEFAULT_RATES if rates is None else rates)
+        unknown = set(self.rates).difference(GROUPS)
+        if unknown:
+            raise ValueError("Unknown groups: {}".format(", ".join(sorted(unknown))))
+        self.fields = fields
+        self.adaptive = adaptive
+        self._commands = {
+            'forceplot': FORCEPLOT_COMMANDS,
+            'heartbeat': HEARTBEAT_COMMANDS,
+            'monitor': monitor_commands(fields),
+            'workout': WORKOUT_COMMANDS,
+            'erg': ERG_COMMANDS,
+        }
+        self._deadlines = {}
+        self._last = {}
+        self.polls = {}
+        self.started = None
+        #last stroke and workout states polled, and the stroke phase they are in
+        self.strokestate = None
+        self.workoutstate = None
+        self.phase = None
+        #beat intervals of every heartbeat poll
+        self.heartbeat = HeartbeatStream()
+        self.reset()
+
+    def reset(self):
+        """
+        Makes every group due, including the ones polled once per connection
+        """
+        self._deadlines = {group: 0. for group in self.rates}
+        self._last = {}
+        self.polls = {group: 0 for group in self.rates}
+        self.started = None
+        self.strokestate = None
+        self.workoutstate = None
+        self.phase = None
+
+    def set_rates(self, rates):
+        """
+        Changes the rates of scheduled groups, groups not scheduled are ignored
+        The next poll of a group is due one new period after its last poll
+        """
+        for group, rate in rates.items():
+            if group not in self.rates or self._deadlines[group] is None:
+                continue
+            self.rates[group] = rate
+            last = self._last.get(group)
+            if last is not None and rate:
+                self._deadlines[group] = last + 1. / rate
+
+    def due(self, now=None):
+        """
+        Returns the groups due at now, in the order of GROUPS
+        """
+        if now is None:
+            now = time.perf_counter()
+        due = []
+        for group in GROUPS:
+            deadline = self._deadlines.get(group)
+            if deadline is not None and deadline <= now:
+                due.append(group)
+        return tuple(due)
+
+    def next_deadline(self):
+        """
+        Returns the perf_counter time at which the next group is due, None if none is left
+        """
+        deadlines = [deadline for deadline in self._deadlines.values() if deadline is not None]
+        return min(deadlines) if deadlines else None
+
+    def delay(self, now=None):
+        """
+        Returns the seconds until a group is due and the frame gap has passed
+        """
+        if now is None:
+            now = time.perf_counter()
+        deadline = self.next_deadline()
+        if deadline is None:
+            return None
+        return max(deadline - now, self._pyerg.pacer.delay(now), 0.)
+
+    def poll(self):
+        """
+        Waits until a group is due, polls every due group in one command list and
+        returns {group: sample}, an empty dictionary if no group is left to poll
+        """
+        delay = self.delay()
+        if delay is None:
+            return {}
+        if delay:
+            time.sleep(delay)
+        return self.poll_due()
+
+    def poll_due(self, now=None):
+        """
+        Polls the groups due now without waiting, returns {group: sample}
+        """
+        if now is None:
+            now = time.perf_counter()
+        groups = self.due(now)
+        if not groups:
+            return {}
+        if self.started is None:
+            self.started = now
+        results = self._pyerg.send(combine([self._commands[group] for group in groups]))
+        self._advance(groups, now)
+        samples = self.samples(groups, results)
+        if self.adaptive:
+            self._adapt(results)
+        return samples
+
+    def _adapt(self, results):
+        if 'CSAFE_PM_GET_STROKESTATE' in results:
+            self.strokestate = results['CSAFE_PM_GET_STROKESTATE'][0]
+        if 'CSAFE_PM_GET_WORKOUTSTATE' in results:
+            self.workoutstate = results['CSAFE_PM_GET_WORKOUTSTATE'][0]
+        phase = stroke_phase(self.strokestate, self.workoutstate)
+        if phase != self.phase:
+            self.phase = phase
+            self.set_rates(PHASE_RATES[phase])
+
+    def _advance(self, groups, now):
+        for group in groups:
+            self._last[group] = now
+            self.polls[group] += 1
+            rate = self.rates[group]
+            if not rate:
+                #once per connection
+                self._deadlines[group] = None
+                continue
+            deadline = self._deadlines[group] + 1. / rate
+            #a late poll does not start a burst to catch up
+            self._deadlines[group] = deadline if deadline > now else now + 1. / rate
+
+    def samples(self, groups, results):
+        """
+        Converts the response to the combined command list of groups, returns {group: sample}
+        """
+        timestamp = time.time()
+        samples = {}
+        for group in groups:
+            if group == 'monitor':
+                samples[group] = MonitorSample.from_results(results, timestamp)
+            elif group == 'forceplot':
+                samples[group] = ForcePlotSample.from_results(results, timestamp)
+            elif group == 'heartbeat':
+                samples[group] = HeartbeatSample.from_results(results, timestamp)
+                self.heartbeat.feed(samples[group])
+            elif group == 'workout':
+                samples[group] = WorkoutSample.from_results(results, timestamp)
+            elif group == 'erg':
+                samples[group] = self._pyerg._ergdata(results)
+        return samples
+
+    def stats(self, now=None):
+        """
+        Returns the achieved polls per second of each group
+        """
+        if now is None:
+            now = time.perf_counter()
+        if self.started is None or now <= self.started:
+            return {group: 0. for group in self.polls}
+        return {group: polls / (now - self.started) for group, polls in self.polls.items()}
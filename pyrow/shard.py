@@ -0,0 +1,483 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+# pylint: disable=C0103
+
+"""
+shard.py
+Polls the ergs of a large fleet from several worker processes
+The parent process finds the ergs and assigns each to the least loaded worker, which
+opens it by its repr in its own pyrow.find() results and polls it with a fleet.FleetPoller.
+Samples come back over a pipe as compact binary records, see samples.pack.
+"""
+
+import importlib
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import struct
+import threading
+import time
+
+from pyrow.ergmanager import Erg
+from pyrow.fleet import FleetPoller
+from pyrow.metadata import CACHE
+from pyrow.samples import MonitorSample, ForcePlotSample, WorkoutSample, pack, unpack
+from pyrow.snapshot import Snapshots
+from pyrow.updates import UpdateQueue
+
+logger = logging.getLogger(__name__)
+
+#records sent by the workers, a kind byte followed by its data
+ATTACHED = b'A' #pickled (slot, ErgMetadata)
+DETACHED = b'D' #pickled (slot, ErgMetadata)
+REMOVED = b'R' #pickled (slot, exception), the erg could not be opened or its polling failed
+SAMPLES = b'S' #slot and number of samples, then each sample as a length and samples.pack record
+_SAMPLES_HEADER = struct.Struct('<IB')
+_LENGTH = struct.Struct('<H')
+
+#erg samples sent with every update
+_SAMPLE_GROUPS = ('monitor', 'workout', 'forceplot')
+_GROUPS = {MonitorSample: 'monitor', WorkoutSample: 'workout', ForcePlotSample: 'forceplot'}
+
+
+def _shard_main(module, conn, options):
+    """
+    Entry point of a worker process
+    """
+    _ShardWorker(importlib.import_module(module), conn, **options).run()
+
+
+class _ShardWorker(object):
+    """
+    Polls the ergs assigned to a worker process
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, pyrow, conn, update_rate=0.5, fields=None, rates=None, adaptive=False,
+                 pollers=1):
+        self._pyrow = pyrow
+        self._conn = conn
+        self.update_rate = update_rate
+        self.fields = fields
+        self.rates = rates
+        self.adaptive = adaptive
+        self._ergs = {}
+        self._send_lock = threading.Lock()
+        #a blocked pipe keeps only the latest samples of each erg
+        self._status_q = UpdateQueue()
+        self._poller = FleetPoller(pollers, on_error=self._poll_failed)
+        self._sender = threading.Thread(target=self._send_samples, name="shard_sender")
+        self._sender.start()
+
+    def run(self):
+        try:
+            while True:
+                try:
+                    message = self._conn.recv()
+                except EOFError:
+                    break
+                if message[0] == 'stop':
+                    break
+                getattr(self, '_' + message[0])(*message[1:])
+        finally:
+            self._poller.stop()
+            for slot in list(self._ergs):
+                self._detach(slot, reply=False)
+            self._status_q.close()
+            self._sender.join()
+            self._conn.close()
+
+    def _send(self, kind, data):
+        with self._send_lock:
+            self._conn.send_bytes(kind + data)
+
+    def _attach(self, slot, key, metadata):
+        if metadata is not None:
+            #the frame gap from the previous worker
+            CACHE.store(metadata).gap = metadata.gap
+        try:
+            device = next(device for device in self._pyrow.find() if device.__repr__() == key)
+            erg = Erg(self._pyrow, device, self._status_q, rate=self.update_rate,
+                      fields=self.fields, rates=self.rates, adaptive=self.adaptive, start=False)
+        except Exception as e: # pylint: disable=broad-except
+            if not isinstance(e, StopIteration):
+                logger.exception("Opening erg %r failed", key)
+            self._send(REMOVED, _dumps_error(slot, e))
+            return
+        erg.slot = slot
+        self._ergs[slot] = erg
+        self._send(ATTACHED, pickle.dumps((slot, erg.metadata)))
+        self._poller.add(erg)
+
+    def _detach(self, slot, reply=True):
+        erg = self._ergs.pop(slot, None)
+        if erg is None:
+            #already detached, such as by a failed poll
+            return
+        self._poller.remove(erg)
+        try:
+            erg._pyerg.detach()
+        except Exception: # pylint: disable=broad-except
+            logger.debug("Closing erg %r failed", erg, exc_info=True)
+        if reply:
+            self._send(DETACHED, pickle.dumps((slot, erg.metadata)))
+
+    def _set_workout(self, slot, kwargs):
+        erg = self._ergs.get(slot)
+        if erg is None:
+            return
+        try:
+            erg.set_workout(**kwargs)
+        except Exception: # pylint: disable=broad-except
+            logger.exception("Setting the workout of erg %r failed", erg)
+
+    def _poll_failed(self, erg, error):
+        if not isinstance(error, ConnectionError):
+            logger.error("Polling erg %r failed", erg, exc_info=error)
+        if self._ergs.get(erg.slot) is erg:
+            self._detach(erg.slot, reply=False)
+            self._send(REMOVED, _dumps_error(erg.slot, error))
+
+    def _send_samples(self):
+        while True:
+            erg = self._status_q.get()
+            if erg is None:
+                break
+            if erg.slot not in self._ergs:
+                continue
+            records = [pack(sample) for sample in
+                       (getattr(erg, group) for group in _SAMPLE_GROUPS) if sample is not None]
+            parts = [_SAMPLES_HEADER.pack(erg.slot, len(records))]
+            for record in records:
+                parts.append(_LENGTH.pack(len(record)))
+                parts.append(record)
+            self._send(SAMPLES, b''.join(parts))
+
+
+def _dumps_error(slot, error):
+    try:
+        return pickle.dumps((slot, error))
+    except Exception: # pylint: disable=broad-except
+        return pickle.dumps((slot, RuntimeError(repr(error))))
+
+
+def _unpack_samples(data):
+    """
+    Returns the slot and samples of a SAMPLES record
+    """
+    slot, count = _SAMPLES_HEADER.unpack_from(data)
+    k = _SAMPLES_HEADER.size
+    samples = []
+    for _ in range(count):
+        length = _LENGTH.unpack_from(data, k)[0]
+        k += _LENGTH.size
+        samples.append(unpack(bytes(data[k:k + length])))
+        k += length
+    return slot, samples
+
+
+class _Shard(object):
+    """
+    A worker process and the slots of the ergs assigned to it
+    """
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.slots = set()
+
+
+class ShardedErg(object):
+    """
+    An erg polled by a worker process of a ShardedErgManager, holds the same data as an Erg
+    shard: index of the worker process polling the erg
+    updates: updates received, see ShardedErgManager.stats
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, manager, slot, key, metadata):
+        self._manager = manager
+        self.slot = slot
+        self.id = key
+        self.metadata = metadata
+        self.serial = metadata.serial
+        self.name = key if metadata.name is None else metadata.name
+        self.snapshots = Snapshots()
+        #latest samples, see pyrow.samples
+        self.monitor = None
+        self.workout = None
+        self.forceplot = None
+        self.error = None
+        self.shard = None
+        self.updates = 0
+        self.added = time.perf_counter()
+
+    def __repr__(self):
+        return self.name
+
+    @property
+    def data(self):
+        return self.snapshots.latest
+
+    def wait_newer(self, seq, timeout=None):
+        return self.snapshots.wait_newer(seq, timeout)
+
+    def set_workout(self, **kwargs):
+        """
+        Sets the workout, takes the keyword arguments of PyErg.set_workout
+        """
+        self._manager._command(self, 'set_workout', kwargs)
+
+
+class ShardedErgManager(object):
+    """
+    ErgManager polling its ergs from worker processes
+    Ergs are assigned to the least loaded worker when found and moved between workers
+    so that their loads differ by at most one erg as ergs are added and removed.
+    Callbacks are called from a thread of the parent process, as with ErgManager.
+    pyrow: module providing find, PyErg and get_pretty, imported by name in the workers
+    processes: worker processes, os.cpu_count() if None
+    pollers: threads polling the ergs in each worker, see fleet.FleetPoller
+    The other arguments are those of ErgManager
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, pyrow, *, add_callback, update_callback, check_rate=2, update_rate=0.5,
+                 fields=None, rates=None, adaptive=False, processes=None, pollers=1,
+                 remove_callback=None):
+        self._pyrow = pyrow
+
+        self.add_callback = add_callback
+        self.update_callback = update_callback
+        self.remove_callback = remove_callback
+
+        self.check_rate = check_rate
+        self.update_rate = update_rate
+
+        self.ergs = []
+        #ergs by slot and slot by device repr, including ergs being opened
+        self._slots = {}
+        self._keys = {}
+        #repr and metadata of ergs being opened and moved, by slot
+        self._pending = {}
+        self._moves = {}
+        self._next_slot = 0
+        self._lock = threading.RLock()
+
+        options = {'update_rate': update_rate, 'fields': fields, 'rates': rates,
+                   'adaptive': adaptive, 'pollers': pollers}
+        context = multiprocessing.get_context('spawn')
+        self._shards = []
+        for index in range(processes or os.cpu_count() or 1):
+            conn, child_conn = context.Pipe()
+            process = context.Process(target=_shard_main, name="erg_shard-{}".format(index),
+                                      args=(pyrow.__name__, child_conn, options), daemon=True)
+            process.start()
+            child_conn.close()
+            self._shards.append(_Shard(index, process, conn))
+
+        self.exit_requested = False
+        self._exit = threading.Event()
+        self._threads = {
+            'erg_check': threading.Thread(target=self._erg_checker),
+            'shard_read': threading.Thread(target=self._shard_reader),
+        }
+        for name, t in self._threads.items():
+            t.name = name
+            t.start()
+
+    def stop(self):
+        self.exit_requested = True
+        self._exit.set()
+        for shard in self._shards:
+            try:
+                shard.conn.send(('stop',))
+            except OSError:
+                pass
+        for shard in self._shards:
+            shard.process.join(5)
+            if shard.process.is_alive():
+                shard.process.terminate()
+        for t in self._threads.values():
+            t.join()
+
+    def set_workout(self, **kwargs):
+        for _erg in self.ergs:
+            _erg.set_workout(**kwargs)
+
+    def set_distance(self, distance):
+        for _erg in self.ergs:
+            _erg.set_workout(distance=distance)
+
+    def get_names(self):
+        return [_erg.name for _erg in self.ergs]
+
+    def loads(self):
+        """
+        Returns the number of ergs assigned to each worker
+        """
+        with self._lock:
+            return [len(shard.slots) for shard in self._shards]
+
+    def stats(self, now=None):
+        """
+        Returns the worker and the updates per second of every erg, by name
+        """
+        if now is None:
+            now = time.perf_counter()
+        return {_erg.name: {'shard': _erg.shard,
+                            'updates': _erg.updates / max(now - _erg.added, 1e-9)}
+                for _erg in self.ergs}
+
+    def _command(self, erg, *message):
+        with self._lock:
+            if erg.shard is None or erg.slot in self._moves:
+                return
+            self._shards[erg.shard].conn.send((message[0], erg.slot) + message[1:])
+
+    def _erg_checker(self):
+        while not self.exit_requested:
+            try:
+                keys = [device.__repr__() for device in self._pyrow.find()]
+            except Exception: # pylint: disable=broad-except
+                #tried again after check_rate
+                logger.exception("Finding ergs failed")
+                keys = None
+            if keys is not None:
+                self._update_devices(keys)
+            self._exit.wait(self.check_rate)
+
+    def _update_devices(self, keys):
+        removed = []
+        with self._lock:
+            for key in set(self._keys).difference(keys):
+                #unplugged, detached from whichever worker has it
+                slot = self._keys[key]
+                removed.append(self._forget(slot))
+                for shard in self._shards:
+                    shard.conn.send(('detach', slot))
+            for key in keys:
+                if key in self._keys:
+                    continue
+                slot = self._next_slot
+                self._next_slot += 1
+                shard = min(self._shards, key=lambda shard: len(shard.slots))
+                shard.slots.add(slot)
+                self._keys[key] = slot
+                self._pending[slot] = key
+                shard.conn.send(('attach', slot, key, None))
+            self._rebalance()
+        for erg in removed:
+            self._removed(erg)
+
+    def _removed(self, erg):
+        if erg is not None and self.remove_callback is not None:
+            self.remove_callback(erg)
+
+    def _forget(self, slot):
+        """
+        Removes an erg from the manager, returns it or None if it was still being opened
+        """
+        key = self._pending.pop(slot, None)
+        erg = self._slots.pop(slot, None)
+        if erg is not None:
+            key = erg.id
+            self.ergs.remove(erg)
+        if key is not None and self._keys.get(key) == slot:
+            del self._keys[key]
+        self._moves.pop(slot, None)
+        for shard in self._shards:
+            shard.slots.discard(slot)
+        return erg
+
+    def _rebalance(self):
+        while True:
+            loads = sorted(self._shards, key=lambda shard: len(shard.slots))
+            lightest, heaviest = loads[0], loads[-1]
+            if len(heaviest.slots) - len(lightest.slots) <= 1:
+                return
+            movable = [slot for slot in heaviest.slots if slot in self._slots
+                       and slot not in self._moves]
+            if not movable:
+                return
+            slot = movable[0]
+            heaviest.slots.discard(slot)
+            lightest.slots.add(slot)
+            self._moves[slot] = lightest
+            heaviest.conn.send(('detach', slot))
+
+    def _shard_reader(self):
+        conns = {shard.conn: shard for shard in self._shards}
+        while not self.exit_requested and conns:
+            for conn in multiprocessing.connection.wait(list(conns), timeout=0.1):
+                try:
+                    record = conn.recv_bytes()
+                except (EOFError, OSError):
+                    del conns[conn]
+                    continue
+                self._dispatch(conns[conn], record[:1], memoryview(record)[1:])
+
+    def _dispatch(self, shard, kind, data):
+        if kind == SAMPLES:
+            slot, samples = _unpack_samples(data)
+            erg = self._slots.get(slot)
+            if erg is None:
+                return
+            for sample in samples:
+                setattr(erg, _GROUPS[type(sample)], sample)
+            erg.snapshots.update(samples, self._pyrow.get_pretty)
+            erg.updates += 1
+            self.update_callback(erg)
+            return
+
+        slot, value = pickle.loads(data)
+        if kind == ATTACHED:
+            self._attached(shard, slot, value)
+        elif kind == DETACHED:
+            with self._lock:
+                CACHE.store(value).gap = value.gap
+                target = self._moves.pop(slot, None)
+                erg = self._slots.get(slot)
+                if target is not None and erg is not None:
+                    erg.shard = None
+                    target.conn.send(('attach', slot, erg.id, value))
+        elif kind == REMOVED:
+            with self._lock:
+                erg = self._forget(slot)
+                if erg is not None:
+                    erg.error = value
+                self._rebalance()
+            self._removed(erg)
+
+    def _attached(self, shard, slot, metadata):
+        with self._lock:
+            #a known erg keeps its name
+            metadata = CACHE.store(metadata)
+            erg = self._slots.get(slot)
+            if erg is not None:
+                #moved
+                erg.shard = shard.index
+                return
+            key = self._pending.pop(slot, None)
+            if key is None:
+                #unplugged while being opened
+                return
+            erg = ShardedErg(self, slot, key, metadata)
+            erg.shard = shard.index
+            self._slots[slot] = erg
+            self.ergs.append(erg)
+        new_name = self.add_callback(erg)
+        if new_name is not None:
+            if new_name == erg.name or new_name not in self.get_names():
+                erg.name = new_name
+                #kept for when the erg reconnects
+                erg.metadata.name = new_name
+            else:
+                raise ValueError("Name {} already exists".format(new_name))
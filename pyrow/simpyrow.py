@@ -6,10 +6,14 @@
 
 import datetime
 import time
+from array import array
 
 import numpy as np
 
-from pyrow.pyrow import get_pretty
+from pyrow.metadata import ErgMetadata
+from pyrow.pacing import FramePacer
+from pyrow.pyrow import MONITOR_FIELDS, get_pretty, monitor_commands
+from pyrow.samples import MonitorSample, ForcePlotSample, HeartbeatSample, WorkoutSample
 
 STATUS = 9
 
@@ -26,6 +30,8 @@ class PyErg(object):
         self._start_time = time.time()
         self._factor = np.random.normal(1, 0.02)
         self.__lastsend = datetime.datetime.now()
+        self.pacer = FramePacer()
+        self.metadata = None
 
     @classmethod
     def __checkvalue(self, value, label, minimum, maximum):
@@ -38,7 +44,7 @@ class PyErg(object):
             raise ValueError(label + " outside of range")
         return True
 
-    def get_monitor(self, forceplot=False, pretty=False):
+    def get_monitor(self, forceplot=False, pretty=False, fields=None):
         """
         Returns values from the monitor that relate to the current workout,
         optionally returns force plot data and stroke state. (* required)
@@ -55,6 +61,14 @@ class PyErg(object):
             forceplot: force plot data
             strokestate
         """
+        monitor = self.get_monitor_sample(forceplot, fields).as_dict()
+        monitor = get_pretty(monitor, pretty)
+        return monitor
+
+    def get_monitor_sample(self, forceplot=False, fields=None):
+        """
+        Returns get_monitor values as a MonitorSample
+        """
         SPM = 30
         POWER = 150
         CAL_TO_TIME = 1
@@ -64,55 +78,67 @@ class PyErg(object):
         DIST = lambda x: 40.3 + 4*x - 60*np.exp(-x/120) + 20*np.exp(-x/4) + 80*np.sin(np.pi*x/480) - 0.3*np.cos(np.pi*x)
 
         elapsed_time = round(time.time() - self._start_time,2)
-        monitor = {}
-        monitor['time'] = round(elapsed_time, 2)
-        monitor['distance'] = int(round(self._factor*DIST(elapsed_time)))
-        monitor['spm'] = SPM
+        monitor = MonitorSample()
+        monitor.time = round(elapsed_time, 2)
+        monitor.distance = int(round(self._factor*DIST(elapsed_time)))
+        monitor.spm = SPM
         #Rowing machine always returns power as Watts
-        monitor['power'] = POWER
-        if monitor['power']:
-            monitor['pace'] = ((2.8 / POWER) ** (1./3)) * 500
-            monitor['calhr'] = POWER  * (4.0 * 0.8604) + 300.
-        else:
-            monitor['pace'], monitor['calhr'] = 0, 0
-        monitor['calories'] = round(CAL_TO_TIME * elapsed_time)
-        monitor['heartrate'] = 100
+        monitor.set_power(POWER)
+        monitor.calories = round(CAL_TO_TIME * elapsed_time)
+        monitor.heartrate = 100
         if forceplot:
-            monitor['forceplot'] = [1]*32
-            monitor['strokestate'] = 4
+            monitor.forceplot = array('h', [1]*32)
+            monitor.strokestate = 4
         # 1 or 5
-        monitor['status'] = STATUS
-
-        monitor = get_pretty(monitor, pretty)
+        monitor.status = STATUS
+        if fields is not None:
+            #fields whose commands would not have been polled
+            command = monitor_commands(fields, forceplot)
+            for field, field_command in MONITOR_FIELDS.items():
+                if field_command and field_command[0] not in command:
+                    setattr(monitor, field, None)
         return monitor
 
     def get_forceplot(self, pretty=False):
         """
         Returns force plot data and stroke state
         """
-        forceplot = {}
-        forceplot['forceplot'] = [1]*32
-        forceplot['strokestate'] = 4
-        forceplot['status'] = STATUS
-
+        forceplot = self.get_forceplot_sample().as_dict()
         forceplot = get_pretty(forceplot, pretty)
         return forceplot
 
+    def get_forceplot_sample(self):
+        """
+        Returns get_forceplot values as a ForcePlotSample
+        """
+        return ForcePlotSample(forceplot=array('h', [1]*32), strokestate=4, status=STATUS)
+
+    def get_heartbeat(self):
+        """
+        Returns the heart beat data the monitor gathered since the last read
+        """
+        return self.get_heartbeat_sample().as_dict()
+
+    def get_heartbeat_sample(self):
+        """
+        Returns get_heartbeat values as a HeartbeatSample
+        """
+        return HeartbeatSample(intervals=array('H', [600]), status=STATUS)
+
     def get_workout(self, pretty=False):
         """
         Returns overall workout data
         """
-        workoutdata = {}
-        workoutdata['userid'] = 0
-        workoutdata['type'] = 0
-        workoutdata['state'] = 1
-        workoutdata['inttype'] = 1
-        workoutdata['intcount'] = 0
-        workoutdata['status'] = STATUS
-
+        workoutdata = self.get_workout_sample().as_dict()
         workoutdata = get_pretty(workoutdata, pretty)
         return workoutdata
 
+    def get_workout_sample(self):
+        """
+        Returns get_workout values as a WorkoutSample
+        """
+        return WorkoutSample(userid=0, type=0, state=1, inttype=1, intcount=0, status=STATUS)
+
     def get_erg(self, pretty=False):
         """
         Returns all erg data that is not related to the workout
@@ -130,11 +156,26 @@ class PyErg(object):
         ergdata['maxrx'] = 0
         ergdata['maxtx'] = 0
         ergdata['mininterframe'] = 0
+        self.pacer.set_mininterframe(ergdata['mininterframe'])
         ergdata['status'] = STATUS
 
         ergdata = get_pretty(ergdata, pretty)
         return ergdata
 
+    def attach(self):
+        """
+        Returns the metadata of the erg
+        """
+        self.metadata = ErgMetadata.from_ergdata(self.get_erg())
+        return self.metadata
+
+    def detach(self):
+        """
+        Records the frame gap in the metadata of the erg
+        """
+        if self.metadata is not None:
+            self.metadata.gap = self.pacer.gap
+
     def get_status(self, pretty=False):
         """
         Returns the status of the erg
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+"""
+snapshot.py
+Immutable, numbered copies of the data of an erg, one per completed poll
+"""
+
+import threading
+import time
+
+
+def _immutable(self, *args, **kwargs):
+    raise TypeError("Snapshot is immutable, copy it with dict(snapshot)")
+
+
+class Snapshot(dict):
+    """
+    The data of an erg after one poll, a dict which can not be changed
+    seq: number of the poll, increasing by one with every snapshot of the erg, 0 before
+    the first poll
+    timestamp: host time.time() when the snapshot was published
+    """
+    __slots__ = ('seq', 'timestamp')
+
+    def __init__(self, values=(), seq=0, timestamp=None):
+        dict.__init__(self, values)
+        self.seq = seq
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = __ior__ = _immutable
+
+    def __reduce__(self):
+        return (Snapshot, (dict(self), self.seq, self.timestamp))
+
+    def __repr__(self):
+        return "Snapshot(seq={}, {})".format(self.seq, dict.__repr__(self))
+
+
+class Snapshots(object):
+    """
+    Latest snapshot of an erg, replaced as a whole by every poll
+    latest is read without a lock, a reader holding a snapshot keeps it unchanged
+    however often the erg is polled.
+    Updated by the thread polling the erg, which merges the raw values of the groups
+    polled and publishes a readable copy of them.
+    """
+
+    def __init__(self):
+        self.latest = Snapshot()
+        #raw values of every group polled so far, get_pretty is only applied to copies
+        self._values = {}
+        self._cond = threading.Condition()
+
+    def publish(self, values, timestamp=None):
+        """
+        Replaces the latest snapshot by one of values, returns the new snapshot
+        values: dict, not used after publishing
+        """
+        with self._cond:
+            snapshot = Snapshot(values, self.latest.seq + 1, timestamp)
+            self.latest = snapshot
+            self._cond.notify_all()
+        return snapshot
+
+    def update(self, samples, get_pretty=None):
+        """
+        Publishes the values of samples merged with those of the groups not polled,
+        see pyrow.samples
+        get_pretty: pyrow.get_pretty, makes the published values readable
+        """
+        for sample in samples:
+            sample.as_dict(into=self._values)
+        values = dict(self._values)
+        if get_pretty is not None:
+            get_pretty(values, True)
+        return self.publish(values)
+
+    def wait_newer(self, seq, timeout=None):
+        """
+        Returns the latest snapshot once its seq is greater than seq, waits up to timeout
+        seconds, forever if None, returns None on timeout
+        """
+        latest = self.latest
+        if latest.seq > seq:
+            return latest
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.latest.seq > seq, timeout):
+                return None
+            return self.latest
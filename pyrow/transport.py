@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+"""
+transport.py
+Moves csafe usb reports between PyErg and a monitor: over usb, a socket, or in memory
+"""
+
+import socket
+import sys
+from warnings import warn
+
+import usb.util
+from usb import USBError
+
+from pyrow.csafe import csafe_cmd
+
+INTERFACE = 0
+TIMEOUT = 2000 #in milliseconds
+
+_REPORT_SIZES = dict(csafe_cmd.REPORT_SIZES)
+
+
+class Transport(object):
+    """
+    Sends usb reports to a monitor and receives its response reports
+    read raises TimeoutError, or a USBError with errno ETIMEDOUT, if no response arrives
+    """
+    def write(self, report):
+        """
+        Sends a usb report
+        """
+        raise NotImplementedError
+
+    def read(self, buffer, timeout=TIMEOUT):
+        """
+        Receives a usb report into buffer, returns the number of bytes received
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Releases the connection
+        """
+        pass
+
+
+class UsbTransport(Transport):
+    """
+    pyusb device of a monitor
+    """
+    def __init__(self, erg):
+        """
+        Configures usb connection
+        """
+        if sys.platform != 'win32':
+            try:
+                #Check to see if driver is attached to kernel (linux)
+                if erg.is_kernel_driver_active(INTERFACE):
+                    erg.detach_kernel_driver(INTERFACE)
+                else:
+                    warn("DEBUG: usb kernel driver not on {}".format(sys.platform))
+            except:
+                raise
+
+        #Claim interface (Needs Testing To See If Necessary)
+        usb.util.claim_interface(erg, INTERFACE)
+
+        #Linux throws error, reason unknown
+        try:
+            erg.set_configuration() #required to configure USB connection
+            #Ubuntu Linux returns 'usb.core.USBError: Resource busy' but rest of code still works
+        except USBError as e:
+            warn("DEBUG: usb error whilst setting configuration, {}".format(e))
+
+        self.erg = erg
+
+        configuration = erg[0]
+        iface = configuration[(0, 0)]
+        self.inEndpoint = iface[0].bEndpointAddress
+        self.outEndpoint = iface[1].bEndpointAddress
+
+    def __repr__(self):
+        return self.erg.__repr__()
+
+    def write(self, report):
+        try:
+            self.erg.write(self.outEndpoint, report, timeout=TIMEOUT)
+        # Checks for USBError 16: Resource busy
+        except USBError as e:
+            if e.errno != 19:
+                raise ConnectionError("USB device disconected")
+
+    def read(self, buffer, timeout=TIMEOUT):
+        return self.erg.read(self.inEndpoint, buffer, timeout=timeout)
+
+    def close(self):
+        usb.util.release_interface(self.erg, INTERFACE)
+
+
+class MemoryTransport(Transport):
+    """
+    Answers every report in process, with handler(report) returning the response report,
+    such as emulator.ErgEmulator.respond
+    """
+    def __init__(self, handler, name=None):
+        self._handler = handler
+        self._response = None
+        self.name = name
+
+    def __repr__(self):
+        if self.name is not None:
+            return self.name
+        return Transport.__repr__(self)
+
+    def write(self, report):
+        self._response = self._handler(report)
+
+    def read(self, buffer, timeout=TIMEOUT):
+        response, self._response = self._response, None
+        if response is None:
+            raise TimeoutError("No response")
+        received = min(len(response), len(buffer))
+        memoryview(buffer)[:received] = response[:received]
+        return received
+
+
+def recv_report(sock, buffer=None):
+    """
+    Receives one usb report from a stream socket, its size follows from the report id
+    Returns the report, in buffer if given, or None if the socket was closed
+    """
+    head = bytearray(1)
+    if not sock.recv_into(head, 1):
+        return None
+    size = _REPORT_SIZES.get(head[0])
+    if size is None:
+        raise ConnectionError("Unknown report id 0x{:02X}".format(head[0]))
+    if buffer is None or len(buffer) < size:
+        buffer = bytearray(size)
+    view = memoryview(buffer)
+    view[0] = head[0]
+    received = 1
+    while received < size:
+        count = sock.recv_into(view[received:size], size - received)
+        if not count:
+            raise ConnectionError("Socket closed within a report")
+        received += count
+    return buffer
+
+
+class SocketTransport(Transport):
+    """
+    Stream socket carrying the usb reports, such as a loopback connection to
+    emulator.ErgEmulator.serve
+    """
+    def __init__(self, sock, name=None):
+        self._sock = sock
+        self.name = name
+
+    @classmethod
+    def connect(cls, address, name=None):
+        """
+        Connects to address, a (host, port) tuple
+        """
+        return cls(socket.create_connection(address), name)
+
+    def __repr__(self):
+        if self.name is not None:
+            return self.name
+        return Transport.__repr__(self)
+
+    def write(self, report):
+        try:
+            self._sock.sendall(report)
+        except OSError:
+            raise ConnectionError("Socket disconected")
+
+    def read(self, buffer, timeout=TIMEOUT):
+        self._sock.settimeout(timeout / 1000.)
+        try:
+            report = recv_report(self._sock, buffer)
+        except socket.timeout:
+            raise TimeoutError("No response")
+        if report is None:
+            raise ConnectionError("Socket disconected")
+        if report is not buffer:
+            #longer than buffer
+            received = min(len(report), len(buffer))
+            memoryview(buffer)[:received] = report[:received]
+            return received
+        return _REPORT_SIZES[report[0]]
+
+    def close(self):
+        self._sock.close()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+#Copyright (c) 2017 Michael Droogleever
+#Licensed under the Simplified BSD License.
+
+# NOTE: This code has not been thoroughly tested and may not function as advertised.
+# Please report and findings to the author so that they may be addressed in a stable release.
+
+"""
+updates.py
+Bounded queue of the ergs with a new poll, each erg is queued at most once
+"""
+
+import collections
+import threading
+
+DROP_OLDEST = 'drop-oldest'
+DROP_NEWEST = 'drop-newest'
+BLOCK = 'block'
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class UpdateQueue(object):
+    """
+    Ergs waiting for the update callback, in the order they were first put
+    An erg put again while still waiting keeps its place and is counted as coalesced,
+    the callback reads its latest data, so a slow callback never sees stale data
+    and the queue never holds more than one entry per erg.
+    maxsize: ergs waiting at most
+    policy: when full, DROP_OLDEST drops the erg waiting longest, DROP_NEWEST drops the erg
+    put, BLOCK waits for the callback to take an erg
+    coalesced: puts of an erg already waiting
+    dropped: ergs dropped because the queue was full
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, maxsize=64, policy=DROP_OLDEST):
+        if policy not in POLICIES:
+            raise ValueError("Unknown policy {}, expected one of {}".format(policy, POLICIES))
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.puts = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.maxdepth = 0
+        self.closed = False
+        #id of each waiting erg to the erg, oldest first
+        self._pending = collections.OrderedDict()
+        self._cond = threading.Condition()
+
+    def put(self, erg, timeout=None):
+        """
+        Queues erg, returns False if it was dropped
+        With BLOCK, waits up to timeout seconds, forever if None, for room
+        """
+        key = id(erg)
+        with self._cond:
+            if self.closed:
+                return False
+            self.puts += 1
+            if key in self._pending:
+                self.coalesced += 1
+                return True
+            if len(self._pending) >= self.maxsize:
+                if self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                if self.policy == DROP_OLDEST:
+                    self._pending.popitem(last=False)
+                    self.dropped += 1
+                elif not self._cond.wait_for(
+                        lambda: self.closed or key in self._pending or
+                        len(self._pending) < self.maxsize, timeout):
+                    self.dropped += 1
+                    return False
+                elif self.closed:
+                    return False
+                elif key in self._pending:
+                    #put by another thread while waiting
+                    self.coalesced += 1
+                    return True
+            self._pending[key] = erg
+            self.maxdepth = max(self.maxdepth, len(self._pending))
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """
+        Returns the erg waiting longest, waits up to timeout seconds, forever if None,
+        returns None on timeout or once closed
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._pending or self.closed, timeout):
+                return None
+            if self.closed:
+                return None
+            _, erg = self._pending.popitem(last=False)
+            self._cond.notify_all()
+            return erg
+
+    def close(self):
+        """
+        Drops the waiting ergs and wakes every thread waiting in put or get
+        """
+        with self._cond:
+            self.closed = True
+            self._pending.clear()
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self):
+        """
+        Returns the ergs waiting (depth), the most ever waiting, and the puts, coalesced
+        and dropped so far
+        """
+        with self._cond:
+            return {
+                'depth': len(self._pending),
+                'maxdepth': self.maxdepth,
+                'puts': self.puts,
+                'coalesced': self.coalesced,
+                'dropped': self.dropped,
+            }
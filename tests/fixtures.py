@@ -0,0 +1,82 @@
+"""
+Synthetic erg responses shared by the tests,
+lists of (command name, response values) for csafe_cmd.write_response
+"""
+
+import threading
+
+from pyrow.csafe import csafe_cmd, csafe_dic
+from pyrow.metadata import MetadataCache
+from pyrow.pacing import FramePacer
+from pyrow.pyrow import PyErg
+
+MONITOR_RESULTS = [
+    ('CSAFE_PM_GET_WORKTIME', [123456, 78]),
+    ('CSAFE_PM_GET_WORKDISTANCE', [54321, 3]),
+    ('CSAFE_GETCADENCE_CMD', [28, 0]),
+    ('CSAFE_GETPOWER_CMD', [215, 88]),
+    ('CSAFE_GETCALORIES_CMD', [102]),
+    ('CSAFE_GETHRCUR_CMD', [151]),
+]
+FORCEPLOT_RESULTS = [
+    ('CSAFE_PM_GET_FORCEPLOTDATA', [32] + [100 + 13 * k for k in range(16)]),
+    ('CSAFE_PM_GET_STROKESTATE', [2]),
+]
+WORKOUT_RESULTS = [
+    ('CSAFE_GETID_CMD', ['123']),
+    ('CSAFE_PM_GET_WORKOUTTYPE', [3]),
+    ('CSAFE_PM_GET_WORKOUTSTATE', [1]),
+    ('CSAFE_PM_GET_INTERVALTYPE', [0]),
+    ('CSAFE_PM_GET_WORKOUTINTERVALCOUNT', [0]),
+]
+ERG_RESULTS = [
+    ('CSAFE_GETVERSION_CMD', [22, 0, 5, 500, 164]),
+    ('CSAFE_GETSERIAL_CMD', ['430123456']),
+    ('CSAFE_GETCAPS_CMD', [96, 96, 50]),
+]
+HEARTBEAT_RESULTS = [('CSAFE_PM_GET_HEARTBEATDATA', [32] + [800 + k for k in range(16)])]
+
+#command name to response values
+RESULTS = dict(MONITOR_RESULTS + FORCEPLOT_RESULTS + WORKOUT_RESULTS + ERG_RESULTS +
+               HEARTBEAT_RESULTS)
+
+
+def sample_response(name):
+    """
+    Returns (arguments, results) for a single command with made up response values
+    """
+    command = csafe_dic.COMMANDS[name]
+    layout = csafe_dic.RESPONSES[command.respid].layout
+    arguments = [name] + [32 if varbytes else 0 for varbytes in command.argbytes]
+    if name == 'CSAFE_GETCAPS_CMD':
+        values = [96, 96, 50]
+    elif name == 'CSAFE_GETID_CMD':
+        values = ['12345']
+    else:
+        values = [('A' * -numbytes if numbytes < 0 else (0x5A5A5A5A >> (32 - 8 * numbytes)))
+                  for numbytes in layout]
+    return arguments, [(name, values)]
+
+
+class StubPyErg(PyErg):
+    """
+    PyErg answering with the responses in RESULTS, without a usb device
+    sent: the frames sent
+    results: the responses, a copy of RESULTS which may be changed
+    """
+    # pylint: disable=super-init-not-called
+    def __init__(self, device=None):
+        self.sent = []
+        self.results = dict(RESULTS)
+        self.pacer = FramePacer(gap=0.)
+        self._coalescer = None
+        self._lock = threading.RLock()
+        self.cache = MetadataCache()
+        self.metadata = None
+        self.maxframe = csafe_cmd.MAX_FRAME_LENGTH
+
+    def _send_frame(self, message):
+        self.sent.append(tuple(message))
+        self.pacer.sent()
+        results = [(name, self.results[name]) for name in message if name in self.results]
+        return csafe_cmd.read(csafe_cmd.write_response(results, status=1), message)
@@ -0,0 +1,8 @@
+"""
+pyrow module of four emulated ergs, imported by name by the workers of a ShardedErgManager
+"""
+from pyrow.emulator import PyErg, get_pretty, find as _find # pylint: disable=unused-import
+
+
+def find():
+    return _find(4)
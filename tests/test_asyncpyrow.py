@@ -0,0 +1,190 @@
+import asyncio
+import unittest
+
+from pyrow.asyncpyrow import AsyncPyErg, AsyncErgManager
+from pyrow.csafe import csafe_cmd
+from pyrow.metadata import MetadataCache
+from pyrow.pacing import FramePacer
+from pyrow.pyrow import PyErg
+from pyrow.transport import Transport
+from tests.fixtures import RESULTS
+
+
+class FakePyErg(object):
+    """
+    Answers every frame with synthetic responses
+    """
+    _ergdata = PyErg._ergdata
+    _attached = PyErg._attached
+    _apply = PyErg._apply
+    detach = PyErg.detach
+    _workout_command = PyErg._workout_command
+    _checkvalue = PyErg._checkvalue
+
+    def __init__(self, device=None):
+        self.pacer = FramePacer(gap=0.01)
+        self.frames = []
+        self.transport = Transport()
+        self.cache = MetadataCache()
+        self.metadata = None
+        self.maxframe = csafe_cmd.MAX_FRAME_LENGTH
+
+    def transfer(self, message):
+        self.frames.append(message)
+        self.pacer.sent()
+        results = [(name, RESULTS[name]) for name in message if name in RESULTS]
+        return csafe_cmd.read(csafe_cmd.write_response(results, status=1), message)
+
+
+class FakePyRow(object):
+    PyErg = FakePyErg
+
+    def __init__(self, devices):
+        self.devices = devices
+
+    def find(self):
+        return self.devices
+
+
+class BrokenPyErg(FakePyErg):
+    """
+    Fails with an error other than ConnectionError once attached
+    """
+    def transfer(self, message):
+        if self.metadata is not None:
+            raise ValueError("Unexpected response")
+        return super().transfer(message)
+
+
+class FlakyPyRow(FakePyRow):
+    """
+    find and PyErg fail the first time they are called
+    """
+    def __init__(self, devices):
+        super().__init__(devices)
+        self.failures = {'find', 'PyErg'}
+
+    def find(self):
+        if 'find' in self.failures:
+            self.failures.remove('find')
+            raise OSError("usb backend busy")
+        return self.devices
+
+    def PyErg(self, device):
+        if 'PyErg' in self.failures:
+            self.failures.remove('PyErg')
+            raise OSError("Resource busy")
+        return FakePyErg(device)
+
+
+def first_event(manager, kind):
+    async def wait():
+        events = manager.events()
+        manager.start()
+        async for event in events:
+            if event.kind == kind:
+                break
+        await manager.stop()
+        return event
+    return run(wait())
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+class TestAsyncPyErg(unittest.TestCase):
+    def setUp(self):
+        self.pyerg = FakePyErg()
+        self.erg = AsyncPyErg(self.pyerg)
+
+    def test_get_monitor(self):
+        monitor = run(self.erg.get_monitor(forceplot=True))
+        self.assertEqual(monitor['spm'], 28)
+        self.assertEqual(monitor['strokestate'], 2)
+
+    def test_get_erg_learns_gap(self):
+        run(self.erg.get_erg())
+        self.assertEqual(self.erg.pacer.gap, 0.05)
+
+    def test_set_workout(self):
+        run(self.erg.set_workout(distance=2000, split=500))
+        self.assertEqual(self.pyerg.frames[0], ('CSAFE_RESET_CMD',))
+        self.assertEqual(self.pyerg.frames[1][:3], ('CSAFE_SETHORIZONTAL_CMD', 2000, 36))
+
+    def test_frame_gap(self):
+        loop = asyncio.get_event_loop()
+
+        async def poll():
+            start = loop.time()
+            await asyncio.gather(self.erg.send(['CSAFE_GETSTATUS_CMD']), self.erg.get_workout())
+            return loop.time() - start
+        self.assertGreaterEqual(run(poll()), 0.009)
+        self.assertEqual(len(self.pyerg.frames), 2)
+        self.assertGreater(self.erg.pacer.gap_time, 0)
+
+
+class TestAsyncErgManager(unittest.TestCase):
+    def test_events(self):
+        manager = AsyncErgManager(FakePyRow([1, 2]), check_rate=0.01,
+                                  update_rate=0.01)
+
+        async def collect():
+            events = manager.events()
+            manager.start()
+            received = []
+            async for event in events:
+                received.append((event.kind, event.erg.id))
+                if sum(kind == 'update' for kind, _ in received) >= 4:
+                    break
+            await manager.stop()
+            return received
+        received = run(collect())
+
+        self.assertEqual(received[:2], [('add', '1'), ('add', '2')])
+        self.assertEqual({erg for kind, erg in received if kind == 'update'}, {'1', '2'})
+        self.assertEqual(manager.ergs[0].data['spm'], 28)
+        self.assertEqual(manager.ergs[0].pyerg.pacer.gap, 0.05)
+
+    def test_fields(self):
+        manager = AsyncErgManager(FakePyRow([1]), check_rate=0.01, update_rate=0.01,
+                                  fields=['pace'])
+
+        async def first_update():
+            events = manager.events()
+            manager.start()
+            async for event in events:
+                if event.kind == 'update':
+                    break
+            await manager.stop()
+            return event.erg
+        erg = run(first_update())
+        self.assertIn(('CSAFE_GETPOWER_CMD',), erg.pyerg._pyerg.frames)
+        self.assertIn('pace', erg.data)
+        self.assertNotIn('forceplot', erg.data)
+
+    def test_poll_error_removes_erg(self):
+        pyrow = FakePyRow([1])
+        pyrow.PyErg = BrokenPyErg
+        manager = AsyncErgManager(pyrow, check_rate=0.01, update_rate=0.01)
+        with self.assertLogs('pyrow.asyncpyrow', 'ERROR'):
+            event = first_event(manager, 'remove')
+        self.assertIsInstance(event.erg.error, ValueError)
+        self.assertNotIn(event.erg, manager.ergs)
+
+    def test_checker_retries(self):
+        manager = AsyncErgManager(FlakyPyRow([1]), check_rate=0.01, update_rate=0.01)
+        with self.assertLogs('pyrow.asyncpyrow', 'ERROR') as logs:
+            event = first_event(manager, 'update')
+        self.assertEqual(event.erg.id, '1')
+        self.assertEqual(len(logs.records), 2)
+
+    def test_pyerg_fields(self):
+        pyerg = FakePyErg()
+        monitor = run(AsyncPyErg(pyerg, fields=['spm']).get_monitor())
+        self.assertEqual(pyerg.frames, [('CSAFE_GETCADENCE_CMD',)])
+        self.assertEqual(sorted(monitor), ['spm', 'status'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+
+from pyrow.capture import ForceCurveCapture
+from tests.fixtures import StubPyErg
+
+
+def block(points, strokestate):
+    """
+    Response to FORCEPLOT_COMMANDS holding points
+    """
+    return {
+        'CSAFE_GETSTATUS_CMD': [1],
+        'CSAFE_PM_GET_FORCEPLOTDATA': [2 * len(points)] + points + [0] * (16 - len(points)),
+        'CSAFE_PM_GET_STROKESTATE': [strokestate],
+    }
+
+
+class ScriptedPyErg(StubPyErg):
+    """
+    Answers force plot reads with the blocks of a script
+    """
+    def __init__(self, blocks):
+        StubPyErg.__init__(self)
+        self.blocks = iter(blocks)
+
+    def send(self, message):
+        if message[0] == 'CSAFE_PM_GET_FORCEPLOTDATA':
+            return next(self.blocks)
+        return StubPyErg.send(self, message)
+
+
+STROKE = [block([5, 6], 4), block([10, 20, 30], 2), block([40, 50], 2),
+          block([30, 0xFFFF], 4), block([0, 0], 4)]
+
+
+class TestForceCurveCapture(unittest.TestCase):
+    def test_stroke(self):
+        strokes = []
+        capture = ForceCurveCapture(ScriptedPyErg(STROKE), callback=strokes.append)
+        stroke = capture.capture_stroke()
+        #points of the read leaving the drive end the curve, words are int16
+        self.assertEqual(stroke.curve.tolist(), [10, 20, 30, 40, 50, 30, -1])
+        self.assertEqual(stroke.curve.dtype, np.int16)
+        self.assertLessEqual(stroke.start, stroke.end)
+        self.assertEqual(stroke.monitor.spm, 28)
+        self.assertEqual(strokes, [stroke])
+        self.assertEqual(capture.reads, 4)
+
+    def test_run(self):
+        strokes = []
+        capture = ScriptedPyErg(STROKE * 3).capture_forcecurves(strokes.append, monitor=False)
+        capture.run(strokes=3)
+        self.assertEqual(len(strokes), 3)
+        self.assertIsNone(strokes[0].monitor)
+        self.assertEqual(strokes[1].curve.tolist(), strokes[2].curve.tolist())
+
+    def test_ring_wraps(self):
+        capture = ForceCurveCapture(ScriptedPyErg(STROKE * 4), capacity=10, monitor=False)
+        curves = [capture.capture_stroke().curve.tolist() for _ in range(4)]
+        self.assertEqual(curves, [[10, 20, 30, 40, 50, 30, -1]] * 4)
+        self.assertEqual(capture.dropped, 0)
+
+    def test_long_drive(self):
+        blocks = [block(list(range(16)), 2)] * 3 + [block([], 4)]
+        capture = ForceCurveCapture(ScriptedPyErg(blocks), capacity=40, monitor=False)
+        stroke = capture.capture_stroke()
+        self.assertEqual(len(stroke.curve), 40)
+        self.assertEqual(capture.dropped, 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
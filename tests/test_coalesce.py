@@ -0,0 +1,79 @@
+import threading
+import unittest
+
+from pyrow.coalesce import Coalescer
+from pyrow.csafe import csafe_cmd
+from pyrow.pacing import FramePacer
+from pyrow.pyrow import MONITOR_COMMANDS, FORCEPLOT_COMMANDS, WORKOUT_COMMANDS
+from tests.fixtures import RESULTS
+
+
+class TestCoalescer(unittest.TestCase):
+    def setUp(self):
+        self.pacer = FramePacer(gap=0.05)
+        self.sent = []
+        self.coalescer = Coalescer(self.send, self.pacer)
+
+    def send(self, message):
+        """
+        Answers message as PyErg._send does, in as many frames as it needs
+        """
+        self.sent.append(list(message))
+        self.pacer.sent()
+        response = {}
+        for frame in csafe_cmd.plan_frames(message):
+            results = [(name, RESULTS[name]) for name in frame if name in RESULTS]
+            response.update(csafe_cmd.read(csafe_cmd.write_response(results, status=1), frame))
+        return response
+
+    def send_together(self, messages):
+        #the frame gap of a previous frame is running
+        self.pacer.sent()
+        responses = [None] * len(messages)
+
+        def reader(index):
+            responses[index] = self.coalescer.send(messages[index])
+        threads = [threading.Thread(target=reader, args=(k,)) for k in range(len(messages))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def test_single(self):
+        response = self.coalescer.send(WORKOUT_COMMANDS)
+        self.assertEqual(response['CSAFE_PM_GET_WORKOUTTYPE'], [3])
+        self.assertEqual(self.sent, [list(WORKOUT_COMMANDS)])
+
+    def test_merged(self):
+        monitor, forceplot, workout = self.send_together(
+            [MONITOR_COMMANDS + FORCEPLOT_COMMANDS, FORCEPLOT_COMMANDS, WORKOUT_COMMANDS])
+        self.assertEqual(len(self.sent), 1)
+        #force plot requested twice is sent once
+        self.assertEqual(self.sent[0].count('CSAFE_PM_GET_FORCEPLOTDATA'), 1)
+        self.assertEqual(self.coalescer.requests, 3)
+        self.assertEqual(self.coalescer.batches, 1)
+
+        self.assertEqual(sorted(forceplot), ['CSAFE_GETSTATUS_CMD', 'CSAFE_PM_GET_FORCEPLOTDATA',
+                                             'CSAFE_PM_GET_STROKESTATE'])
+        self.assertEqual(forceplot['CSAFE_PM_GET_FORCEPLOTDATA'],
+                         monitor['CSAFE_PM_GET_FORCEPLOTDATA'])
+        self.assertNotIn('CSAFE_GETID_CMD', monitor)
+        self.assertEqual(workout['CSAFE_GETID_CMD'], ['123'])
+
+    def test_conflicting_arguments(self):
+        responses = self.send_together([['CSAFE_PM_GET_FORCEPLOTDATA', 32],
+                                        ['CSAFE_PM_GET_FORCEPLOTDATA', 16]])
+        self.assertEqual(len(self.sent), 2)
+        self.assertEqual(len(responses), 2)
+
+    def test_error(self):
+        def fail(message):
+            raise ConnectionError("USB device disconected")
+        coalescer = Coalescer(fail, self.pacer)
+        with self.assertRaises(ConnectionError):
+            coalescer.send(WORKOUT_COMMANDS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import random
+import unittest
+import numpy as np
+from pyrow.csafe import csafe_batch, csafe_cmd
+from pyrow.pyrow import decode_monitor_batch
+from pyrow.samples import MonitorSample
+from tests.test_csafe_cmd import MONITOR
+
+
+def monitor_results(rng):
+    return [
+        ('CSAFE_PM_GET_WORKTIME', [rng.randrange(2 ** 32), rng.randrange(100)]),
+        ('CSAFE_PM_GET_WORKDISTANCE', [rng.randrange(2 ** 32), rng.randrange(10)]),
+        ('CSAFE_GETCADENCE_CMD', [rng.randrange(60), 0]),
+        ('CSAFE_GETPOWER_CMD', [rng.randrange(2 ** 16), 88]),
+        ('CSAFE_GETCALORIES_CMD', [rng.randrange(2 ** 16)]),
+        ('CSAFE_GETHRCUR_CMD', [rng.randrange(256)]),
+        ('CSAFE_PM_GET_FORCEPLOTDATA', [rng.randrange(33)] +
+         [rng.randrange(2 ** 16) for _ in range(16)]),
+        ('CSAFE_PM_GET_STROKESTATE', [rng.randrange(5)]),
+    ]
+
+
+class TestDecodeBatch(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.reports = np.array(
+            [list(csafe_cmd.write_response(monitor_results(rng), status=rng.randrange(10)))
+             for _ in range(200)], dtype=np.uint8)
+
+    def test_matches_read(self):
+        columns, valid = csafe_batch.decode_batch(self.reports, MONITOR)
+        self.assertTrue(valid.all())
+        for row, report in enumerate(self.reports):
+            response = csafe_cmd.read(report.tobytes(), MONITOR)
+            for name, values in response.items():
+                self.assertEqual(columns[name][row].tolist(), values)
+
+    def test_invalid_rows(self):
+        self.reports[3, 6] ^= 0x01
+        self.reports[7, 1] = 0x00
+        _, valid = csafe_batch.decode_batch(self.reports, MONITOR)
+        self.assertEqual(np.nonzero(~valid)[0].tolist(), [3, 7])
+
+    def test_ascii(self):
+        reports = np.array([list(csafe_cmd.write_response(
+            [('CSAFE_GETSERIAL_CMD', ['43{:07d}'.format(i)])])) for i in range(3)], dtype=np.uint8)
+        columns, valid = csafe_batch.decode_batch(reports, ['CSAFE_GETSERIAL_CMD'])
+        self.assertEqual(columns['CSAFE_GETSERIAL_CMD'][:, 0].tolist(),
+                         [b'430000000', b'430000001', b'430000002'])
+
+
+class TestDecodeMonitorBatch(unittest.TestCase):
+    def test_matches_samples(self):
+        rng = random.Random(1)
+        transmissions = [csafe_cmd.write_response(monitor_results(rng), status=rng.randrange(10))
+                         for _ in range(50)]
+        reports = np.array([list(transmission) for transmission in transmissions], dtype=np.uint8)
+        monitor = decode_monitor_batch(reports, forceplot=True)
+        self.assertTrue(monitor['valid'].all())
+        self.assertEqual(monitor['forceplot'].dtype, np.int16)
+        self.assertEqual(monitor['power'].dtype, np.uint16)
+
+        for row, transmission in enumerate(transmissions):
+            sample = MonitorSample.from_results(csafe_cmd.read(transmission, MONITOR))
+            self.assertEqual(monitor['worktime'][row], sample.time)
+            self.assertEqual(monitor['workdistance'][row], sample.distance)
+            self.assertEqual(monitor['cadence'][row], sample.spm)
+            self.assertEqual(monitor['power'][row], sample.power)
+            self.assertEqual(monitor['calories'][row], sample.calories)
+            self.assertEqual(monitor['heartrate'][row], sample.heartrate)
+            self.assertEqual(monitor['strokestate'][row], sample.strokestate)
+            self.assertEqual(monitor['status'][row], sample.status)
+            points = monitor['forcepoints'][row]
+            self.assertEqual(monitor['forceplot'][row, :points].tolist(), sample.forceplot.tolist())
+
+    def test_no_valid_reports(self):
+        with self.assertRaises(ValueError):
+            decode_monitor_batch(np.zeros((3, 121), dtype=np.uint8))
+
+
+if __name__ == '__main__':
+    unittest.main()
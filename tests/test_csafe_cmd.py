@@ -0,0 +1,187 @@
+import array
+import unittest
+import warnings
+from pyrow.csafe import csafe_cmd, csafe_dic
+from tests.fixtures import sample_response
+
+MONITOR = ['CSAFE_PM_GET_WORKTIME', 'CSAFE_PM_GET_WORKDISTANCE', 'CSAFE_GETCADENCE_CMD',
+           'CSAFE_GETPOWER_CMD', 'CSAFE_GETCALORIES_CMD', 'CSAFE_GETHRCUR_CMD',
+           'CSAFE_PM_GET_FORCEPLOTDATA', 32, 'CSAFE_PM_GET_STROKESTATE']
+MONITOR_RESULTS = [
+    ('CSAFE_PM_GET_WORKTIME', [12345, 67]),
+    ('CSAFE_PM_GET_WORKDISTANCE', [4321, 5]),
+    ('CSAFE_GETCADENCE_CMD', [28, 0]),
+    ('CSAFE_GETPOWER_CMD', [0xF2, 88]),
+    ('CSAFE_GETCALORIES_CMD', [42]),
+    ('CSAFE_GETHRCUR_CMD', [150]),
+    ('CSAFE_PM_GET_FORCEPLOTDATA', [8] + list(range(100, 116))),
+    ('CSAFE_PM_GET_STROKESTATE', [2]),
+]
+
+
+class TestWrite(unittest.TestCase):
+    def test_short_command(self):
+        report = csafe_cmd.write(['CSAFE_GETSTATUS_CMD'])
+        self.assertEqual(report, bytes([0x01, 0xF1, 0x80, 0x80, 0xF2]) + bytes(16))
+
+    def test_report_cached(self):
+        command = ['CSAFE_PM_GET_FORCEPLOTDATA', 32, 'CSAFE_PM_GET_STROKESTATE']
+        self.assertIs(csafe_cmd.write(command), csafe_cmd.write(list(command)))
+
+    def test_template_patches_arguments(self):
+        report = csafe_cmd.write(['CSAFE_SETPOWER_CMD', 300, 88])
+        self.assertEqual(report[:10], bytes([0x01, 0xF1, 0x34, 0x03, 0x2C, 0x01, 0x58, 0x42, 0xF2, 0x00]))
+        report = csafe_cmd.write(['CSAFE_SETPOWER_CMD', 0xF1, 88])
+        #argument byte 0xF1 is stuffed
+        self.assertEqual(report[:11], bytes([0x01, 0xF1, 0x34, 0x03, 0xF3, 0x01, 0x00, 0x58, 0x9E, 0xF2, 0x00]))
+
+    def test_checksum_stuffed(self):
+        report = csafe_cmd.write(['CSAFE_SETCALORIES_CMD', 0xD0])
+        self.assertEqual(report[:7], bytes([0x01, 0xF1, 0x23, 0x02, 0xD0, 0x00, 0xF3]))
+        self.assertEqual(report[7:9], bytes([0x01, 0xF2]))
+
+    def test_report_sizes(self):
+        self.assertEqual(len(csafe_cmd.write(['CSAFE_GETSTATUS_CMD'])), 21)
+        report = csafe_cmd.write(['CSAFE_PM_GET_FORCEPLOTDATA', 32, 'CSAFE_PM_GET_STROKESTATE'])
+        self.assertEqual(report[0], 0x02)
+        self.assertEqual(len(report), 121)
+
+    def test_missing_argument(self):
+        with self.assertRaises(IndexError):
+            csafe_cmd.write(['CSAFE_SETPOWER_CMD', 300])
+
+    def test_write_into(self):
+        buffers = csafe_cmd.report_buffers()
+        self.assertEqual(sorted(buffers), [21, 63, 121])
+        report = csafe_cmd.write_into(MONITOR, buffers)
+        self.assertIs(report, buffers[121])
+        self.assertEqual(report.tobytes(), csafe_cmd.write(MONITOR))
+        #shorter reports are written into their own buffer
+        report = csafe_cmd.write_into(['CSAFE_GETSTATUS_CMD'], buffers)
+        self.assertIs(report, buffers[21])
+        self.assertEqual(buffers[121].tobytes(), csafe_cmd.write(MONITOR))
+
+
+class TestPlanFrames(unittest.TestCase):
+    def test_fits_one_frame(self):
+        self.assertEqual(csafe_cmd.plan_frames(MONITOR), (tuple(MONITOR),))
+
+    def test_split_by_response_size(self):
+        command = MONITOR + ['CSAFE_PM_GET_HEARTBEATDATA', 32, 'CSAFE_GETID_CMD']
+        self.assertEqual(csafe_cmd.plan_frames(command),
+                         (tuple(MONITOR), ('CSAFE_PM_GET_HEARTBEATDATA', 32, 'CSAFE_GETID_CMD')))
+
+    def test_split_by_frame_length(self):
+        #every argument byte is stuffed
+        command = ['CSAFE_SETPOWER_CMD', 0xF3F3, 88] * 40
+        frames = csafe_cmd.plan_frames(command)
+        self.assertEqual(len(frames), 4)
+        self.assertEqual(sum(frames, ()), tuple(command))
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            for frame in frames:
+                self.assertTrue(csafe_cmd.write(frame))
+
+    def test_wrapper_grouping(self):
+        command = ['CSAFE_PM_GET_WORKTIME', 'CSAFE_GETPOWER_CMD', 'CSAFE_PM_GET_WORKDISTANCE'] * 8
+        frames = csafe_cmd.plan_frames(command)
+        self.assertEqual([len(frame) for frame in frames], [11, 11, 2])
+        #consecutive PM3 commands share one wrapper
+        self.assertEqual(csafe_cmd.write(frames[1])[:8],
+                         bytes([0x02, 0xF1, 0x1A, 0x02, 0xA3, 0xA0, 0xB4, 0x1A]))
+
+    def test_missing_argument(self):
+        with self.assertRaises(IndexError):
+            csafe_cmd.plan_frames(['CSAFE_GETPOWER_CMD', 'CSAFE_SETPOWER_CMD', 300])
+
+    def test_command_lists(self):
+        self.assertEqual(
+            csafe_cmd.command_lists(['CSAFE_GETPOWER_CMD', 'CSAFE_SETPOWER_CMD', 300, 88,
+                                     'CSAFE_PM_GET_FORCEPLOTDATA', 32]),
+            [['CSAFE_GETPOWER_CMD'], ['CSAFE_SETPOWER_CMD', 300, 88],
+             ['CSAFE_PM_GET_FORCEPLOTDATA', 32]])
+
+
+class TestRead(unittest.TestCase):
+    def test_monitor(self):
+        transmission = csafe_cmd.write_response(MONITOR_RESULTS, status=5)
+        expected = {'CSAFE_GETSTATUS_CMD': [5]}
+        expected.update((name, values) for name, values in MONITOR_RESULTS)
+        self.assertEqual(csafe_cmd.read(transmission), expected)
+        self.assertEqual(csafe_cmd.read(transmission, MONITOR), expected)
+
+    def test_pyusb_array(self):
+        transmission = array.array('B', csafe_cmd.write_response(MONITOR_RESULTS, status=5))
+        self.assertEqual(csafe_cmd.read(transmission, MONITOR)['CSAFE_GETPOWER_CMD'], [0xF2, 88])
+        self.assertEqual(csafe_cmd.read(list(transmission))['CSAFE_GETPOWER_CMD'], [0xF2, 88])
+
+    def test_extended_frame(self):
+        transmission = bytearray(csafe_cmd.write_response([('CSAFE_GETHRCUR_CMD', [60])], status=1))
+        transmission[1:2] = [csafe_dic.Extended_Frame_Start_Flag, 0x00, 0xFD]
+        self.assertEqual(csafe_cmd.read(transmission, ['CSAFE_GETHRCUR_CMD']),
+                         {'CSAFE_GETSTATUS_CMD': [1], 'CSAFE_GETHRCUR_CMD': [60]})
+
+    def test_plan_matches_generic(self):
+        for msgprop in filter(None, csafe_dic.RESPONSES):
+            arguments, results = sample_response(msgprop.name)
+            transmission = csafe_cmd.write_response(results, status=1)
+            with self.subTest(response=msgprop.name):
+                self.assertEqual(csafe_cmd.read(transmission, arguments),
+                                 csafe_cmd.read(transmission))
+
+    def test_unexpected_response(self):
+        transmission = csafe_cmd.write_response([('CSAFE_GETHRCUR_CMD', [60])], status=1)
+        response = csafe_cmd.read(transmission, ['CSAFE_GETPROGRAM_CMD'])
+        self.assertEqual(response, {'CSAFE_GETSTATUS_CMD': [1], 'CSAFE_GETHRCUR_CMD': [60]})
+
+    def test_shared_tables_unchanged(self):
+        transmission = csafe_cmd.write_response([('CSAFE_GETCAPS_CMD', [96, 96, 50])], status=1)
+        self.assertEqual(csafe_cmd.read(transmission)['CSAFE_GETCAPS_CMD'], [96, 96, 50])
+        self.assertEqual(csafe_dic.resp[0x70][1], [11,])
+        self.assertEqual(csafe_dic.RESPONSES[0x70].layout, (11,))
+
+    def test_checksum_error(self):
+        transmission = bytearray(csafe_cmd.write_response([('CSAFE_GETHRCUR_CMD', [60])]))
+        transmission[4] ^= 0x01
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.assertEqual(csafe_cmd.read(transmission, ['CSAFE_GETHRCUR_CMD']), [])
+
+
+class TestFrameParser(unittest.TestCase):
+    def setUp(self):
+        self.parser = csafe_cmd.FrameParser()
+        self.report = csafe_cmd.write_response(MONITOR_RESULTS, status=5)
+
+    def test_byte_by_byte(self):
+        messages = []
+        for byte in self.report:
+            messages.extend(self.parser.feed(bytes((byte,))))
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(csafe_cmd.decode(messages[0], MONITOR)['CSAFE_GETPOWER_CMD'], [0xF2, 88])
+
+    def test_queued_frames(self):
+        first = csafe_cmd.write_response([('CSAFE_GETHRCUR_CMD', [60])], status=1)
+        messages = self.parser.feed(b'\x00\x07' + first + self.report[:30])
+        messages += self.parser.feed(array.array('B', self.report[30:]))
+        self.assertEqual([csafe_cmd.decode(message) for message in messages],
+                         [csafe_cmd.read(first), csafe_cmd.read(self.report)])
+
+    def test_extended_frame(self):
+        stream = bytes([0xF0, 0x00, 0xFD, 0x01, 0xB0, 0x01, 0x3C, 0x8C, 0xF2])
+        self.assertEqual(self.parser.feed(stream[:2]), [])
+        self.assertEqual(self.parser.feed(stream[2:]), [bytes([0x01, 0xB0, 0x01, 0x3C])])
+
+    def test_bad_frames_skipped(self):
+        corrupted = bytearray(self.report)
+        corrupted[5] ^= 0x01
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            #truncated frame followed by a corrupted one
+            messages = self.parser.feed(self.report[:10] + corrupted + self.report)
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(self.parser.errors, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
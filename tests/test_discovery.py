@@ -0,0 +1,166 @@
+import socket
+import threading
+import time
+import unittest
+
+from pyrow import emulator
+from pyrow.discovery import (DeviceIndex, Discovery, FakeSource, PeriodicSource, UeventSource,
+                             device_key)
+from pyrow.ergmanager import ErgManager
+from pyrow.transport import MemoryTransport
+
+
+def wait_for(condition, timeout=1):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+class FakeUsbDevice(object):
+    """
+    pyusb device counting the reads of its serial number
+    """
+    def __init__(self, bus, address, serial):
+        self.bus = bus
+        self.address = address
+        self._serial = serial
+        self.serial_reads = 0
+
+    @property
+    def serial_number(self):
+        self.serial_reads += 1
+        return self._serial
+
+
+class TestDeviceIndex(unittest.TestCase):
+    def test_diff(self):
+        index = DeviceIndex()
+        first, second = FakeUsbDevice(1, 4, 'A'), FakeUsbDevice(1, 5, 'B')
+        added, removed = index.update([first, second])
+        self.assertEqual(added, [((1, 4, 'A'), first), ((1, 5, 'B'), second)])
+        self.assertEqual(removed, [])
+        self.assertEqual(index.update([first, second]), ([], []))
+        added, removed = index.update([second])
+        self.assertEqual((added, removed), ([], [((1, 4, 'A'), first)]))
+
+    def test_serial_read_once(self):
+        index = DeviceIndex()
+        device = FakeUsbDevice(1, 4, 'A')
+        for _ in range(3):
+            #enumerating again returns new device objects
+            index.update([FakeUsbDevice(1, 4, 'A'), device])
+        self.assertEqual(device.serial_reads, 1)
+
+    def test_replugged(self):
+        index = DeviceIndex()
+        index.update([FakeUsbDevice(1, 4, 'A')])
+        added, removed = index.update([FakeUsbDevice(1, 7, 'A')])
+        self.assertEqual([key for key, _ in added], [(1, 7, 'A')])
+        self.assertEqual([key for key, _ in removed], [(1, 4, 'A')])
+
+    def test_forget(self):
+        index = DeviceIndex()
+        device = FakeUsbDevice(1, 4, 'A')
+        index.update([device])
+        index.forget((1, 4, 'A'))
+        self.assertEqual(index.update([device]), ([((1, 4, 'A'), device)], []))
+
+    def test_forget_while_updating(self):
+        index = DeviceIndex()
+        devices = [FakeUsbDevice(1, k, str(k)) for k in range(200)]
+        done = threading.Event()
+
+        def forget():
+            while not done.is_set():
+                for k in range(200):
+                    index.forget((1, k, str(k)))
+        thread = threading.Thread(target=forget)
+        thread.start()
+        try:
+            for _ in range(50):
+                added, _ = index.update(devices)
+                #every device forgotten is added again
+                self.assertLessEqual(len(added), 200)
+        finally:
+            done.set()
+            thread.join()
+        added, removed = index.update(devices)
+        self.assertEqual(len(index), 200)
+        self.assertEqual(removed, [])
+
+    def test_transport_key(self):
+        device = MemoryTransport(None, name='erg0')
+        self.assertEqual(device_key(device), (None, None, 'erg0'))
+
+
+class TestSources(unittest.TestCase):
+    def test_periodic_close(self):
+        source = PeriodicSource(list, interval=10)
+        threading.Timer(0.01, source.close).start()
+        self.assertFalse(source.wait())
+
+    def test_uevent_filter(self):
+        try:
+            source = UeventSource(list, interval=10)
+        except OSError:
+            self.skipTest("Kernel uevents not available")
+        source._sock.close()
+        source._sock, kernel = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        source._sock.setblocking(False)
+        self.addCleanup(kernel.close)
+        kernel.send(b'add@/devices/pci/usb1/1-1\0ACTION=add\0SUBSYSTEM=usb\0PRODUCT=46d/c52b/1\0')
+        kernel.send(b'bind@/devices/pci/usb1/1-2\0ACTION=bind\0SUBSYSTEM=usb\0PRODUCT=17a4/1/1\0')
+        self.assertFalse(source._relevant())
+        kernel.send(b'remove@/devices/pci/usb1/1-2\0ACTION=remove\0SUBSYSTEM=usb\0PRODUCT=17a4/1/1\0')
+        start = time.perf_counter()
+        self.assertTrue(source.wait())
+        self.assertLess(time.perf_counter() - start, 1)
+        source.close()
+        self.assertFalse(source.wait())
+
+    def test_discovery_events(self):
+        source = FakeSource()
+        events = []
+        discovery = Discovery(source, lambda key, device: events.append(('add', key)),
+                              lambda key, device: events.append(('remove', key)))
+        thread = threading.Thread(target=discovery.run)
+        thread.start()
+        device = MemoryTransport(None, name='erg0')
+        key = (None, None, 'erg0')
+        try:
+            source.plug(device)
+            self.assertTrue(wait_for(lambda: events == [('add', key)]))
+            source.unplug(device)
+            self.assertTrue(wait_for(lambda: events[-1] == ('remove', key)))
+        finally:
+            discovery.close()
+            thread.join()
+        self.assertEqual(len(discovery.index), 0)
+
+
+class TestHotplugErgManager(unittest.TestCase):
+    def test_attach_detach(self):
+        source = FakeSource()
+        added, removed = threading.Event(), threading.Event()
+        manager = ErgManager(emulator, add_callback=lambda erg: added.set(),
+                             update_callback=lambda erg: None,
+                             remove_callback=lambda erg: removed.set(),
+                             update_rate=0.01, source=source)
+        try:
+            device = MemoryTransport(emulator.ErgEmulator(serial='320000000').respond,
+                                     name='hotplug')
+            source.plug(device)
+            self.assertTrue(added.wait(1))
+            self.assertEqual(manager.get_names(), ['hotplug'])
+            source.unplug(device)
+            self.assertTrue(removed.wait(1))
+            self.assertEqual(manager.ergs, [])
+        finally:
+            manager.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import queue
+import socket
+import threading
+import unittest
+
+from pyrow import emulator
+from pyrow.csafe import csafe_cmd
+from pyrow.emulator import ErgEmulator, parse_request
+from pyrow.ergmanager import Erg
+from pyrow.pyrow import PyErg, MONITOR_COMMANDS, FORCEPLOT_COMMANDS, WORKOUT_COMMANDS
+from pyrow.transport import MemoryTransport, SocketTransport
+
+
+def emulated(values=None, **kwargs):
+    erg = PyErg(MemoryTransport(ErgEmulator(values, **kwargs).respond))
+    #no frame gap between the frames of the tests
+    erg.pacer.gap = 0.
+    return erg
+
+
+class TestParseRequest(unittest.TestCase):
+    def test_commands(self):
+        command = ['CSAFE_GETCADENCE_CMD', 'CSAFE_PM_GET_FORCEPLOTDATA', 32,
+                   'CSAFE_PM_GET_STROKESTATE', 'CSAFE_SETHORIZONTAL_CMD', 2000, 36]
+        message = csafe_cmd._unframe(csafe_cmd.write(command))
+        self.assertEqual(parse_request(bytes(message)), [
+            ('CSAFE_GETCADENCE_CMD', []),
+            ('CSAFE_PM_GET_FORCEPLOTDATA', [32]),
+            ('CSAFE_PM_GET_STROKESTATE', []),
+            ('CSAFE_SETHORIZONTAL_CMD', [2000, 36]),
+        ])
+
+
+class TestErgEmulator(unittest.TestCase):
+    def test_get_erg(self):
+        erg = emulated(serial='312345678', mininterframe=30)
+        ergdata = erg.get_erg()
+        self.assertEqual(ergdata['serial'], '312345678')
+        self.assertEqual(ergdata['mininterframe'], 30)
+        self.assertEqual(erg.pacer.basegap, 0.03)
+
+    def test_values(self):
+        erg = emulated({'CSAFE_GETCADENCE_CMD': [24],
+                        'CSAFE_PM_GET_STROKESTATE': lambda emulator: [emulator.frames % 5]})
+        monitor = erg.get_monitor(forceplot=True)
+        self.assertEqual(monitor['spm'], 24)
+        self.assertEqual(monitor['strokestate'], 1)
+        self.assertEqual(monitor['forceplot'], [])
+        self.assertEqual(erg.get_workout()['intcount'], 0)
+
+    def test_response_report_size(self):
+        emulator_ = ErgEmulator()
+        for command in (MONITOR_COMMANDS, MONITOR_COMMANDS + FORCEPLOT_COMMANDS,
+                        WORKOUT_COMMANDS):
+            report = csafe_cmd.write(command)
+            self.assertEqual(len(emulator_.respond(report)), len(report))
+
+    def test_set_workout(self):
+        erg = emulated()
+        erg.set_workout(distance=2000, split=500)
+        emulator_ = erg.transport._handler.__self__
+        self.assertEqual(emulator_.settings['CSAFE_SETHORIZONTAL_CMD'], [2000, 36])
+        self.assertEqual(erg.get_status(pretty=True)['status'], 'In Use')
+
+    def test_concurrent_senders(self):
+        erg = emulated({'CSAFE_GETCADENCE_CMD': [24]})
+        errors = []
+
+        def poll(send, check):
+            try:
+                for _ in range(100):
+                    check(send())
+            except Exception as e: # pylint: disable=broad-except
+                errors.append(e)
+        threads = [
+            threading.Thread(target=poll, args=(erg.get_monitor,
+                                                lambda monitor: monitor['spm'] == 24 or
+                                                errors.append(monitor))),
+            threading.Thread(target=poll, args=(lambda: erg.set_workout(distance=2000),
+                                                lambda response: None)),
+            threading.Thread(target=poll, args=(erg.get_workout,
+                                                lambda workout: workout['intcount'] == 0 or
+                                                errors.append(workout))),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_early_frames(self):
+        erg = PyErg(MemoryTransport(ErgEmulator(mininterframe=50).respond), adaptive=True)
+        erg.pacer.gap = 0.
+        erg.get_status()
+        erg.get_status()
+        erg.get_status()
+        emulator_ = erg.transport._handler.__self__
+        self.assertEqual(emulator_.early, 2)
+        #reported in the status byte of the next response
+        self.assertEqual(erg.pacer.rejects, 1)
+
+
+class TestSocketTransport(unittest.TestCase):
+    def test_serve(self):
+        client, server = socket.socketpair()
+        thread = threading.Thread(target=ErgEmulator({'CSAFE_GETCADENCE_CMD': [31]}).serve,
+                                  args=(server,))
+        thread.start()
+        try:
+            erg = PyErg(SocketTransport(client))
+            erg.pacer.gap = 0.
+            self.assertEqual(erg.get_monitor(forceplot=True)['spm'], 31)
+            self.assertEqual(erg.get_workout()['userid'], '000')
+        finally:
+            client.close()
+            thread.join()
+            server.close()
+
+    def test_timeout(self):
+        client, server = socket.socketpair()
+        try:
+            erg = PyErg(SocketTransport(client), adaptive=True)
+            with self.assertRaises(TimeoutError):
+                erg.transport.read(bytearray(21), timeout=10)
+        finally:
+            client.close()
+            server.close()
+
+
+class TestEmulatedErgManager(unittest.TestCase):
+    def test_erg_poller(self):
+        status_q = queue.Queue()
+        erg = Erg(emulator, emulator.find(1)[0], status_q, rate=0.01)
+        try:
+            self.assertIs(status_q.get(timeout=5), erg)
+        finally:
+            erg.exit_requested = True
+            erg._thread.join()
+        self.assertEqual(erg.id, 'ErgEmulator(300000000)')
+        self.assertEqual(erg.data['spm'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import threading
+import time
+import unittest
+
+from pyrow import emulator
+from pyrow.discovery import FakeSource
+from pyrow.emulator import ErgEmulator
+from pyrow.ergmanager import ErgManager
+from pyrow.fleet import FleetPoller
+from pyrow.transport import MemoryTransport
+
+
+class FakeErg(object):
+    """
+    Due every period seconds, records the threads and times it was polled at
+    """
+    def __init__(self, period, fail=False):
+        self.period = period
+        self.fail = fail
+        self.deadline = time.perf_counter()
+        self.polls = []
+
+    def next_poll(self):
+        return self.deadline
+
+    def poll_due(self, now=None):
+        self.polls.append((threading.current_thread().name, now))
+        if self.fail:
+            raise ValueError("Unexpected response")
+        self.deadline += self.period
+        return {'monitor': None}
+
+
+def unplugged(report):
+    raise ConnectionError("USB device disconected")
+
+
+class EmulatedFleet(object):
+    """
+    pyrow module of n emulated ergs
+    """
+    PyErg = emulator.PyErg
+    get_pretty = staticmethod(emulator.get_pretty)
+
+    def __init__(self, n, mininterframe=20):
+        self.emulators = [ErgEmulator(serial='3100000{:02d}'.format(k), mininterframe=mininterframe)
+                          for k in range(n)]
+        self.devices = [MemoryTransport(erg.respond, name='fleet{}'.format(k))
+                        for k, erg in enumerate(self.emulators)]
+
+    def find(self):
+        return self.devices
+
+
+class TestFleetPoller(unittest.TestCase):
+    def test_polls_on_deadlines(self):
+        poller = FleetPoller(workers=1)
+        fast, slow = FakeErg(0.01), FakeErg(0.05)
+        poller.add(fast)
+        poller.add(slow)
+        time.sleep(0.2)
+        poller.stop()
+        self.assertGreater(len(fast.polls), 2 * len(slow.polls))
+        self.assertEqual({name for name, _ in fast.polls + slow.polls}, {'fleet_poller-0'})
+        self.assertEqual(poller.stats()['ergs'], 2)
+
+    def test_error_stops_polling(self):
+        errors = []
+        poller = FleetPoller(on_error=lambda erg, e: errors.append((erg, e)))
+        broken = FakeErg(0.01, fail=True)
+        poller.add(broken)
+        time.sleep(0.05)
+        poller.stop()
+        self.assertEqual(len(broken.polls), 1)
+        self.assertIs(errors[0][0], broken)
+        self.assertEqual(poller.stats()['ergs'], 0)
+
+    def test_remove(self):
+        poller = FleetPoller()
+        erg = FakeErg(0.01)
+        poller.add(erg)
+        time.sleep(0.03)
+        poller.remove(erg)
+        polls = len(erg.polls)
+        time.sleep(0.03)
+        poller.stop()
+        self.assertEqual(len(erg.polls), polls)
+
+
+class TestFleetErgManager(unittest.TestCase):
+    def test_single_thread_fleet(self):
+        pyrow = EmulatedFleet(4)
+        updated = set()
+        manager = ErgManager(pyrow, add_callback=lambda erg: None,
+                             update_callback=lambda erg: updated.add(erg.id),
+                             check_rate=0.01, update_rate=0.05, pollers=1)
+        try:
+            time.sleep(0.5)
+        finally:
+            manager.stop()
+        self.assertEqual(updated, {'fleet0', 'fleet1', 'fleet2', 'fleet3'})
+        for erg in manager.ergs:
+            self.assertIsNone(erg._thread)
+            self.assertGreater(erg.stats()['monitor'], 0)
+            self.assertIn('distance', erg.data)
+        #the frame gap of every erg was kept
+        self.assertEqual([erg.early for erg in pyrow.emulators], [0] * 4)
+        self.assertEqual(sorted(manager.stats()), ['fleet0', 'fleet1', 'fleet2', 'fleet3'])
+
+    def test_failed_erg_removed(self):
+        pyrow = EmulatedFleet(2)
+        removed = []
+        #never found again, the device stays listed
+        manager = ErgManager(pyrow, add_callback=lambda erg: None,
+                             update_callback=lambda erg: None, remove_callback=removed.append,
+                             update_rate=0.05, pollers=2, source=FakeSource(pyrow.devices))
+        try:
+            #both opened, and the scan after them done
+            time.sleep(0.3)
+            broken = manager.ergs[0]
+            closed = []
+            broken._pyerg.transport.write = unplugged
+            broken._pyerg.transport.close = lambda: closed.append(broken)
+            time.sleep(0.2)
+        finally:
+            manager.stop()
+        self.assertIsInstance(broken.error, ConnectionError)
+        self.assertNotIn(broken, manager.ergs)
+        self.assertEqual(removed, [broken])
+        self.assertEqual(closed, [broken])
+
+    def test_failed_erg_thread_removed(self):
+        pyrow = EmulatedFleet(1)
+        removed = []
+        manager = ErgManager(pyrow, add_callback=lambda erg: None,
+                             update_callback=lambda erg: None, remove_callback=removed.append,
+                             update_rate=0.05, source=FakeSource(pyrow.devices))
+        try:
+            time.sleep(0.1)
+            broken = manager.ergs[0]
+            broken._pyerg.transport.write = unplugged
+            time.sleep(0.2)
+        finally:
+            manager.stop()
+        self.assertIsInstance(broken.error, ConnectionError)
+        self.assertFalse(broken._thread.is_alive())
+        self.assertEqual(removed, [broken])
+
+
+if __name__ == '__main__':
+    unittest.main()
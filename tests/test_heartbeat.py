@@ -0,0 +1,83 @@
+import unittest
+from array import array
+
+from pyrow.heartbeat import MAX_INTERVALS, HeartbeatStream
+from pyrow.pyrow import HEARTBEAT_COMMANDS, monitor_commands
+from pyrow.samples import HeartbeatSample
+from pyrow.scheduler import TelemetryScheduler, combine
+from tests.fixtures import StubPyErg
+
+
+def sample(intervals):
+    return HeartbeatSample(intervals=array('H', intervals), status=1)
+
+
+class TestHeartbeatSample(unittest.TestCase):
+    def test_get_heartbeat(self):
+        pyerg = StubPyErg()
+        pyerg.results['CSAFE_PM_GET_HEARTBEATDATA'] = [6, 810, 790, 805] + [0] * 13
+        heartbeat = pyerg.get_heartbeat()
+        self.assertEqual(heartbeat['intervals'], [810, 790, 805])
+        self.assertEqual(pyerg.sent, [HEARTBEAT_COMMANDS])
+
+
+class TestHeartbeatStream(unittest.TestCase):
+    def test_read_new(self):
+        stream = HeartbeatStream()
+        stream.feed(sample([800, 810]))
+        self.assertEqual(list(stream.read_new()), [800, 810])
+        stream.feed(sample([]))
+        stream.feed(sample([820]))
+        self.assertEqual(list(stream), [820])
+        self.assertEqual(list(stream.read_new()), [])
+        self.assertEqual(list(stream.intervals), [800, 810, 820])
+
+    def test_callback(self):
+        received = []
+        stream = HeartbeatStream(callback=lambda new: received.extend(new))
+        stream.feed(sample([800]))
+        stream.feed(sample([]))
+        stream.feed(sample([790, 780]))
+        self.assertEqual(received, [800, 790, 780])
+
+    def test_maxlen(self):
+        stream = HeartbeatStream(maxlen=3)
+        stream.feed(sample([1, 2]))
+        stream.read_new()
+        stream.feed(sample([3, 4, 5]))
+        self.assertEqual(list(stream.intervals), [3, 4, 5])
+        self.assertEqual(list(stream.read_new()), [3, 4, 5])
+        self.assertEqual(stream.total, 5)
+
+    def test_bounded_by_default(self):
+        stream = HeartbeatStream()
+        for _ in range(MAX_INTERVALS // 16 + 10):
+            stream.feed(sample(range(16)))
+        self.assertEqual(len(stream), MAX_INTERVALS)
+        self.assertEqual(len(stream.read_new()), MAX_INTERVALS)
+        unbounded = HeartbeatStream(maxlen=None)
+        unbounded.feed(sample(range(16)))
+        self.assertEqual(len(unbounded), 16)
+
+    def test_full_reads(self):
+        stream = HeartbeatStream()
+        stream.feed(sample(range(16)))
+        stream.feed(sample([1]))
+        self.assertEqual(stream.full_reads, 1)
+
+
+class TestScheduledHeartbeat(unittest.TestCase):
+    def test_alongside_monitor(self):
+        pyerg = StubPyErg()
+        scheduler = TelemetryScheduler(pyerg, {'heartbeat': 1, 'monitor': 5})
+        samples = scheduler.poll_due(now=100.)
+        self.assertEqual(sorted(samples), ['heartbeat', 'monitor'])
+        #one frame for both
+        self.assertEqual(pyerg.sent, [combine([HEARTBEAT_COMMANDS, monitor_commands()])])
+        self.assertEqual(list(scheduler.heartbeat.read_new()), list(range(800, 816)))
+        scheduler.poll_due(now=100.2)
+        self.assertEqual(len(scheduler.heartbeat), 16)
+
+
+if __name__ == '__main__':
+    unittest.main()
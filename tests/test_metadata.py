@@ -0,0 +1,126 @@
+import queue
+import unittest
+
+from pyrow import emulator
+from pyrow.csafe import csafe_cmd
+from pyrow.emulator import ErgEmulator
+from pyrow.ergmanager import Erg
+from pyrow.metadata import CACHE, ErgMetadata, MetadataCache
+from pyrow.pyrow import PyErg, ERG_COMMANDS, SERIAL_COMMANDS
+from pyrow.transport import MemoryTransport
+
+ERGDATA = {'mfgid': 22, 'cid': 0, 'model': 5, 'hwversion': 500, 'swversion': 164,
+           'serial': '430123456', 'maxrx': 96, 'maxtx': 96, 'mininterframe': 50, 'status': 1}
+
+
+class RecordingEmulator(ErgEmulator):
+    """
+    ErgEmulator recording the command names of every frame
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requests = []
+
+    def respond(self, report):
+        message = csafe_cmd._unframe(report)
+        self.requests.append(tuple(name for name, _ in emulator.parse_request(bytes(message))))
+        return super().respond(report)
+
+
+def connect(device, cache, adaptive=False):
+    erg = PyErg(MemoryTransport(device.respond), adaptive=adaptive, cache=cache)
+    erg.pacer.mingap = 0.
+    return erg
+
+
+class TestMetadataCache(unittest.TestCase):
+    def test_store_keeps_known(self):
+        cache = MetadataCache()
+        known = cache.store(ErgMetadata.from_ergdata(ERGDATA))
+        known.name = 'Bow'
+        self.assertIs(cache.store(ErgMetadata.from_ergdata(ERGDATA)), known)
+        self.assertIs(cache.get('430123456'), known)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_store_replaces_changed(self):
+        cache = MetadataCache()
+        cache.store(ErgMetadata.from_ergdata(ERGDATA))
+        updated = ErgMetadata.from_ergdata(dict(ERGDATA, swversion=165))
+        self.assertIs(cache.store(updated), updated)
+        self.assertIsNone(cache.get('430123456').name)
+
+    def test_maxlen(self):
+        cache = MetadataCache(maxlen=2)
+        for serial in ('1', '2', '3'):
+            cache.store(ErgMetadata.from_ergdata(dict(ERGDATA, serial=serial)))
+        self.assertEqual(len(cache), 1)
+        self.assertIn('3', cache)
+
+
+class TestAttach(unittest.TestCase):
+    def setUp(self):
+        self.cache = MetadataCache()
+        self.device = RecordingEmulator(serial='312345678', mininterframe=30)
+
+    def test_first_attach_queries_erg(self):
+        metadata = connect(self.device, self.cache).attach()
+        self.assertEqual(metadata.serial, '312345678')
+        self.assertEqual(metadata.mininterframe, 30)
+        self.assertEqual(self.device.requests[0], SERIAL_COMMANDS)
+        self.assertEqual(len(self.device.requests), 2)
+        self.assertIn('312345678', self.cache)
+
+    def test_reconnect_reuses_metadata(self):
+        first = connect(self.device, self.cache, adaptive=True)
+        metadata = first.attach()
+        metadata.name = 'Stroke'
+        first.pacer.gap = 0.02
+        first.detach()
+
+        self.device.requests.clear()
+        second = connect(self.device, self.cache, adaptive=True)
+        self.assertIs(second.attach(), metadata)
+        #one frame, the serial number
+        self.assertEqual(self.device.requests, [SERIAL_COMMANDS])
+        self.assertEqual(second.pacer.basegap, 0.03)
+        self.assertEqual(second.pacer.gap, 0.02)
+
+    def test_serial_change(self):
+        erg = connect(self.device, self.cache)
+        erg.attach()
+        self.device.values['CSAFE_GETSERIAL_CMD'] = ['398765432']
+        self.device.values['CSAFE_GETCAPS_CMD'] = [96, 96, 40]
+        metadata = erg.attach()
+        self.assertEqual(metadata.serial, '398765432')
+        self.assertEqual(erg.pacer.basegap, 0.04)
+        self.assertEqual(self.device.requests[-1], tuple(ERG_COMMANDS[:-1]))
+
+    def test_maxrx_limits_frames(self):
+        self.device.values['CSAFE_GETCAPS_CMD'] = [8, 96, 30]
+        erg = connect(self.device, self.cache)
+        erg.attach()
+        self.assertEqual(erg.maxframe, 8)
+        self.device.requests.clear()
+        erg.get_workout()
+        self.assertGreater(len(self.device.requests), 1)
+
+
+class TestErgNaming(unittest.TestCase):
+    def test_reconnected_erg_keeps_name(self):
+        device = emulator.find(1)[0]
+        status_q = queue.Queue()
+        first = Erg(emulator, device, status_q, rate=0.01)
+        first.exit_requested = True
+        first._thread.join()
+        first.metadata.name = 'Bow'
+        self.addCleanup(CACHE.discard, first.serial)
+
+        second = Erg(emulator, device, status_q, rate=0.01)
+        second.exit_requested = True
+        second._thread.join()
+        self.assertEqual(second.name, 'Bow')
+        self.assertEqual(second.serial, '300000000')
+
+
+if __name__ == '__main__':
+    unittest.main()
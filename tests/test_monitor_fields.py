@@ -0,0 +1,61 @@
+import queue
+import unittest
+
+from pyrow import simpyrow
+from pyrow.csafe import csafe_cmd
+from pyrow.ergmanager import Erg
+from pyrow.pyrow import MONITOR_COMMANDS, FORCEPLOT_COMMANDS, monitor_commands
+from tests.fixtures import StubPyErg
+
+
+class TestMonitorCommands(unittest.TestCase):
+    def test_all_fields(self):
+        self.assertEqual(monitor_commands(), MONITOR_COMMANDS)
+        self.assertEqual(monitor_commands(forceplot=True), MONITOR_COMMANDS + FORCEPLOT_COMMANDS)
+
+    def test_field_commands(self):
+        self.assertEqual(monitor_commands(['distance', 'heartrate']),
+                         ('CSAFE_GETHRCUR_CMD', 'CSAFE_PM_GET_WORKDISTANCE'))
+        self.assertEqual(monitor_commands(['strokestate'], forceplot=True),
+                         ('CSAFE_PM_GET_FORCEPLOTDATA', 32, 'CSAFE_PM_GET_STROKESTATE'))
+        self.assertEqual(monitor_commands(['status']), ('CSAFE_GETSTATUS_CMD',))
+
+    def test_derived_from_power(self):
+        for fields in (['pace'], ['calhr'], ['pace', 'calhr', 'power']):
+            self.assertEqual(monitor_commands(fields), ('CSAFE_GETPOWER_CMD',))
+
+    def test_iterator(self):
+        self.assertEqual(monitor_commands(iter(['power'])), ('CSAFE_GETPOWER_CMD',))
+
+    def test_smallest_report(self):
+        for fields in (['pace'], ['spm', 'heartrate'], ['calories', 'power']):
+            self.assertEqual(csafe_cmd.write(monitor_commands(fields))[0], 0x01)
+        self.assertEqual(csafe_cmd.write(monitor_commands(['distance', 'power']))[0], 0x04)
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            monitor_commands(['power', 'speed'])
+
+
+class TestGetMonitorFields(unittest.TestCase):
+    def test_get_monitor(self):
+        erg = StubPyErg()
+        monitor = erg.get_monitor(fields=['pace', 'distance'])
+        self.assertEqual(erg.sent, [monitor_commands(['pace', 'distance'])])
+        self.assertEqual(sorted(monitor), ['calhr', 'distance', 'pace', 'power', 'status'])
+
+    def test_erg_poller(self):
+        status_q = queue.Queue()
+        erg = Erg(simpyrow, 0, status_q, rate=0.01, fields=['pace'])
+        try:
+            self.assertIs(status_q.get(timeout=5), erg)
+        finally:
+            erg.exit_requested = True
+            erg._thread.join()
+        self.assertIn('pace', erg.data)
+        self.assertNotIn('heartrate', erg.data)
+        self.assertNotIn('forceplot', erg.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
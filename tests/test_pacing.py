@@ -0,0 +1,142 @@
+import errno
+import unittest
+
+from usb import USBError
+
+from pyrow import pacing
+from pyrow.csafe import csafe_cmd
+from pyrow.pacing import FramePacer
+from pyrow.pyrow import PyErg, ERG_COMMANDS
+from pyrow.transport import Transport
+from tests.fixtures import ERG_RESULTS
+
+
+class FakeDevice(Transport):
+    """
+    Transport answering every frame with the responses to ERG_COMMANDS
+    status: status byte of the responses, None to time out instead
+    """
+    def __init__(self, status=1):
+        self.status = status
+
+    def write(self, report):
+        pass
+
+    def read(self, buffer, timeout=None):
+        if self.status is None:
+            raise USBError("Operation timed out", errno=errno.ETIMEDOUT)
+        report = csafe_cmd.write_response(ERG_RESULTS, status=self.status)
+        memoryview(buffer)[:len(report)] = report
+        return len(report)
+
+
+class TestFramePacer(unittest.TestCase):
+    def test_delay(self):
+        pacer = FramePacer(gap=0.05)
+        self.assertEqual(pacer.delay(), 0.)
+        pacer.sent(now=10.)
+        self.assertAlmostEqual(pacer.delay(now=10.02), 0.03)
+        self.assertEqual(pacer.delay(now=10.06), 0.)
+        self.assertEqual(pacer.frames, 1)
+
+    def test_mininterframe(self):
+        pacer = FramePacer()
+        pacer.set_mininterframe(25)
+        self.assertEqual(pacer.gap, 0.025)
+        #never below mingap
+        pacer.set_mininterframe(0)
+        self.assertEqual(pacer.gap, pacing.MIN_ADAPTIVE_GAP)
+
+    def test_mininterframe_unchanged(self):
+        pacer = FramePacer(adaptive=True, mingap=0.01)
+        pacer.set_mininterframe(50)
+        for _ in range(pacing.ADAPT_FRAMES):
+            pacer.answered(0.002)
+        #polling get_erg again keeps the adapted gap
+        pacer.set_mininterframe(50)
+        self.assertAlmostEqual(pacer.gap, 0.05 * pacing.ADAPT_FACTOR)
+        pacer.set_mininterframe(40)
+        self.assertEqual(pacer.gap, 0.04)
+
+    def test_fixed_gap(self):
+        pacer = FramePacer(gap=0.05)
+        for _ in range(pacing.ADAPT_FRAMES * 3):
+            pacer.answered(0.002)
+        self.assertEqual(pacer.gap, 0.05)
+        self.assertAlmostEqual(pacer.usb_time, 0.002 * pacing.ADAPT_FRAMES * 3)
+
+    def test_adaptive(self):
+        pacer = FramePacer(gap=0.05, adaptive=True, mingap=0.04)
+        for _ in range(pacing.ADAPT_FRAMES):
+            pacer.answered(0.002)
+        self.assertAlmostEqual(pacer.gap, 0.05 * pacing.ADAPT_FACTOR)
+        for _ in range(pacing.ADAPT_FRAMES * 10):
+            pacer.answered(0.002)
+        self.assertEqual(pacer.gap, 0.04)
+        #backs off on a retried response, up to the gap of the monitor
+        pacer.answered(0.004, retries=1)
+        self.assertEqual(pacer.gap, 0.05)
+        self.assertEqual(pacer.retries, 1)
+
+    def test_previous_frame_rejected(self):
+        pacer = FramePacer(gap=0.05, adaptive=True, mingap=0.01)
+        for _ in range(pacing.ADAPT_FRAMES * 2):
+            pacer.answered(0.002, status=0x01)
+        self.assertAlmostEqual(pacer.gap, 0.05 * pacing.ADAPT_FACTOR ** 2)
+        #not ready
+        pacer.answered(0.002, status=0x31)
+        self.assertEqual(pacer.gap, 0.05)
+        self.assertEqual(pacer.rejects, 1)
+
+    def test_timed_out(self):
+        pacer = FramePacer(gap=0.05, adaptive=True, mingap=0.01)
+        for _ in range(pacing.ADAPT_FRAMES):
+            pacer.answered(0.002)
+        pacer.timed_out(2.)
+        self.assertEqual(pacer.gap, 0.05)
+        self.assertEqual(pacer.stats()['timeouts'], 1)
+
+    def test_wait(self):
+        pacer = FramePacer(gap=0.02)
+        pacer.sent()
+        pacer.wait()
+        self.assertEqual(pacer.delay(), 0.)
+        self.assertGreater(pacer.gap_time, 0.)
+        self.assertLessEqual(pacer.gap_time, 0.02)
+
+
+class TestTransferFeedback(unittest.TestCase):
+    def test_rejected(self):
+        erg = PyErg(FakeDevice(status=0x01), adaptive=True)
+        for _ in range(pacing.ADAPT_FRAMES):
+            erg.transfer(ERG_COMMANDS)
+        self.assertLess(erg.pacer.gap, 0.05)
+        #previous frame rejected
+        erg.transport.status = 0x11
+        erg.transfer(ERG_COMMANDS)
+        self.assertEqual(erg.pacer.gap, 0.05)
+        self.assertEqual(erg.pacer.rejects, 1)
+
+    def test_timeout(self):
+        erg = PyErg(FakeDevice(status=0x01), adaptive=True)
+        for _ in range(pacing.ADAPT_FRAMES):
+            erg.transfer(ERG_COMMANDS)
+        erg.transport.status = None
+        with self.assertRaises(USBError):
+            erg.transfer(ERG_COMMANDS)
+        self.assertEqual(erg.pacer.gap, 0.05)
+        self.assertEqual(erg.pacer.timeouts, 1)
+
+    def test_get_erg_keeps_gap(self):
+        erg = PyErg(FakeDevice(status=0x01), adaptive=True)
+        erg.get_erg()
+        self.assertEqual(erg.pacer.basegap, 0.05)
+        for _ in range(pacing.ADAPT_FRAMES):
+            erg.transfer(ERG_COMMANDS)
+        gap = erg.pacer.gap
+        erg.get_erg()
+        self.assertEqual(erg.pacer.gap, gap)
+
+
+if __name__ == '__main__':
+    unittest.main()
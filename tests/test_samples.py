@@ -0,0 +1,66 @@
+import unittest
+from pyrow.samples import MonitorSample, WorkoutSample, pack, unpack
+
+
+RESULTS = {
+    'CSAFE_GETSTATUS_CMD': [0x15],
+    'CSAFE_PM_GET_WORKTIME': [12345, 67],
+    'CSAFE_PM_GET_WORKDISTANCE': [4321, 5],
+    'CSAFE_GETCADENCE_CMD': [28, 0],
+    'CSAFE_GETPOWER_CMD': [0, 88],
+    'CSAFE_GETCALORIES_CMD': [42],
+    'CSAFE_GETHRCUR_CMD': [150],
+    'CSAFE_PM_GET_FORCEPLOTDATA': [6, 10, 20, 30] + [0] * 13,
+    'CSAFE_PM_GET_STROKESTATE': [2],
+}
+
+
+class TestMonitorSample(unittest.TestCase):
+    def test_as_dict(self):
+        sample = MonitorSample.from_results(RESULTS, timestamp=1.5)
+        self.assertEqual(sample.timestamp, 1.5)
+        self.assertEqual(sample.forceplot.typecode, 'h')
+        self.assertEqual(sample.as_dict(), {
+            'time': 124.12, 'distance': 432.6, 'spm': 28, 'power': 0, 'pace': 0, 'calhr': 0,
+            'calories': 42, 'heartrate': 150, 'forceplot': [10, 20, 30], 'strokestate': 2,
+            'status': 5,
+        })
+
+    def test_unpolled_fields_omitted(self):
+        results = dict(RESULTS)
+        del results['CSAFE_PM_GET_FORCEPLOTDATA']
+        del results['CSAFE_PM_GET_STROKESTATE']
+        data = {'forceplot': [1]}
+        MonitorSample.from_results(results).as_dict(into=data)
+        self.assertNotIn('strokestate', data)
+        self.assertEqual(data['forceplot'], [1])
+
+    def test_forceplot_words_above_int16(self):
+        results = dict(RESULTS)
+        results['CSAFE_PM_GET_FORCEPLOTDATA'] = [4, 40000, 5] + [0] * 14
+        sample = MonitorSample.from_results(results)
+        self.assertEqual(sample.forceplot.tolist(), [40000 - 0x10000, 5])
+
+    def test_slots(self):
+        sample = WorkoutSample(userid=0, type=0, state=1, inttype=1, intcount=0, status=5)
+        with self.assertRaises(AttributeError):
+            sample.extra = 1
+        with self.assertRaises(TypeError):
+            WorkoutSample(extra=1)
+
+
+class TestPack(unittest.TestCase):
+    def test_monitor(self):
+        sample = MonitorSample.from_results(RESULTS, timestamp=1.5)
+        unpacked = unpack(pack(sample))
+        self.assertEqual(unpacked.as_dict(), sample.as_dict())
+        self.assertEqual(unpacked.timestamp, 1.5)
+        self.assertEqual(unpacked.forceplot.typecode, 'h')
+
+    def test_workout(self):
+        sample = WorkoutSample(userid='000', type=1, state=10, inttype=0, intcount=3, status=5)
+        self.assertEqual(unpack(pack(sample)).as_dict(), sample.as_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,226 @@
+import queue
+import time
+import unittest
+
+from pyrow import emulator
+from pyrow.csafe import csafe_cmd
+from pyrow.ergmanager import Erg, ErgManager
+from pyrow.pyrow import FORCEPLOT_COMMANDS, WORKOUT_COMMANDS, ERG_COMMANDS, get_pretty
+from pyrow.samples import MonitorSample, ForcePlotSample, WorkoutSample
+from pyrow import scheduler as scheduler_module
+from pyrow.scheduler import TelemetryScheduler, combine, stroke_phase
+from pyrow.transport import MemoryTransport
+from tests.fixtures import StubPyErg
+
+
+class StubPyRow(object):
+    PyErg = StubPyErg
+    get_pretty = staticmethod(get_pretty)
+
+
+class TestCombine(unittest.TestCase):
+    def test_duplicates(self):
+        self.assertEqual(combine([FORCEPLOT_COMMANDS, FORCEPLOT_COMMANDS]), FORCEPLOT_COMMANDS)
+
+    def test_one_wrapper(self):
+        combined = combine([FORCEPLOT_COMMANDS, WORKOUT_COMMANDS])
+        #standard commands first
+        self.assertEqual(combined[0], 'CSAFE_GETID_CMD')
+        message = csafe_cmd.write(combined)
+        self.assertEqual(message.count(0x1A), 1)
+
+
+class TestTelemetryScheduler(unittest.TestCase):
+    def setUp(self):
+        self.pyerg = StubPyErg()
+        self.scheduler = TelemetryScheduler(self.pyerg)
+
+    def test_first_poll(self):
+        samples = self.scheduler.poll_due(now=100.)
+        self.assertEqual(sorted(samples), ['erg', 'forceplot', 'monitor', 'workout'])
+        #every group in as few frames as fit
+        self.assertEqual(self.pyerg.sent, list(csafe_cmd.plan_frames(
+            combine([FORCEPLOT_COMMANDS, self.scheduler._commands['monitor'], WORKOUT_COMMANDS,
+                     ERG_COMMANDS]))))
+        self.assertIsInstance(samples['monitor'], MonitorSample)
+        self.assertIsInstance(samples['forceplot'], ForcePlotSample)
+        self.assertIsInstance(samples['workout'], WorkoutSample)
+        self.assertEqual(samples['erg']['mininterframe'], 50)
+        self.assertEqual(samples['monitor'].spm, 28)
+
+    def test_rates(self):
+        scheduler = self.scheduler
+        counts = {}
+        now = 100.
+        #one second at the 10ms frame gap
+        while now < 101.:
+            for group in scheduler.poll_due(now=now):
+                counts[group] = counts.get(group, 0) + 1
+            now += 0.01
+        self.assertEqual(counts, {'forceplot': 20, 'monitor': 5, 'workout': 1, 'erg': 1})
+        self.assertAlmostEqual(scheduler.stats(now=101.)['forceplot'], 20, places=0)
+
+    def test_only_due_commands(self):
+        self.scheduler.poll_due(now=100.)
+        self.scheduler.poll_due(now=100.05)
+        self.assertEqual(self.pyerg.sent[-1], FORCEPLOT_COMMANDS)
+
+    def test_late_poll(self):
+        scheduler = TelemetryScheduler(self.pyerg, {'monitor': 5})
+        scheduler.poll_due(now=100.)
+        scheduler.poll_due(now=101.)
+        #no burst of the polls missed
+        self.assertEqual(scheduler.due(now=101.1), ())
+        self.assertEqual(scheduler.due(now=101.2), ('monitor',))
+
+    def test_once_per_connection(self):
+        scheduler = TelemetryScheduler(self.pyerg, {'erg': 0})
+        self.assertEqual(sorted(scheduler.poll_due(now=100.)), ['erg'])
+        self.assertIsNone(scheduler.delay())
+        self.assertEqual(scheduler.poll(), {})
+        scheduler.reset()
+        self.assertEqual(scheduler.due(now=100.), ('erg',))
+
+    def test_fields(self):
+        scheduler = TelemetryScheduler(self.pyerg, {'monitor': 5}, fields=['pace'])
+        samples = scheduler.poll_due(now=100.)
+        self.assertEqual(self.pyerg.sent, [('CSAFE_GETPOWER_CMD',)])
+        self.assertIsNotNone(samples['monitor'].pace)
+
+    def test_unknown_group(self):
+        with self.assertRaises(ValueError):
+            TelemetryScheduler(self.pyerg, {'strokes': 1})
+
+
+class TestStrokePhase(unittest.TestCase):
+    def test_phase(self):
+        self.assertEqual(stroke_phase(2, 1), 'drive')
+        self.assertEqual(stroke_phase(4, 1), 'recovery')
+        self.assertEqual(stroke_phase(1, 1), 'recovery')
+        self.assertEqual(stroke_phase(0, 1), 'idle')
+        #waiting begin, workout end
+        self.assertEqual(stroke_phase(2, 0), 'idle')
+        self.assertEqual(stroke_phase(4, 10), 'idle')
+        self.assertEqual(stroke_phase(None, None), 'recovery')
+
+    def count(self, scheduler, start, seconds):
+        counts = {}
+        now = start
+        while now < start + seconds - 1e-9:
+            for group in scheduler.poll_due(now=now):
+                counts[group] = counts.get(group, 0) + 1
+            now += 0.01
+        return counts
+
+    def test_adaptive_rates(self):
+        pyerg = StubPyErg()
+        scheduler = TelemetryScheduler(pyerg, {'forceplot': 20, 'monitor': 5, 'workout': 1},
+                                       adaptive=True)
+        #drive, polled at every 10ms frame gap
+        pyerg.results['CSAFE_PM_GET_STROKESTATE'] = [2]
+        self.assertEqual(self.count(scheduler, 100., 0.5)['forceplot'], 50)
+        self.assertEqual(scheduler.phase, 'drive')
+        #recovery
+        pyerg.results['CSAFE_PM_GET_STROKESTATE'] = [4]
+        counts = self.count(scheduler, 100.5, 1.)
+        self.assertEqual(scheduler.phase, 'recovery')
+        self.assertLessEqual(counts['forceplot'],
+                             scheduler_module.PHASE_RATES['recovery']['forceplot'] + 1)
+        #finished
+        pyerg.results['CSAFE_PM_GET_WORKOUTSTATE'] = [10]
+        self.count(scheduler, 101.5, 1.)
+        self.assertEqual(scheduler.phase, 'idle')
+        self.assertEqual(self.count(scheduler, 102.5, 2.), {'forceplot': 2, 'monitor': 2,
+                                                            'workout': 2})
+        #back to rowing, seen at the next workout poll
+        pyerg.results['CSAFE_PM_GET_WORKOUTSTATE'] = [1]
+        pyerg.results['CSAFE_PM_GET_STROKESTATE'] = [2]
+        self.count(scheduler, 104.5, 1.)
+        self.assertEqual(scheduler.phase, 'drive')
+
+    def test_unscheduled_groups(self):
+        scheduler = TelemetryScheduler(StubPyErg(), {'forceplot': 20}, adaptive=True)
+        scheduler.poll_due(now=100.)
+        self.assertEqual(sorted(scheduler.rates), ['forceplot'])
+
+
+class TestScheduledErg(unittest.TestCase):
+    def test_erg_poller(self):
+        status_q = queue.Queue()
+        erg = Erg(StubPyRow, 0, status_q, rates={'monitor': 100, 'workout': 50, 'erg': 0})
+        try:
+            for _ in range(3):
+                self.assertIs(status_q.get(timeout=5), erg)
+        finally:
+            erg.exit_requested = True
+            erg._thread.join()
+        self.assertEqual(erg.data['spm'], 28)
+        self.assertIn('state', erg.data)
+        self.assertEqual(erg.data['inttype'], 'Time')
+        self.assertEqual(erg._pyerg.pacer.basegap, 0.05)
+        self.assertEqual(erg.scheduler.polls['erg'], 1)
+
+
+class EmulatedPyRow(object):
+    """
+    pyrow module of one emulated erg in the drive of an interval workout
+    """
+    PyErg = emulator.PyErg
+    get_pretty = staticmethod(emulator.get_pretty)
+
+    def __init__(self):
+        self.emulator = emulator.ErgEmulator(serial='330000000', values={
+            'CSAFE_PM_GET_STROKESTATE': [2],
+            'CSAFE_PM_GET_WORKOUTSTATE': [1],
+            'CSAFE_PM_GET_INTERVALTYPE': [0],
+        }, mininterframe=10)
+        self.devices = [MemoryTransport(self.emulator.respond, name='scheduled')]
+
+    def find(self):
+        return self.devices
+
+
+def run_manager(seconds=0.5, **kwargs):
+    """
+    Runs an ErgManager of an EmulatedPyRow, returns the manager, its erg and the updates
+    """
+    updates = []
+    manager = ErgManager(EmulatedPyRow(), add_callback=lambda erg: None,
+                         update_callback=lambda erg: updates.append(erg.data),
+                         check_rate=0.01, **kwargs)
+    try:
+        time.sleep(seconds)
+        ergs = list(manager.ergs)
+    finally:
+        manager.stop()
+    return manager, ergs, updates
+
+
+class TestScheduledErgManager(unittest.TestCase):
+    def test_groups_at_own_rates(self):
+        _, ergs, updates = run_manager(rates={'forceplot': 50, 'monitor': 10, 'workout': 2})
+        #still polled, the readable values of the groups not due are not made readable again
+        self.assertEqual(len(ergs), 1)
+        self.assertIsNone(ergs[0].error)
+        self.assertGreater(len(updates), 5)
+        for data in updates:
+            self.assertEqual(data['strokestate'], 'Drive')
+            self.assertEqual(data['inttype'], 'Time')
+        self.assertGreater(ergs[0].scheduler.polls['forceplot'],
+                           ergs[0].scheduler.polls['workout'])
+
+    def test_adaptive(self):
+        for pollers in (None, 1):
+            _, ergs, updates = run_manager(adaptive=True, pollers=pollers)
+            self.assertEqual(len(ergs), 1)
+            self.assertIsNone(ergs[0].error)
+            self.assertEqual(ergs[0].scheduler.phase, 'drive')
+            #the force plot at the fastest rate, the other groups left out of most polls
+            self.assertGreater(len(updates), 5)
+            self.assertGreater(ergs[0].scheduler.polls['forceplot'],
+                               ergs[0].scheduler.polls['workout'])
+            self.assertEqual(updates[-1]['strokestate'], 'Drive')
+
+
+if __name__ == '__main__':
+    unittest.main()
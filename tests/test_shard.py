@@ -0,0 +1,132 @@
+import multiprocessing
+import pickle
+import threading
+import time
+import unittest
+
+from pyrow.samples import MonitorSample
+from pyrow.shard import ATTACHED, REMOVED, ShardedErgManager, _ShardWorker
+from tests import fleet_pyrow
+
+
+class VisibleFleet(object):
+    """
+    fleet_pyrow as seen by the parent process, finding only the visible ergs
+    """
+    __name__ = fleet_pyrow.__name__
+    PyErg = fleet_pyrow.PyErg
+    get_pretty = staticmethod(fleet_pyrow.get_pretty)
+
+    def __init__(self):
+        self.visible = fleet_pyrow.find()
+
+    def find(self):
+        return list(self.visible)
+
+
+def wait_for(condition, timeout=20):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+class TestShardedErgManager(unittest.TestCase):
+    def setUp(self):
+        self.pyrow = VisibleFleet()
+        self.updates = {}
+        self.manager = ShardedErgManager(
+            self.pyrow, add_callback=lambda erg: 'Erg {}'.format(erg.serial[-1]),
+            update_callback=self.updated, check_rate=0.05, update_rate=0.05, processes=2)
+        self.addCleanup(self.manager.stop)
+
+    def updated(self, erg):
+        self.updates[erg.name] = erg.shard
+
+    def test_polls_every_erg(self):
+        self.assertTrue(wait_for(lambda: len(self.updates) == 4))
+        self.assertEqual(sorted(self.manager.get_names()),
+                         ['Erg 0', 'Erg 1', 'Erg 2', 'Erg 3'])
+        self.assertEqual(self.manager.loads(), [2, 2])
+        self.assertEqual(sorted(self.updates.values()), [0, 0, 1, 1])
+        erg = self.manager.ergs[0]
+        self.assertIn('distance', erg.data)
+        self.assertEqual(erg.data['status'], 'Ready')
+        self.assertIsInstance(erg.monitor, MonitorSample)
+
+    def test_rebalances_removed_ergs(self):
+        self.assertTrue(wait_for(lambda: len(self.updates) == 4))
+        #the ergs of the second worker are unplugged
+        second = [erg for erg in self.manager.ergs if erg.shard == 1]
+        self.pyrow.visible = [device for device in self.pyrow.visible
+                              if device.__repr__() not in [erg.id for erg in second]]
+        self.assertTrue(wait_for(lambda: len(self.manager.ergs) == 2))
+        self.assertTrue(wait_for(lambda: sorted(erg.shard for erg in self.manager.ergs) == [0, 1]))
+        self.assertEqual(self.manager.loads(), [1, 1])
+        moved = next(erg for erg in self.manager.ergs if erg.shard == 1)
+        self.updates.clear()
+        self.assertTrue(wait_for(lambda: self.updates.get(moved.name) == 1))
+
+    def test_remove_callback(self):
+        self.assertTrue(wait_for(lambda: len(self.updates) == 4))
+        removed = []
+        self.manager.remove_callback = removed.append
+        unplugged = self.pyrow.visible.pop()
+        self.assertTrue(wait_for(lambda: len(removed) == 1))
+        self.assertEqual(removed[0].id, unplugged.__repr__())
+        self.assertNotIn(removed[0], self.manager.ergs)
+
+
+class TestShardedRates(unittest.TestCase):
+    def test_groups_at_own_rates(self):
+        updates = []
+        manager = ShardedErgManager(
+            VisibleFleet(), add_callback=lambda erg: None,
+            update_callback=lambda erg: updates.append(erg.data), check_rate=0.05,
+            rates={'forceplot': 20, 'monitor': 10, 'workout': 2}, processes=2)
+        self.addCleanup(manager.stop)
+        #every erg still polled after polls leaving the workout out
+        self.assertTrue(wait_for(lambda: len(updates) > 40))
+        self.assertEqual(len(manager.ergs), 4)
+        self.assertTrue(all(erg.error is None for erg in manager.ergs))
+        self.assertEqual(updates[-1]['inttype'], 'Time')
+        self.assertEqual(updates[-1]['strokestate'], 'Wait for min speed')
+
+
+def unplugged(report):
+    raise ConnectionError("USB device disconected")
+
+
+class TestShardWorker(unittest.TestCase):
+    def test_failed_erg_closed(self):
+        conn, worker_conn = multiprocessing.Pipe()
+        worker = _ShardWorker(fleet_pyrow, worker_conn, update_rate=0.02)
+        thread = threading.Thread(target=worker.run)
+        thread.start()
+        try:
+            conn.send(('attach', 0, fleet_pyrow.find()[0].__repr__(), None))
+            records = iter(lambda: conn.recv_bytes(), None)
+            self.assertEqual(next(records)[:1], ATTACHED)
+            erg = worker._ergs[0]
+            closed = []
+            #the emulated ergs are shared by every test
+            transport = erg._pyerg.transport
+            transport.write = unplugged
+            transport.close = lambda: closed.append(erg)
+            self.addCleanup(delattr, transport, 'write')
+            self.addCleanup(delattr, transport, 'close')
+            record = next(record for record in records if record[:1] == REMOVED)
+        finally:
+            conn.send(('stop',))
+            thread.join()
+        slot, error = pickle.loads(record[1:])
+        self.assertEqual(slot, 0)
+        self.assertIsInstance(error, ConnectionError)
+        self.assertEqual(closed, [erg])
+        self.assertEqual(worker._ergs, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
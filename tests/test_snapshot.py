@@ -0,0 +1,85 @@
+import json
+import pickle
+import queue
+import threading
+import unittest
+from array import array
+
+from pyrow import emulator
+from pyrow.ergmanager import Erg
+from pyrow.pyrow import get_pretty
+from pyrow.samples import ForcePlotSample, WorkoutSample
+from pyrow.snapshot import Snapshot, Snapshots
+
+
+class TestSnapshot(unittest.TestCase):
+    def test_immutable(self):
+        snapshot = Snapshot({'spm': 28}, seq=3)
+        for change in (lambda: snapshot.__setitem__('spm', 30),
+                       lambda: snapshot.update(spm=30),
+                       lambda: snapshot.pop('spm'),
+                       snapshot.clear):
+            with self.assertRaises(TypeError):
+                change()
+        self.assertEqual(snapshot, {'spm': 28})
+
+    def test_serializable(self):
+        snapshot = Snapshot({'spm': 28, 'status': 'Ready'}, seq=3, timestamp=12.5)
+        self.assertEqual(json.loads(json.dumps(snapshot)), {'spm': 28, 'status': 'Ready'})
+        copy = pickle.loads(pickle.dumps(snapshot))
+        self.assertEqual((copy, copy.seq, copy.timestamp), (snapshot, 3, 12.5))
+
+
+class TestSnapshots(unittest.TestCase):
+    def test_publish(self):
+        snapshots = Snapshots()
+        self.assertEqual(snapshots.latest.seq, 0)
+        first = snapshots.publish({'spm': 28})
+        second = snapshots.publish({'spm': 30})
+        self.assertEqual((first.seq, second.seq), (1, 2))
+        self.assertIs(snapshots.latest, second)
+        self.assertEqual(first['spm'], 28)
+
+    def test_update_keeps_groups_not_polled(self):
+        snapshots = Snapshots()
+        forceplot = ForcePlotSample(forceplot=array('h'), strokestate=2, status=1)
+        workout = WorkoutSample(userid='000', type=3, state=1, inttype=0, intcount=0, status=1)
+        snapshots.update([forceplot, workout], get_pretty)
+        #only the workout polled, the stroke state is the drive of the first update
+        second = snapshots.update([workout], get_pretty)
+        self.assertEqual((second['strokestate'], second['inttype']), ('Drive', 'Time'))
+        forceplot.strokestate = 4
+        third = snapshots.update([forceplot], get_pretty)
+        self.assertEqual((third['strokestate'], third['inttype']), ('Recovery', 'Time'))
+
+    def test_wait_newer(self):
+        snapshots = Snapshots()
+        published = snapshots.publish({'spm': 28})
+        self.assertIs(snapshots.wait_newer(0), published)
+        self.assertIsNone(snapshots.wait_newer(1, timeout=0.01))
+        threading.Timer(0.02, snapshots.publish, ({'spm': 30},)).start()
+        newer = snapshots.wait_newer(1, timeout=1)
+        self.assertEqual((newer.seq, newer['spm']), (2, 30))
+
+
+class TestErgSnapshots(unittest.TestCase):
+    def test_polls_publish_snapshots(self):
+        erg = Erg(emulator, emulator.find(1)[0], queue.Queue(), rate=0.01)
+        try:
+            first = erg.wait_newer(0, timeout=5)
+            self.assertIsNotNone(first)
+            values = dict(first)
+            newer = erg.wait_newer(first.seq, timeout=5)
+        finally:
+            erg.exit_requested = True
+            erg._thread.join()
+        self.assertGreater(newer.seq, first.seq)
+        self.assertGreaterEqual(newer.timestamp, first.timestamp)
+        #unchanged by the later polls
+        self.assertEqual(first, values)
+        self.assertIs(erg.data, erg.snapshots.latest)
+        self.assertIn('distance', erg.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
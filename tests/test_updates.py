@@ -0,0 +1,100 @@
+import threading
+import time
+import unittest
+
+from pyrow import emulator
+from pyrow.ergmanager import ErgManager
+from pyrow.updates import BLOCK, DROP_NEWEST, DROP_OLDEST, UpdateQueue
+
+
+class FakeErg(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class TestUpdateQueue(unittest.TestCase):
+    def setUp(self):
+        self.ergs = [FakeErg(k) for k in range(3)]
+
+    def test_coalesces(self):
+        updates = UpdateQueue(maxsize=2)
+        first, second = self.ergs[:2]
+        for erg in (first, second, first, first):
+            self.assertTrue(updates.put(erg))
+        self.assertIs(updates.get(), first)
+        self.assertIs(updates.get(), second)
+        self.assertIsNone(updates.get(timeout=0.01))
+        stats = updates.stats()
+        self.assertEqual((stats['depth'], stats['puts'], stats['coalesced'], stats['dropped']),
+                         (0, 4, 2, 0))
+
+    def test_drop_oldest(self):
+        updates = UpdateQueue(maxsize=2, policy=DROP_OLDEST)
+        for erg in self.ergs:
+            self.assertTrue(updates.put(erg))
+        self.assertEqual([updates.get(), updates.get()], self.ergs[1:])
+        self.assertEqual(updates.dropped, 1)
+
+    def test_drop_newest(self):
+        updates = UpdateQueue(maxsize=2, policy=DROP_NEWEST)
+        self.assertEqual([updates.put(erg) for erg in self.ergs], [True, True, False])
+        #an erg already waiting is not dropped
+        self.assertTrue(updates.put(self.ergs[0]))
+        self.assertEqual([updates.get(), updates.get()], self.ergs[:2])
+        self.assertEqual(updates.dropped, 1)
+
+    def test_block(self):
+        updates = UpdateQueue(maxsize=1, policy=BLOCK)
+        updates.put(self.ergs[0])
+        self.assertFalse(updates.put(self.ergs[1], timeout=0.01))
+        threading.Timer(0.02, updates.get).start()
+        self.assertTrue(updates.put(self.ergs[1], timeout=1))
+        self.assertIs(updates.get(), self.ergs[1])
+        self.assertEqual(updates.maxdepth, 1)
+
+    def test_close_wakes(self):
+        updates = UpdateQueue(maxsize=1, policy=BLOCK)
+        updates.put(self.ergs[0])
+        threading.Timer(0.02, updates.close).start()
+        self.assertFalse(updates.put(self.ergs[1]))
+        self.assertIsNone(updates.get())
+        self.assertFalse(updates.put(self.ergs[0]))
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            UpdateQueue(policy='drop-all')
+
+
+class TestSlowCallback(unittest.TestCase):
+    def test_depth_stays_flat(self):
+        emulated = emulator.find(2)
+        ages = []
+
+        def slow_update(erg):
+            ages.append(time.time() - erg.monitor.timestamp)
+            time.sleep(0.2)
+
+        class Fleet(object):
+            PyErg = emulator.PyErg
+            get_pretty = staticmethod(emulator.get_pretty)
+
+            @staticmethod
+            def find():
+                return emulated
+
+        manager = ErgManager(Fleet, add_callback=lambda erg: None, update_callback=slow_update,
+                             check_rate=0.01, update_rate=0.002, update_queue=4)
+        try:
+            time.sleep(1)
+            stats = manager.updates.stats()
+        finally:
+            manager.stop()
+        self.assertLessEqual(stats['maxdepth'], 2)
+        self.assertGreater(stats['coalesced'], len(ages))
+        self.assertEqual(stats['dropped'], 0)
+        #the callback reads the latest poll, not one queued behind earlier updates
+        self.assertLess(max(ages[1:]), 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()